@@ -18,6 +18,7 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.conf.update(
     imports=[
         'hr_management.ssl_tasks',
+        'hr_management.schedule_tasks',
     ]
 )
 
@@ -45,6 +46,12 @@ app.conf.beat_schedule = {
         'task': 'hr_management.ssl_tasks.cleanup_failed_ssl_attempts',
         'schedule': crontab(hour=4, minute=0),
     },
+    
+    # Roll the effective schedule calendar forward daily at 1 AM
+    'build-schedule-calendars-daily': {
+        'task': 'hr_management.schedule_tasks.build_schedule_calendars',
+        'schedule': crontab(hour=1, minute=0),
+    },
 }
 
 
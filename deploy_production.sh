@@ -88,15 +88,9 @@ cd $PROJECT_DIR
 python manage.py migrate --database=default
 print_success "Main database migrated"
 
-# Migrate all tenant databases
+# Migrate all tenant databases (records schema versions in tenant_bootstrap.json)
 echo "Migrating tenant databases..."
-for tenant_db in tenant_*.sqlite3; do
-    if [ -f "$tenant_db" ]; then
-        tenant_name=$(echo $tenant_db | sed 's/tenant_//' | sed 's/.sqlite3//')
-        echo "  - Migrating $tenant_name..."
-        python manage.py migrate --database=tenant_$tenant_name || print_info "    Skipped (might not exist in settings)"
-    fi
-done
+python manage.py bootstrap_tenants
 print_success "Tenant databases migrated"
 
 echo ""
@@ -0,0 +1,146 @@
+"""
+Branch Spatial Index
+Per-tenant cached index over branch coordinates
+
+Branch coordinates are converted to radians once (with cos(latitude)
+precomputed) and kept sorted by latitude, so "branches within N meters"
+only runs haversine on the latitude band that can possibly match.
+The index is rebuilt lazily after a Branch is saved or deleted; every
+lookup compares the branch count and latest updated_at with the ones the
+index was built from, so other worker processes pick up the change too.
+"""
+from bisect import bisect_left, bisect_right
+from math import radians, sin, cos, sqrt, atan2, pi
+import threading
+
+# Earth radius in meters (same as Branch.calculate_distance)
+EARTH_RADIUS = 6371000
+
+
+class BranchPoint:
+    """A branch with precomputed radian coordinates"""
+    __slots__ = ('branch', 'lat', 'lon', 'cos_lat')
+
+    def __init__(self, branch):
+        self.branch = branch
+        self.lat = radians(float(branch.latitude))
+        self.lon = radians(float(branch.longitude))
+        self.cos_lat = cos(self.lat)
+
+
+def batch_distances(latitude, longitude, points):
+    """
+    Haversine distance in meters from one location to many BranchPoints.
+    Returns a list aligned with points.
+    """
+    lat = radians(float(latitude))
+    lon = radians(float(longitude))
+    cos_lat = cos(lat)
+
+    distances = []
+    for p in points:
+        a = sin((p.lat - lat) / 2) ** 2 + cos_lat * p.cos_lat * sin((p.lon - lon) / 2) ** 2
+        distances.append(EARTH_RADIUS * 2 * atan2(sqrt(a), sqrt(1 - a)))
+    return distances
+
+
+def nearest_point(latitude, longitude, points):
+    """
+    Returns (branch, distance) of the closest point, or (None, inf) if points is empty
+    """
+    best_branch, best_distance = None, float('inf')
+    for p, distance in zip(points, batch_distances(latitude, longitude, points)):
+        if distance < best_distance:
+            best_branch, best_distance = p.branch, distance
+    return best_branch, best_distance
+
+
+class BranchSpatialIndex:
+    """
+    Latitude-sorted index over active branches
+    """
+
+    def __init__(self, branches):
+        self.points = sorted((BranchPoint(b) for b in branches), key=lambda p: p.lat)
+        self._lats = [p.lat for p in self.points]
+
+    def __len__(self):
+        return len(self.points)
+
+    def _band(self, latitude, meters):
+        """Points whose latitude is within `meters` of the given latitude"""
+        delta = meters / EARTH_RADIUS
+        lat = radians(float(latitude))
+        return self.points[bisect_left(self._lats, lat - delta):bisect_right(self._lats, lat + delta)]
+
+    def within(self, latitude, longitude, meters):
+        """
+        Branches within `meters` of the location.
+        Returns a list of (branch, distance) sorted by distance.
+        """
+        band = self._band(latitude, meters)
+        matches = [
+            (p.branch, distance)
+            for p, distance in zip(band, batch_distances(latitude, longitude, band))
+            if distance <= meters
+        ]
+        matches.sort(key=lambda m: m[1])
+        return matches
+
+    def nearest(self, latitude, longitude):
+        """
+        Nearest branch to the location.
+        Searches a widening latitude band, so only nearby branches are measured.
+        Returns (branch, distance), or (None, inf) if the index is empty.
+        """
+        meters = 1000
+        while meters < EARTH_RADIUS * pi:
+            branch, distance = nearest_point(latitude, longitude, self._band(latitude, meters))
+            # Every branch closer than `meters` is inside the band
+            if distance <= meters:
+                return branch, distance
+            meters *= 4
+        return nearest_point(latitude, longitude, self.points)
+
+
+_indexes = {}
+_generations = {}
+_lock = threading.Lock()
+
+
+def _branch_version(using):
+    """(count, latest updated_at) of branches: changes on every save or delete, in any process"""
+    from django.db.models import Count, Max
+    from .models import Branch
+
+    version = Branch.objects.using(using).aggregate(count=Count('id'), updated=Max('updated_at'))
+    return version['count'], version['updated']
+
+
+def get_branch_index(using):
+    """
+    Returns the cached spatial index of active branches for a tenant database.
+    The index is rebuilt when the branches changed since it was built, also
+    when the change was made by another worker process.
+    """
+    version = _branch_version(using)
+    cached = _indexes.get(using)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    from .models import Branch
+
+    generation = _generations.get(using, 0)
+    index = BranchSpatialIndex(Branch.objects.using(using).filter(is_active=True))
+    with _lock:
+        # Don't cache an index that was invalidated while it was being built
+        if _generations.get(using, 0) == generation:
+            _indexes[using] = (version, index)
+    return index
+
+
+def invalidate_branch_index(using):
+    """Drop the cached index for a tenant database (Branch save/delete)"""
+    with _lock:
+        _indexes.pop(using, None)
+        _generations[using] = _generations.get(using, 0) + 1
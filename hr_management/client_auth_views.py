@@ -684,82 +684,61 @@ class AllClientsFromAllTenantsView(APIView):
     View to get all clients from all tenant databases
     This is a read-only view for administrative purposes
     Returns all clients with their tenant information
+    
+    ?limit=&cursor= : keyset pagination
+    ?export=ndjson|csv : streamed export of every client
     """
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         from .tenant_models import Tenant
-        from django.db import connections
-        from .tenant_middleware import setup_tenant_database
-        from django.conf import settings
-        import os
-        
-        all_clients = []
+        from .tenant_clients import collect_clients, client_sort_key, format_client
+        from .tenant_fanout import encode_cursor, decode_cursor
         
         # Get all active tenants
-        tenants = Tenant.objects.using('default').filter(is_active=True)
+        tenants = list(Tenant.objects.using('default').filter(is_active=True))
         
-        for tenant in tenants:
-            db_alias = f"tenant_{tenant.subdomain}"
-            
-            # Check if database file exists
-            db_path = os.path.join(settings.BASE_DIR, f'tenant_{tenant.subdomain}.sqlite3')
-            if not os.path.exists(db_path):
-                print(f"Database file not found for tenant {tenant.subdomain}: {db_path}")
-                continue
-            
+        # Streaming export (?export=ndjson|csv) runs in constant memory
+        export = request.query_params.get('export')
+        if export:
+            return self.stream_export(tenants, export)
+        
+        # Keyset pagination (?limit=&cursor=) is opt-in; without it every client is returned
+        limit = after = None
+        if 'limit' in request.query_params or 'cursor' in request.query_params:
             try:
-                # Setup database connection if not already configured
-                if db_alias not in settings.DATABASES:
-                    setup_tenant_database(tenant)
-                
-                # Get User model and query from tenant database
-                with connections[db_alias].cursor() as cursor:
-                    # Query to get all registered clients from this tenant's database
-                    cursor.execute("""
-                        SELECT id, email, first_name, last_name, '' as phone, is_active, 
-                               date_joined, last_login, 'registered' as client_type
-                        FROM hr_management_user
-                        WHERE role = 'client'
-                        
-                        UNION ALL
-                        
-                        SELECT id, client_email as email, client_name as first_name, 
-                               '' as last_name, client_phone as phone, 1 as is_active,
-                               created_at as date_joined, NULL as last_login, 'complaint' as client_type
-                        FROM hr_management_clientcomplaint
-                        WHERE client_user_id IS NULL OR client_user_id = ''
-                        
-                        ORDER BY date_joined DESC
-                    """)
-                    
-                    columns = [col[0] for col in cursor.description]
-                    results = cursor.fetchall()
-                    
-                    for row in results:
-                        client_data = dict(zip(columns, row))
-                        client_data['tenant_name'] = tenant.name
-                        client_data['tenant_subdomain'] = tenant.subdomain
-                        client_data['tenant_id'] = str(tenant.id)
-                        
-                        # Format dates
-                        if client_data.get('date_joined'):
-                            client_data['date_joined'] = client_data['date_joined'].isoformat() if hasattr(client_data['date_joined'], 'isoformat') else str(client_data['date_joined'])
-                        if client_data.get('last_login'):
-                            client_data['last_login'] = client_data['last_login'].isoformat() if hasattr(client_data['last_login'], 'isoformat') else str(client_data['last_login'])
-                        
-                        all_clients.append(client_data)
-                        
-            except Exception as e:
-                # If database doesn't exist or error occurs, skip this tenant
-                print(f"Error accessing database for tenant {tenant.subdomain}: {str(e)}")
-                continue
+                limit = min(max(int(request.query_params.get('limit', 100)), 1), 500)
+                if request.query_params.get('cursor'):
+                    after = decode_cursor(request.query_params['cursor'])
+                    if len(after) != 3:
+                        raise ValueError('Invalid cursor')
+            except (TypeError, ValueError):
+                return Response({'error': 'Invalid limit or cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        clients, total_clients, has_more, failed_tenants = collect_clients(tenants, after, limit)
+        
+        # Cursor is taken from the raw row, before dates are formatted
+        next_cursor = encode_cursor(client_sort_key(clients[-1])) if has_more else None
         
         return Response({
-            'total_clients': len(all_clients),
-            'total_tenants': tenants.count(),
-            'clients': all_clients
+            'total_clients': total_clients,
+            'total_tenants': len(tenants),
+            'clients': [format_client(client) for client in clients],
+            'next_cursor': next_cursor,
+            'failed_tenants': failed_tenants
         }, status=status.HTTP_200_OK)
+    
+    def stream_export(self, tenants, export):
+        from django.http import StreamingHttpResponse
+        from .tenant_clients import iter_all_clients, iter_ndjson, iter_csv
+        
+        if export == 'ndjson':
+            return StreamingHttpResponse(iter_ndjson(iter_all_clients(tenants)), content_type='application/x-ndjson')
+        if export == 'csv':
+            response = StreamingHttpResponse(iter_csv(iter_all_clients(tenants)), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename="all_clients.csv"'
+            return response
+        return Response({'error': 'export must be "ndjson" or "csv"'}, status=status.HTTP_400_BAD_REQUEST)
 
 
 # Django Template View (requires admin login)
@@ -777,69 +756,16 @@ class AllClientsDashboardView(View):
     
     def get(self, request):
         from .tenant_models import Tenant
-        from django.db import connections
-        from .tenant_middleware import setup_tenant_database
-        from django.conf import settings
-        import os
-        
-        all_clients = []
+        from .tenant_clients import collect_clients
         
         # Get all active tenants
-        tenants = Tenant.objects.using('default').filter(is_active=True)
-        
-        for tenant in tenants:
-            db_alias = f"tenant_{tenant.subdomain}"
-            
-            # Check if database file exists
-            db_path = os.path.join(settings.BASE_DIR, f'tenant_{tenant.subdomain}.sqlite3')
-            if not os.path.exists(db_path):
-                print(f"Database file not found for tenant {tenant.subdomain}: {db_path}")
-                continue
-            
-            try:
-                # Setup database connection if not already configured
-                if db_alias not in settings.DATABASES:
-                    setup_tenant_database(tenant)
-                
-                # Get User model and query from tenant database
-                with connections[db_alias].cursor() as cursor:
-                    # Query to get all clients from this tenant's database
-                    cursor.execute("""
-                        SELECT id, email, first_name, last_name, '' as phone, is_active, 
-                               date_joined, last_login, 'registered' as client_type
-                        FROM hr_management_user
-                        WHERE role = 'client'
-                        
-                        UNION ALL
-                        
-                        SELECT id, client_email as email, client_name as first_name, 
-                               '' as last_name, client_phone as phone, 1 as is_active,
-                               created_at as date_joined, NULL as last_login, 'complaint' as client_type
-                        FROM hr_management_clientcomplaint
-                        WHERE client_user_id IS NULL OR client_user_id = ''
-                        
-                        ORDER BY date_joined DESC
-                    """)
-                    
-                    columns = [col[0] for col in cursor.description]
-                    results = cursor.fetchall()
-                    
-                    for row in results:
-                        client_data = dict(zip(columns, row))
-                        client_data['tenant_name'] = tenant.name
-                        client_data['tenant_subdomain'] = tenant.subdomain
-                        client_data['tenant_id'] = str(tenant.id)
-                        all_clients.append(client_data)
-                        
-            except Exception as e:
-                # If database doesn't exist or error occurs, skip this tenant
-                print(f"Error accessing database for tenant {tenant.subdomain}: {str(e)}")
-                continue
+        tenants = list(Tenant.objects.using('default').filter(is_active=True))
+        all_clients, total_clients, _, _ = collect_clients(tenants)
         
         context = {
             'clients': all_clients,
-            'total_clients': len(all_clients),
-            'total_tenants': tenants.count(),
+            'total_clients': total_clients,
+            'total_tenants': len(tenants),
             'tenants': tenants,
             'user': request.user
         }
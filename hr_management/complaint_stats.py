@@ -0,0 +1,108 @@
+"""
+Complaint Statistics
+Aggregate counters for client complaint dashboards
+
+All counters, the per-priority breakdown and min/avg/max resolution times
+come from a single conditional aggregate; the per-category breakdown is one
+grouped query. Results can be cached per tenant for a short TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, Min, Q
+from .models import ClientComplaint, ComplaintCategory
+
+STATUS_COUNTERS = ['pending_review', 'approved', 'rejected', 'in_progress', 'resolved', 'closed']
+OPEN_STATUSES = ['pending_review', 'approved', 'in_progress']
+PRIORITIES = ['urgent', 'medium', 'low']
+
+
+def _hours(duration):
+    """timedelta (or None) -> hours rounded to 2 decimals"""
+    if duration is None:
+        return 0
+    return round(duration.total_seconds() / 3600, 2)
+
+
+def get_complaint_counters(complaints):
+    """
+    All status/priority counters and resolution times in one aggregate query
+    """
+    resolution_time = ExpressionWrapper(F('resolved_at') - F('created_at'), output_field=DurationField())
+    is_resolved = Q(status='resolved', resolved_at__isnull=False)
+
+    aggregates = {
+        'total_complaints': Count('id'),
+        'overdue_complaints': Count('id', filter=Q(status__in=OPEN_STATUSES)),
+        'avg_resolution': Avg(resolution_time, filter=is_resolved),
+        'min_resolution': Min(resolution_time, filter=is_resolved),
+        'max_resolution': Max(resolution_time, filter=is_resolved),
+    }
+    for status in STATUS_COUNTERS:
+        aggregates[status] = Count('id', filter=Q(status=status))
+    for priority in PRIORITIES:
+        aggregates[f'priority_{priority}'] = Count('id', filter=Q(priority=priority))
+
+    totals = complaints.aggregate(**aggregates)
+
+    counters = {
+        'total_complaints': totals['total_complaints'],
+        **{status: totals[status] for status in STATUS_COUNTERS},
+        'overdue_complaints': totals['overdue_complaints'],
+        'urgent_complaints': totals['priority_urgent'],
+    }
+    complaints_by_priority = [
+        {'priority': priority, 'count': totals[f'priority_{priority}']}
+        for priority in PRIORITIES
+    ]
+    resolution_times = {
+        'average_resolution_hours': _hours(totals['avg_resolution']),
+        'fastest_resolution_hours': _hours(totals['min_resolution']),
+        'slowest_resolution_hours': _hours(totals['max_resolution']),
+    }
+    return counters, complaints_by_priority, resolution_times
+
+
+def get_complaints_by_category(complaints):
+    """
+    Complaint counts per active category (categories with no complaints are omitted)
+    """
+    counts = dict(
+        ClientComplaint.objects.filter(pk__in=complaints.values('pk'))
+        .values_list('category_id')
+        .annotate(count=Count('id'))
+    )
+    return [
+        {'category_name': category.name, 'count': counts[category.id], 'color': category.color}
+        for category in ComplaintCategory.objects.filter(is_active=True)
+        if counts.get(category.id)
+    ]
+
+
+def get_complaint_stats(complaints):
+    """
+    Full stats payload for a complaint queryset (without recent complaints)
+    """
+    counters, complaints_by_priority, resolution_times = get_complaint_counters(complaints)
+    return {
+        **counters,
+        'complaints_by_category': get_complaints_by_category(complaints),
+        'complaints_by_priority': complaints_by_priority,
+        'resolution_times': resolution_times,
+    }
+
+
+def get_cached(key, build):
+    """
+    Return cached value for key (scoped to the current tenant database),
+    calling build() on a miss. TTL: COMPLAINT_STATS_CACHE_TTL seconds (default 60).
+    """
+    ttl = getattr(settings, 'COMPLAINT_STATS_CACHE_TTL', 60)
+    if not ttl:
+        return build()
+
+    cache_key = f"complaint_stats:{ClientComplaint.objects.db}:{key}"
+    value = cache.get(cache_key)
+    if value is None:
+        value = build()
+        cache.set(cache_key, value, ttl)
+    return value
@@ -0,0 +1,181 @@
+"""
+Employee Dashboard Snapshots
+Materialized per-employee, per-day payload for EmployeeDashboardStatsView
+
+The dashboard payload is computed once and stored in EmployeeDashboardSnapshot.
+Signals on shifts, overrides, schedules, leaves, wallets and complaints drop
+the affected employee's snapshots, so the next read recomputes them; every
+other read is a single-row lookup. Each snapshot carries an ETag so clients
+polling the endpoint get 304 responses while nothing changed.
+"""
+import datetime
+import hashlib
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import (
+    WorkShift, EmployeeWalletSystem, LeaveRequest, Complaint, EmployeeDashboardSnapshot
+)
+from .schedule_calendar import get_effective_schedule
+
+# Check-ins later than this after the expected start count as late
+GRACE_PERIOD = datetime.timedelta(minutes=15)
+
+
+def _parse_time(value):
+    """Accept time objects or 'HH:MM[:SS]' strings"""
+    if isinstance(value, str):
+        return datetime.datetime.strptime(value, '%H:%M:%S').time() if len(value) > 5 else datetime.datetime.strptime(value, '%H:%M').time()
+    return value
+
+
+def _late_status(expected_start, latest_shift, today):
+    """
+    Compare check-in time with expected start time (grace period: 15 minutes)
+    Returns (attendance_status, is_late, late_minutes)
+    """
+    expected_start_dt = datetime.datetime.combine(today, _parse_time(expected_start))
+    check_in_dt = datetime.datetime.combine(today, latest_shift.check_in.time())
+
+    if check_in_dt > (expected_start_dt + GRACE_PERIOD):
+        return 'late', True, int((check_in_dt - expected_start_dt).total_seconds() / 60)
+    return 'present', False, 0
+
+
+def _wallet_data(employee):
+    """Balances from the multi-wallet system (created on first access)"""
+    try:
+        wallet_system = EmployeeWalletSystem.objects.get(employee=employee)
+    except EmployeeWalletSystem.DoesNotExist:
+        from .signals import get_or_create_wallet_system
+        wallet_system = get_or_create_wallet_system(employee)
+
+    main_wallet = wallet_system.main_wallet
+    reimbursement_wallet = wallet_system.reimbursement_wallet
+    advance_wallet = wallet_system.advance_wallet
+
+    return {
+        "main_balance": str(main_wallet.balance),
+        "reimbursement_balance": str(reimbursement_wallet.balance),
+        "advance_balance": str(advance_wallet.balance),
+        "total_balance": str(main_wallet.balance + reimbursement_wallet.balance - advance_wallet.balance)
+    }
+
+
+def compute_employee_dashboard(employee, today):
+    """
+    Compute the full dashboard payload for an employee on a date
+    """
+    # Get today's work shifts
+    today_shifts = WorkShift.objects.filter(
+        employee=employee,
+        check_in__date=today
+    ).order_by('check_in')
+
+    # Check if there's an ONGOING shift from ANY previous day (not checked out yet)
+    ongoing_shift = WorkShift.objects.filter(
+        employee=employee,
+        check_out__isnull=True
+    ).order_by('-check_in').first()
+
+    # Use ongoing shift if exists, otherwise use today's shift
+    active_shift = ongoing_shift if ongoing_shift else today_shifts.filter(check_out__isnull=True).first()
+    latest_shift = ongoing_shift if ongoing_shift else today_shifts.last()
+
+    # Determine attendance status based on shifts
+    has_checked_in = (ongoing_shift is not None) or today_shifts.exists()
+    has_active_shift = active_shift is not None
+
+    # Default status
+    attendance_status = 'absent'
+    is_late = False
+    late_minutes = 0
+
+    # Today's schedule from the effective schedule calendar (approved
+    # overrides, multi-branch daily schedules, then weekly schedules)
+    schedule = get_effective_schedule(employee.id, today)
+    if schedule.is_day_off and schedule.source == 'override':
+        # Vacation, sick leave, etc. - a confirmed day off
+        attendance_status = 'day_off'
+        has_checked_in = False
+        has_active_shift = False
+    elif schedule.is_day_off:
+        # No schedule defined today - it's a weekly day off, unless they checked in anyway
+        attendance_status = 'present' if has_checked_in else 'day_off'
+    elif schedule.start_time and has_checked_in and latest_shift:
+        attendance_status, is_late, late_minutes = _late_status(schedule.start_time, latest_shift, today)
+    elif has_checked_in:
+        # Has schedule and checked in (even without shift start time)
+        attendance_status = 'present'
+
+    leave_counts = LeaveRequest.objects.filter(employee=employee).aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending'))
+    )
+
+    # Get recent complaints
+    recent_complaints = Complaint.objects.filter(
+        employee=employee
+    ).order_by('-created_at')[:3]
+
+    return {
+        'attendance_today': {
+            'checked_in': latest_shift.check_in.strftime('%H:%M') if latest_shift else None,
+            'checked_out': latest_shift.check_out.strftime('%H:%M') if latest_shift and latest_shift.check_out else None,
+            'status': attendance_status,
+            'is_late': is_late,
+            'late_minutes': late_minutes,
+            'has_active_shift': has_active_shift,
+            'active_shift_id': str(active_shift.id) if active_shift else None
+        },
+        'wallet_data': _wallet_data(employee),
+        'pending_leaves': leave_counts['pending'],
+        'total_leaves': leave_counts['total'],
+        'recent_complaints': [
+            {
+                'id': str(complaint.id),
+                'title': complaint.title,
+                'status': complaint.status,
+                'created_at': complaint.created_at
+            } for complaint in recent_complaints
+        ]
+    }
+
+
+def build_snapshot(employee, today):
+    """Compute and store (or replace) the snapshot for an employee and date"""
+    # Round-trip through JSON so stored and served payloads are identical
+    data = json.loads(json.dumps(compute_employee_dashboard(employee, today), cls=DjangoJSONEncoder))
+    etag = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    try:
+        snapshot, _ = EmployeeDashboardSnapshot.objects.update_or_create(
+            employee=employee,
+            date=today,
+            defaults={'data': data, 'etag': etag}
+        )
+    except IntegrityError:
+        # A concurrent request stored the same snapshot first
+        snapshot = EmployeeDashboardSnapshot.objects.get(employee=employee, date=today)
+    return snapshot
+
+
+def get_dashboard_snapshot(employee, today=None):
+    """
+    Single-row read of the employee's snapshot for today, built on a miss
+    """
+    today = today or timezone.now().date()
+    snapshot = EmployeeDashboardSnapshot.objects.filter(employee=employee, date=today).first()
+    if snapshot is None:
+        snapshot = build_snapshot(employee, today)
+    return snapshot
+
+
+def invalidate_dashboard_snapshots(employee_id, using=None):
+    """Drop an employee's snapshots; the next dashboard read rebuilds them"""
+    manager = EmployeeDashboardSnapshot.objects
+    if using:
+        manager = manager.using(using)
+    manager.filter(employee_id=employee_id).delete()
@@ -0,0 +1,307 @@
+"""
+Location Ping Ingestion
+Batched processing of silent location pings (LocationPingView)
+
+Pings are processed in batches: branches, active shifts and daily summaries
+are loaded once per batch, summary enter/exit transitions are applied in
+memory per employee, and events are written with bulk_create. Summary
+counters are written as deltas (total_exits = total_exits + n), so workers
+processing the same employee concurrently don't overwrite each other.
+
+Two modes, selected by settings.LOCATION_PING_INGESTION:
+- 'sync' (default): each ping is processed as a batch of one inside the request
+- 'buffered': the request only appends the ping to an in-memory queue; the
+  queue is flushed in a background thread once it reaches
+  LOCATION_PING_BATCH_SIZE pings, or by a timer LOCATION_PING_FLUSH_INTERVAL
+  seconds after the first queued ping. A batch that fails to write is put
+  back in the queue and retried up to LOCATION_PING_MAX_RETRIES times.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, When, F, Value
+from django.db.models.functions import Greatest
+from .branch_index import BranchPoint, nearest_point
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class LocationPing:
+    """A single validated location ping, as received from a device"""
+    __slots__ = ('employee_id', 'latitude', 'longitude', 'received_at', 'accuracy', 'battery_level')
+
+    def __init__(self, employee_id, latitude, longitude, received_at, accuracy=None, battery_level=None):
+        self.employee_id = employee_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.received_at = received_at
+        self.accuracy = accuracy
+        self.battery_level = battery_level
+
+
+def process_location_pings(pings, using):
+    """
+    Apply a batch of pings to LocationTrackingSummary/LocationTrackingEvent.
+
+    Args:
+        pings: iterable of LocationPing
+        using: database alias of the tenant the pings belong to
+
+    Returns:
+        Number of events written
+    """
+    from .models import EmployeeBranch, WorkShift, LocationTrackingEvent, LocationTrackingSummary
+
+    pings = sorted(pings, key=lambda p: p.received_at)
+    if not pings:
+        return 0
+
+    employee_ids = {p.employee_id for p in pings}
+    dates = {p.received_at.date() for p in pings}
+
+    # Active branches per employee (one query), as precomputed spatial points
+    # (one per branch, shared by the employees assigned to it)
+    points_by_branch = {}
+    points_by_employee = defaultdict(list)
+    for eb in EmployeeBranch.objects.using(using).filter(
+        employee_id__in=employee_ids,
+        is_active=True
+    ).select_related('branch'):
+        point = points_by_branch.get(eb.branch_id)
+        if point is None:
+            point = points_by_branch[eb.branch_id] = BranchPoint(eb.branch)
+        points_by_employee[eb.employee_id].append(point)
+
+    # Open shift per employee (one query, earliest check-in wins like .first())
+    active_shifts = {}
+    for shift in WorkShift.objects.using(using).filter(
+        employee_id__in=employee_ids,
+        is_active=True,
+        check_out__isnull=True
+    ).order_by('check_in'):
+        active_shifts.setdefault(shift.employee_id, shift)
+
+    # Existing summaries for the employees/dates in this batch (one query)
+    summaries = {
+        (s.employee_id, s.date): s
+        for s in LocationTrackingSummary.objects.using(using).filter(
+            employee_id__in=employee_ids,
+            date__in=dates
+        )
+    }
+    # Counter values as loaded, to write back only what this batch added
+    loaded_counters = {key: (s.total_exits, s.total_time_outside) for key, s in summaries.items()}
+    new_summary_keys = set()
+
+    events = []
+    for ping in pings:
+        points = points_by_employee.get(ping.employee_id)
+        if not points:
+            continue
+
+        # Find nearest branch and calculate distance
+        nearest_branch, min_distance = nearest_point(ping.latitude, ping.longitude, points)
+
+        within_radius = min_distance <= nearest_branch.attendance_radius
+        active_shift = active_shifts.get(ping.employee_id)
+        now = ping.received_at
+
+        key = (ping.employee_id, now.date())
+        summary = summaries.get(key)
+        if summary is None:
+            summary = LocationTrackingSummary(
+                employee_id=ping.employee_id,
+                date=key[1],
+                shift=active_shift,
+                first_ping=now,
+                last_ping=now
+            )
+            summaries[key] = summary
+            new_summary_keys.add(key)
+
+        summary.last_ping = now
+
+        # Determine event type and update summary
+        event_type = 'ping'
+        duration_outside = None
+
+        if not within_radius and not summary.currently_outside:
+            # Employee just exited
+            event_type = 'exit'
+            summary.currently_outside = True
+            summary.current_exit_started = now
+            summary.total_exits += 1
+
+        elif within_radius and summary.currently_outside:
+            # Employee just entered back
+            event_type = 'enter'
+            summary.currently_outside = False
+
+            # Calculate duration outside
+            if summary.current_exit_started:
+                duration_outside = int((now - summary.current_exit_started).total_seconds())
+                summary.total_time_outside += duration_outside
+
+                # Update longest exit
+                if duration_outside > summary.longest_exit_duration:
+                    summary.longest_exit_duration = duration_outside
+
+                summary.current_exit_started = None
+
+        events.append(LocationTrackingEvent(
+            employee_id=ping.employee_id,
+            shift=active_shift,
+            branch=nearest_branch,
+            event_type=event_type,
+            timestamp=now,
+            latitude=ping.latitude,
+            longitude=ping.longitude,
+            distance_from_branch=int(min_distance),
+            within_radius=within_radius,
+            duration_outside=duration_outside,
+            battery_level=ping.battery_level,
+            accuracy=ping.accuracy
+        ))
+
+    if not events:
+        return 0
+
+    touched_keys = {(e.employee_id, e.timestamp.date()) for e in events}
+    created = [summaries[k] for k in touched_keys if k in new_summary_keys]
+    updated = [summaries[k] for k in touched_keys if k not in new_summary_keys]
+
+    with transaction.atomic(using=using):
+        if created:
+            LocationTrackingSummary.objects.using(using).bulk_create(created)
+        if updated:
+            _update_summaries(updated, loaded_counters, using)
+        LocationTrackingEvent.objects.using(using).bulk_create(events)
+
+    return len(events)
+
+
+def _update_summaries(summaries, loaded_counters, using):
+    """
+    Write updated summaries in one UPDATE ... CASE: counters move by this
+    batch's deltas, longest exit and last ping only ever grow
+    """
+    from .models import LocationTrackingSummary
+
+    def per_row(field, value):
+        return Case(
+            *[When(pk=s.pk, then=Value(value(s))) for s in summaries],
+            output_field=LocationTrackingSummary._meta.get_field(field),
+        )
+
+    def delta(index, field):
+        return lambda s: getattr(s, field) - loaded_counters[(s.employee_id, s.date)][index]
+
+    LocationTrackingSummary.objects.using(using).filter(pk__in=[s.pk for s in summaries]).update(
+        total_exits=F('total_exits') + per_row('total_exits', delta(0, 'total_exits')),
+        total_time_outside=F('total_time_outside') + per_row('total_time_outside', delta(1, 'total_time_outside')),
+        longest_exit_duration=Greatest(
+            F('longest_exit_duration'), per_row('longest_exit_duration', lambda s: s.longest_exit_duration)
+        ),
+        last_ping=Greatest(F('last_ping'), per_row('last_ping', lambda s: s.last_ping)),
+        currently_outside=per_row('currently_outside', lambda s: s.currently_outside),
+        current_exit_started=per_row('current_exit_started', lambda s: s.current_exit_started),
+    )
+
+
+class LocationPingBuffer:
+    """
+    Process-local queue of pending pings, grouped by tenant database alias.
+    Thread-safe; at most one background flush runs at a time.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None, max_retries=None):
+        self.batch_size = batch_size or getattr(settings, 'LOCATION_PING_BATCH_SIZE', 500)
+        self.flush_interval = flush_interval or getattr(settings, 'LOCATION_PING_FLUSH_INTERVAL', 30)
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'LOCATION_PING_MAX_RETRIES', 3)
+        self._pending = defaultdict(list)
+        self._failures = defaultdict(int)
+        self._count = 0
+        self._timer = None
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+
+    def _schedule(self):
+        """Start the flush timer unless one is pending (call with _lock held)"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+            self._timer.name = 'location-ping-timer'
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def append(self, ping, using):
+        """Queue a ping and trigger a background flush if the batch is full"""
+        with self._lock:
+            self._pending[using].append(ping)
+            self._count += 1
+            # Pings that stop arriving are still written after flush_interval
+            self._schedule()
+            due = self._count >= self.batch_size
+
+        if due and not self._flushing.locked():
+            threading.Thread(target=self.flush, name='location-ping-flush', daemon=True).start()
+
+    def _drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+            self._count = 0
+        return pending
+
+    def _requeue(self, using, pings):
+        """Put a failed batch back in front of newer pings, up to max_retries times"""
+        with self._lock:
+            self._failures[using] += 1
+            if self._failures[using] > self.max_retries:
+                self._failures.pop(using)
+                return False
+            self._pending[using][:0] = pings
+            self._count += len(pings)
+            self._schedule()
+        return True
+
+    def flush(self):
+        """Write all queued pings. Returns the number of events written."""
+        written = 0
+        with self._flushing:
+            for using, pings in self._drain().items():
+                try:
+                    written += process_location_pings(pings, using)
+                    self._failures.pop(using, None)
+                except Exception as e:
+                    if self._requeue(using, pings):
+                        logger.warning(f"Failed to flush {len(pings)} location pings for {using}, will retry: {e}")
+                    else:
+                        logger.error(f"Dropped {len(pings)} location pings for {using} after {self.max_retries} retries: {e}")
+                finally:
+                    connections[using].close()
+        return written
+
+    def __len__(self):
+        return self._count
+
+
+ping_buffer = LocationPingBuffer()
+atexit.register(ping_buffer.flush)
+
+
+def ingest_location_ping(ping, using):
+    """
+    Entry point used by LocationPingView.
+    Queues the ping in buffered mode, otherwise processes it immediately.
+    """
+    if getattr(settings, 'LOCATION_PING_INGESTION', 'sync') == 'buffered':
+        ping_buffer.append(ping, using)
+    else:
+        process_location_pings([ping], using)
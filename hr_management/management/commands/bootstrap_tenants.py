@@ -0,0 +1,48 @@
+"""
+Migrate tenant databases and record them in the bootstrap registry
+Run this after deploys (before restarting workers) so requests never run migrate
+"""
+from django.core.management.base import BaseCommand
+from hr_management.tenant_models import Tenant
+from hr_management.tenant_bootstrap import bootstrap_tenant_database, get_schema_version
+
+
+class Command(BaseCommand):
+    help = 'Apply pending migrations to tenant databases and update the bootstrap registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'subdomains',
+            nargs='*',
+            type=str,
+            help='Only bootstrap these tenant subdomains (default: all active tenants)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run migrate even for databases already at the current schema version'
+        )
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.using('default').filter(is_active=True, subdomain__isnull=False)
+        if options['subdomains']:
+            tenants = tenants.filter(subdomain__in=options['subdomains'])
+
+        self.stdout.write(f'Schema version: {get_schema_version()}')
+
+        migrated = skipped = failed = 0
+        for tenant in tenants:
+            did_migrate, error = bootstrap_tenant_database(tenant, force=options['force'])
+            if error:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'✗ {tenant.subdomain}: {error}'))
+            elif did_migrate:
+                migrated += 1
+                self.stdout.write(self.style.SUCCESS(f'✓ {tenant.subdomain}: migrated'))
+            else:
+                skipped += 1
+                self.stdout.write(f'  {tenant.subdomain}: up to date')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Done. Migrated: {migrated}, up to date: {skipped}, failed: {failed}'
+        ))
@@ -0,0 +1,46 @@
+"""
+Build the materialized effective-schedule calendar
+Run nightly to roll the window forward (celery beat: hr_management.schedule_tasks;
+signals keep it fresh in between)
+"""
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from hr_management.models import EffectiveSchedule
+from hr_management.schedule_calendar import build_calendar, calendar_window
+
+
+class Command(BaseCommand):
+    help = 'Build effective schedule rows for all active employees over a rolling window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='First date of the window (YYYY-MM-DD, default: today)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Window length in days (default: SCHEDULE_CALENDAR_DAYS, 60)'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete calendar rows older than the window start'
+        )
+
+    def handle(self, *args, **options):
+        if options['start']:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+        else:
+            start = timezone.now().date()
+
+        if options['prune']:
+            deleted, _ = EffectiveSchedule.objects.filter(date__lt=start).delete()
+            self.stdout.write(f'  Pruned {deleted} old calendar rows')
+
+        dates = calendar_window(start, options['days'])
+        count = build_calendar(dates)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Built {count} calendar rows from {dates[0]} to {dates[-1]}'))
@@ -0,0 +1,42 @@
+"""
+Rebuild materialized employee dashboard snapshots
+Useful after deploys that change the dashboard payload, or as a nightly warm-up
+"""
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from hr_management.models import Employee, EmployeeDashboardSnapshot
+from hr_management.employee_dashboard import build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuild employee dashboard snapshots for a date (default: today)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Date to rebuild (YYYY-MM-DD, default: today)'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete snapshots older than the rebuilt date'
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+        else:
+            day = timezone.now().date()
+
+        if options['prune']:
+            deleted, _ = EmployeeDashboardSnapshot.objects.filter(date__lt=day).delete()
+            self.stdout.write(f'  Pruned {deleted} old snapshots')
+
+        count = 0
+        for employee in Employee.objects.filter(status='active'):
+            build_snapshot(employee, day)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {count} dashboard snapshots for {day}'))
@@ -0,0 +1,132 @@
+"""
+Run a management command for every active tenant, in parallel worker processes
+Run nightly maintenance via cron, e.g.:
+
+    python manage.py run_for_all_tenants --concurrency 8 check_ticket_delays
+    python manage.py run_for_all_tenants --json --output /var/log/tickets.json check_ticket_delays --dry-run
+
+Options of run_for_all_tenants go before the command name; everything after
+it is passed to the command.
+"""
+import argparse
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from hr_management.tenant_models import Tenant
+from hr_management.tenant_runner import run_command_for_tenants, OUTPUT_LIMIT
+
+
+def _status(result):
+    if result.ok:
+        return 'ok'
+    if isinstance(result.error, TimeoutError):
+        return 'timeout'
+    if isinstance(result.error, FileNotFoundError):
+        return 'skipped'
+    return 'failed'
+
+
+class Command(BaseCommand):
+    help = 'Run a management command against every active tenant database in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('command_name', help='Management command to run per tenant')
+        parser.add_argument(
+            'command_args',
+            nargs=argparse.REMAINDER,
+            help='Arguments passed to the command'
+        )
+        parser.add_argument(
+            '--tenant',
+            action='append',
+            dest='tenants',
+            help='Only run for this tenant subdomain (repeatable)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Worker processes (default: TENANT_COMMAND_CONCURRENCY or 4)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            help='Seconds a single tenant may run before it is terminated (default: TENANT_COMMAND_TIMEOUT or 600)'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print only the JSON summary'
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the JSON summary to this file'
+        )
+
+    def handle(self, *args, **options):
+        command = options['command_name']
+        command_args = options['command_args'] or []
+        as_json = options['json']
+
+        tenants = Tenant.objects.using('default').filter(is_active=True, subdomain__isnull=False)
+        if options['tenants']:
+            tenants = tenants.filter(subdomain__in=options['tenants'])
+        tenants = list(tenants.order_by('subdomain'))
+
+        if not as_json:
+            self.stdout.write(f'Running {command} for {len(tenants)} tenant(s)...')
+
+        started_at = timezone.now()
+        started = time.monotonic()
+        rows = []
+        for result in run_command_for_tenants(
+            tenants, command, command_args,
+            concurrency=options['concurrency'], timeout=options['timeout']
+        ):
+            status = _status(result)
+            rows.append({
+                'tenant_subdomain': result.tenant.subdomain,
+                'tenant_id': str(result.tenant.id),
+                'status': status,
+                'elapsed': round(result.elapsed, 3),
+                'error': None if result.ok else (str(result.error) or type(result.error).__name__),
+                'output': (result.value or {}).get('output', ''),
+            })
+            if not as_json:
+                line = f'{result.tenant.subdomain}: {status} ({result.elapsed:.1f}s)'
+                if status == 'ok':
+                    self.stdout.write(self.style.SUCCESS(f'✓ {line}'))
+                elif status == 'skipped':
+                    self.stdout.write(f'  {line}: {rows[-1]["error"]}')
+                else:
+                    self.stdout.write(self.style.ERROR(f'✗ {line}: {rows[-1]["error"]}'))
+
+        counts = {status: 0 for status in ('ok', 'failed', 'timeout', 'skipped')}
+        for row in rows:
+            counts[row['status']] += 1
+
+        summary = {
+            'command': command,
+            'args': command_args,
+            'started_at': started_at.isoformat(),
+            'elapsed': round(time.monotonic() - started, 3),
+            'slowest_tenant': max((row['elapsed'] for row in rows), default=0),
+            'output_limit': OUTPUT_LIMIT,
+            'counts': counts,
+            'tenants': sorted(rows, key=lambda row: row['tenant_subdomain']),
+        }
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        if as_json:
+            self.stdout.write(json.dumps(summary, ensure_ascii=False, indent=2))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'\n✓ Done in {summary["elapsed"]:.1f}s (slowest tenant {summary["slowest_tenant"]:.1f}s). '
+                f'OK: {counts["ok"]}, failed: {counts["failed"]}, timed out: {counts["timeout"]}, skipped: {counts["skipped"]}'
+            ))
+
+        if counts['failed'] or counts['timeout']:
+            raise CommandError(f'{counts["failed"] + counts["timeout"]} tenant(s) did not complete')
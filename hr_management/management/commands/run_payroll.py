@@ -0,0 +1,54 @@
+"""
+Batch payroll run
+Credits a day's or a period's salaries for all active employees in one pass
+(month-end close, backfills); safe to re-run over the same dates
+"""
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from hr_management.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = 'Compute and credit salaries for a date range (default: yesterday)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='First date (YYYY-MM-DD, default: yesterday)'
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='Last date, inclusive (YYYY-MM-DD, default: --start)'
+        )
+        parser.add_argument(
+            '--employee',
+            action='append',
+            dest='employee_ids',
+            help='Limit to an employee id (repeatable)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute and report without writing transactions'
+        )
+
+    def handle(self, *args, **options):
+        if options['start']:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+        else:
+            start = timezone.localdate() - timedelta(days=1)
+        end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else start
+        if end < start:
+            raise CommandError('--end must not be before --start')
+
+        summary = run_payroll(start, end, employee_ids=options['employee_ids'], dry_run=options['dry_run'])
+
+        self.stdout.write(
+            f"  {summary['employee_days']} employee-days: {summary['unchanged']} unchanged, "
+            f"{summary['reversed']} credits reversed, {summary['credited']} credited"
+        )
+        prefix = 'Would credit' if options['dry_run'] else '✓ Credited'
+        self.stdout.write(self.style.SUCCESS(f"{prefix} {summary['total_credited']} for {start} to {end}"))
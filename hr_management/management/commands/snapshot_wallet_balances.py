@@ -0,0 +1,40 @@
+"""
+Store end-of-day wallet balance snapshots
+Run nightly via cron or celery beat; wallet_ledger.balance_at() reads from them
+"""
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from hr_management.models import WalletBalanceSnapshot
+from hr_management.wallet_ledger import snapshot_balances
+
+
+class Command(BaseCommand):
+    help = 'Snapshot every wallet balance at the end of a day (default: yesterday)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Day to snapshot (YYYY-MM-DD, default: yesterday)'
+        )
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            help='Delete snapshots older than this many days before the snapshot day'
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+
+        count = snapshot_balances(day)
+
+        if options['keep_days']:
+            cutoff = day - timedelta(days=options['keep_days'])
+            deleted, _ = WalletBalanceSnapshot.objects.filter(date__lt=cutoff).delete()
+            self.stdout.write(f'  Pruned {deleted} old snapshots')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Stored {count} wallet balance snapshots for {day}'))
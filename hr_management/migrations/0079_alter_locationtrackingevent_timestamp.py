@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-16 10:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_management', '0078_alter_employeeattendance_date_alter_tenant_subdomain'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='locationtrackingevent',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='وقت الحدث'),
+        ),
+    ]
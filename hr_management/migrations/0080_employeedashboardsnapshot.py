@@ -0,0 +1,31 @@
+# Generated by Django 4.2.13 on 2026-10-16 10:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_management', '0079_alter_locationtrackingevent_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeDashboardSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('data', models.JSONField(default=dict, verbose_name='البيانات')),
+                ('etag', models.CharField(max_length=40, verbose_name='ETag')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_snapshots', to='hr_management.employee', verbose_name='الموظف')),
+            ],
+            options={
+                'verbose_name': 'لقطة لوحة الموظف',
+                'verbose_name_plural': 'لقطات لوحة الموظفين',
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
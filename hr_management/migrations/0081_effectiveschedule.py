@@ -0,0 +1,35 @@
+# Generated by Django 4.2.13 on 2026-10-16 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_management', '0080_employeedashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectiveSchedule',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('start_time', models.TimeField(blank=True, null=True, verbose_name='وقت البداية')),
+                ('end_time', models.TimeField(blank=True, null=True, verbose_name='وقت النهاية')),
+                ('source', models.CharField(choices=[('override', 'استثناء دوام'), ('daily', 'جدول الفرع'), ('weekly', 'جدول أسبوعي'), ('none', 'بدون جدول')], max_length=10, verbose_name='المصدر')),
+                ('is_day_off', models.BooleanField(default=False, verbose_name='يوم عطلة')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='effective_schedules', to='hr_management.branch', verbose_name='الفرع')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_schedules', to='hr_management.employee', verbose_name='الموظف')),
+            ],
+            options={
+                'verbose_name': 'جدول فعلي',
+                'verbose_name_plural': 'الجداول الفعلية',
+                'unique_together': {('employee', 'date')},
+                'indexes': [models.Index(fields=['date', 'is_day_off'], name='hr_manageme_date_1b847a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-16 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_management', '0081_effectiveschedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='multiwallettransaction',
+            index=models.Index(fields=['wallet_system', 'wallet_type', 'created_at'], name='hr_manageme_wallet__2a73fa_idx'),
+        ),
+        migrations.CreateModel(
+            name='WalletBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wallet_type', models.CharField(choices=[('main', 'Main Wallet'), ('reimbursement', 'Reimbursement Wallet'), ('advance', 'Advance Wallet')], max_length=20, verbose_name='نوع المحفظة')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='الرصيد')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet_system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='hr_management.employeewalletsystem')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('wallet_system', 'wallet_type', 'date')},
+            },
+        ),
+    ]
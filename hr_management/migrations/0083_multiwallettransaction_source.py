@@ -0,0 +1,95 @@
+# Generated by Django 4.2.13 on 2026-10-16 16:10
+
+import datetime
+import re
+from django.db import migrations, models
+
+DESCRIPTION_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+SHIFT_TYPE = re.compile(r'\((\w+)[: ]')
+
+
+def backfill_salary_sources(apps, schema_editor):
+    """
+    Derive business_date (and the source, where unambiguous) of existing
+    salary credits from the descriptions the salary signals used to match on
+    """
+    db = schema_editor.connection.alias
+    MultiWalletTransaction = apps.get_model('hr_management', 'MultiWalletTransaction')
+    EmployeeAttendance = apps.get_model('hr_management', 'EmployeeAttendance')
+    WorkShift = apps.get_model('hr_management', 'WorkShift')
+
+    credits = MultiWalletTransaction.objects.using(db).filter(
+        transaction_type='salary_credit', business_date__isnull=True
+    ).filter(
+        models.Q(description__startswith='Daily salary for ') |
+        models.Q(description__startswith='Shift salary for ') |
+        models.Q(description__startswith='Paid leave salary for ')
+    ).select_related('wallet_system')
+
+    updated, claimed = [], set()
+    for credit in credits.iterator():
+        match = DESCRIPTION_DATE.search(credit.description)
+        if not match:
+            continue
+        credit.business_date = datetime.date.fromisoformat(match.group())
+        employee_id = credit.wallet_system.employee_id
+
+        if credit.description.startswith('Daily salary for '):
+            candidates = list(EmployeeAttendance.objects.using(db).filter(
+                employee_id=employee_id, date=credit.business_date
+            ).values_list('id', flat=True))
+            source_type = 'attendance'
+        else:
+            shift_type = SHIFT_TYPE.search(credit.description[match.end():])
+            candidates = list(WorkShift.objects.using(db).filter(
+                employee_id=employee_id,
+                check_in__date=credit.business_date,
+                shift_type=shift_type.group(1) if shift_type else ''
+            ).values_list('id', flat=True))
+            source_type = 'work_shift'
+
+        # Only link a source when exactly one record matches
+        if len(candidates) == 1 and (source_type, str(candidates[0])) not in claimed:
+            credit.source_type, credit.source_id = source_type, str(candidates[0])
+            claimed.add((source_type, credit.source_id))
+        updated.append(credit)
+
+        if len(updated) >= 500:
+            MultiWalletTransaction.objects.using(db).bulk_update(updated, ['business_date', 'source_type', 'source_id'])
+            updated = []
+    if updated:
+        MultiWalletTransaction.objects.using(db).bulk_update(updated, ['business_date', 'source_type', 'source_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_management', '0082_walletbalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='multiwallettransaction',
+            name='source_type',
+            field=models.CharField(blank=True, choices=[('attendance', 'Attendance'), ('work_shift', 'Work Shift')], default='', max_length=20, verbose_name='نوع المصدر'),
+        ),
+        migrations.AddField(
+            model_name='multiwallettransaction',
+            name='source_id',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='معرف المصدر'),
+        ),
+        migrations.AddField(
+            model_name='multiwallettransaction',
+            name='business_date',
+            field=models.DateField(blank=True, null=True, verbose_name='تاريخ العمل'),
+        ),
+        migrations.RunPython(backfill_salary_sources, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='multiwallettransaction',
+            index=models.Index(fields=['wallet_system', 'business_date'], name='hr_manageme_wallet__8759a9_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='multiwallettransaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('source_type', ''), _negated=True), fields=('source_type', 'source_id', 'transaction_type'), name='unique_wallet_transaction_source'),
+        ),
+    ]
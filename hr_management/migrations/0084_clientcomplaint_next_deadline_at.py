@@ -0,0 +1,35 @@
+# Generated by Django 4.2.13 on 2026-10-16 16:45
+
+from django.db import migrations, models
+
+
+def schedule_open_tickets(apps, schema_editor):
+    from hr_management.ticket_automation import ThresholdCache, TicketStatusManager
+
+    db = schema_editor.connection.alias
+    ClientComplaint = apps.get_model('hr_management', 'ClientComplaint')
+    TicketDelayThreshold = apps.get_model('hr_management', 'TicketDelayThreshold')
+
+    cache = ThresholdCache(using=db, model=TicketDelayThreshold)
+    tickets = list(ClientComplaint.objects.using(db).filter(last_response_time__isnull=False).exclude(
+        status='closed', automated_status=TicketStatusManager.STATUS_AUTO_CLOSED
+    ))
+    for complaint in tickets:
+        complaint.next_deadline_at = TicketStatusManager.next_deadline(complaint, cache.for_complaint(complaint))
+    ClientComplaint.objects.using(db).bulk_update(tickets, ['next_deadline_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_management', '0083_multiwallettransaction_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientcomplaint',
+            name='next_deadline_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Next delay / auto-close due time (ticket_automation scheduler)', null=True),
+        ),
+        migrations.RunPython(schedule_open_tickets, migrations.RunPython.noop),
+    ]
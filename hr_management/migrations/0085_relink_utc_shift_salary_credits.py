@@ -0,0 +1,72 @@
+# Generated by Django 4.2.13 on 2026-10-16 23:50
+
+import datetime
+import re
+from django.db import migrations
+from django.utils import timezone
+
+DESCRIPTION_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+SHIFT_TYPE = re.compile(r'\((\w+)[: ]')
+
+
+def relink_shift_salary_credits(apps, schema_editor):
+    """
+    Shift salary descriptions carry the UTC date of check-in, while 0083
+    matched them against local check-in dates: shifts starting after local
+    midnight but before UTC midnight were left unlinked, one day early.
+    Match those on the UTC day and move them to the shift's local date.
+    """
+    db = schema_editor.connection.alias
+    MultiWalletTransaction = apps.get_model('hr_management', 'MultiWalletTransaction')
+    WorkShift = apps.get_model('hr_management', 'WorkShift')
+
+    claimed = set(MultiWalletTransaction.objects.using(db).filter(
+        source_type='work_shift', transaction_type='salary_credit'
+    ).values_list('source_id', flat=True))
+
+    credits = MultiWalletTransaction.objects.using(db).filter(
+        transaction_type='salary_credit', source_type=''
+    ).filter(
+        description__regex=r'^(Shift salary for |Paid leave salary for )'
+    ).select_related('wallet_system')
+
+    updated = []
+    for credit in credits.iterator():
+        match = DESCRIPTION_DATE.search(credit.description)
+        if not match:
+            continue
+        utc_day = datetime.datetime.combine(
+            datetime.date.fromisoformat(match.group()), datetime.time.min, tzinfo=datetime.timezone.utc
+        )
+        shift_type = SHIFT_TYPE.search(credit.description[match.end():])
+        candidates = list(WorkShift.objects.using(db).filter(
+            employee_id=credit.wallet_system.employee_id,
+            check_in__gte=utc_day,
+            check_in__lt=utc_day + datetime.timedelta(days=1),
+            shift_type=shift_type.group(1) if shift_type else ''
+        ).values_list('id', 'check_in'))
+
+        # Only link a source when exactly one record matches
+        if len(candidates) == 1 and str(candidates[0][0]) not in claimed:
+            shift_id, check_in = candidates[0]
+            credit.source_type, credit.source_id = 'work_shift', str(shift_id)
+            credit.business_date = timezone.localdate(check_in)
+            claimed.add(credit.source_id)
+            updated.append(credit)
+
+        if len(updated) >= 500:
+            MultiWalletTransaction.objects.using(db).bulk_update(updated, ['business_date', 'source_type', 'source_id'])
+            updated = []
+    if updated:
+        MultiWalletTransaction.objects.using(db).bulk_update(updated, ['business_date', 'source_type', 'source_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr_management', '0084_clientcomplaint_next_deadline_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(relink_shift_salary_credits, migrations.RunPython.noop),
+    ]
@@ -763,6 +763,11 @@ class MultiWalletTransaction(models.Model):
         ('advance_repaid', 'Advance Repaid'),
     ]
 
+    SOURCE_TYPES = [
+        ('attendance', 'Attendance'),
+        ('work_shift', 'Work Shift'),
+    ]
+
     wallet_system = models.ForeignKey(EmployeeWalletSystem, on_delete=models.CASCADE, related_name="multi_transactions")
     wallet_type = models.CharField(max_length=20, choices=WALLET_TYPES, verbose_name="نوع المحفظة")
     transaction_type = models.CharField(max_length=30, choices=TRANSACTION_TYPES, verbose_name="نوع المعاملة")
@@ -772,6 +777,11 @@ class MultiWalletTransaction(models.Model):
     # Optional references for tracking related entities
     reimbursement_request = models.ForeignKey('ReimbursementRequest', on_delete=models.SET_NULL, null=True, blank=True)
     related_transaction = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, verbose_name="المعاملة المرتبطة")
+
+    # Record that produced the transaction (salary credits): idempotency key
+    source_type = models.CharField(max_length=20, choices=SOURCE_TYPES, blank=True, default='', verbose_name="نوع المصدر")
+    source_id = models.CharField(max_length=64, blank=True, default='', verbose_name="معرف المصدر")
+    business_date = models.DateField(null=True, blank=True, verbose_name="تاريخ العمل")
     
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="أنشأ بواسطة")
@@ -781,6 +791,35 @@ class MultiWalletTransaction(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=['wallet_system', 'wallet_type', 'created_at']),
+            models.Index(fields=['wallet_system', 'business_date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_type', 'source_id', 'transaction_type'],
+                condition=~models.Q(source_type=''),
+                name='unique_wallet_transaction_source',
+            ),
+        ]
+
+class WalletBalanceSnapshot(models.Model):
+    """
+    Balance of one wallet at the end of a day. A balance at any date is the
+    latest snapshot plus the ledger delta since (see wallet_ledger.balance_at).
+    """
+    wallet_system = models.ForeignKey(EmployeeWalletSystem, on_delete=models.CASCADE, related_name="balance_snapshots")
+    wallet_type = models.CharField(max_length=20, choices=MultiWalletTransaction.WALLET_TYPES, verbose_name="نوع المحفظة")
+    date = models.DateField(verbose_name="التاريخ")
+    balance = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="الرصيد")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.wallet_type} balance {self.balance} on {self.date}"
+
+    class Meta:
+        unique_together = ("wallet_system", "wallet_type", "date")
+        ordering = ["-date"]
 
 # Legacy models for backward compatibility - will be deprecated
 class Wallet(models.Model):
@@ -873,6 +912,40 @@ class ReimbursementAttachment(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 
+def overdue_q(now=None, prefix=''):
+    """
+    Q object matching overdue tasks (the SQL form of Task.is_overdue):
+    not done, and either from a previous day, or from today, created
+    before 6 PM while it is now past 6 PM.
+
+    prefix: lookup prefix when filtering through a relation (e.g. 'tasks__')
+    """
+    from django.db.models import Q
+
+    now = now or system_now()
+    today = now.date()
+
+    naive_end_of_day = datetime.datetime.combine(today, time(18, 0))
+    end_of_day = timezone.make_aware(naive_end_of_day)
+
+    condition = Q(**{f'{prefix}date__lt': today})
+    if now > end_of_day:
+        condition |= Q(**{f'{prefix}date': today, f'{prefix}created_at__lt': end_of_day})
+
+    return condition & ~Q(**{f'{prefix}status': 'done'})
+
+
+class TaskQuerySet(models.QuerySet):
+    def with_overdue(self, now=None):
+        """
+        Annotate `overdue` (boolean) so it can be counted, filtered and
+        ordered in SQL; Task.is_overdue returns it when present
+        """
+        from django.db.models import BooleanField, ExpressionWrapper
+
+        return self.annotate(overdue=ExpressionWrapper(overdue_q(now), output_field=BooleanField()))
+
+
 class Task(models.Model):
     """Daily TO-DO tasks for employees"""
     STATUS_CHOICES = [
@@ -910,6 +983,8 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True, null=True, verbose_name='Task Notes')
     
+    objects = TaskQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
@@ -923,6 +998,10 @@ class Task(models.Model):
     @property
     def is_overdue(self):
         """Check if task is overdue (not completed by end of day)"""
+        if hasattr(self, 'overdue'):
+            # Annotated by Task.objects.with_overdue()
+            return self.overdue
+        
         from datetime import time
         if self.status == 'done' or self.date > system_now().date():
             return False
@@ -1360,6 +1439,22 @@ class TicketDelayThreshold(models.Model):
         return f"{self.threshold_type.title()} Thresholds"
 
 
+class ClientComplaintQuerySet(models.QuerySet):
+    def with_task_statistics(self):
+        """
+        Annotate task counters used by ClientComplaint.task_statistics,
+        so list pages don't run per-complaint count queries
+        """
+        from django.db.models import Count, Q
+
+        return self.annotate(
+            task_total=Count('tasks', distinct=True),
+            task_completed=Count('tasks', distinct=True, filter=Q(tasks__task__status='done')),
+            task_in_progress=Count('tasks', distinct=True, filter=Q(tasks__task__status='doing')),
+            task_pending=Count('tasks', distinct=True, filter=Q(tasks__task__status='to_do')),
+        )
+
+
 class ClientComplaint(models.Model):
     """Client complaints submitted through public interface"""
     STATUS_CHOICES = [
@@ -1428,11 +1523,15 @@ class ClientComplaint(models.Model):
                                         null=True, blank=True,
                                         related_name='complaints_with_custom_threshold',
                                         help_text="Custom thresholds for this specific ticket")
+    next_deadline_at = models.DateTimeField(null=True, blank=True, db_index=True,
+                                            help_text="Next delay / auto-close due time (ticket_automation scheduler)")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
     
+    objects = ClientComplaintQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "شكوى عميل"
         verbose_name_plural = "شكاوى العملاء"
@@ -1551,13 +1650,28 @@ class ClientComplaint(models.Model):
 
     @property
     def task_statistics(self):
-        """Calculate task progress statistics for this complaint"""
-        all_tasks = Task.objects.filter(client_complaint_task__complaint=self)
-        
-        total_tasks = all_tasks.count()
-        completed_tasks = all_tasks.filter(status='done').count()
-        in_progress_tasks = all_tasks.filter(status='doing').count()
-        pending_tasks = all_tasks.filter(status='to_do').count()
+        """
+        Calculate task progress statistics for this complaint
+        Uses the counters from ClientComplaint.objects.with_task_statistics() when present
+        """
+        if hasattr(self, 'task_total'):
+            total_tasks = self.task_total
+            completed_tasks = self.task_completed
+            in_progress_tasks = self.task_in_progress
+            pending_tasks = self.task_pending
+        else:
+            from django.db.models import Count, Q
+            
+            counts = Task.objects.filter(client_complaint_task__complaint=self).aggregate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(status='done')),
+                in_progress=Count('id', filter=Q(status='doing')),
+                pending=Count('id', filter=Q(status='to_do')),
+            )
+            total_tasks = counts['total']
+            completed_tasks = counts['completed']
+            in_progress_tasks = counts['in_progress']
+            pending_tasks = counts['pending']
         
         # Calculate completion percentage
         completion_percentage = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
@@ -2378,73 +2492,34 @@ class ShiftAttendance(models.Model):
 def get_employee_shift_for_date(employee_id, target_date):
     """
     Get the effective shift for an employee on a specific date
-    Checks overrides first, then falls back to weekly schedule
+    Read from the effective schedule calendar (overrides, daily and weekly
+    schedules), which is materialized for the date on a miss
     """
-    # Check for approved override
-    try:
-        override = ShiftOverride.objects.get(
-            employee_id=employee_id,
-            date=target_date,
-            status='approved'
-        )
-        
-        if override.override_type in ['day_off', 'vacation', 'sick_leave', 'holiday']:
-            return None  # No shift
-        elif override.override_type == 'custom':
-            return {
-                'start_time': override.start_time,
-                'end_time': override.end_time,
-                'is_override': True,
-                'override_type': override.get_override_type_display()
-            }
-    except ShiftOverride.DoesNotExist:
-        pass
-    
-    # Check weekly schedule
-    day_of_week = target_date.weekday()
-    # Convert Python weekday (0=Monday) to our system (0=Sunday)
-    if day_of_week == 6:
-        day_of_week = 0
-    else:
-        day_of_week += 1
-    
-    try:
-        schedule = WeeklyShiftSchedule.objects.get(
-            employee_id=employee_id,
-            day_of_week=day_of_week,
-            is_active=True
-        )
-        return {
-            'start_time': schedule.start_time,
-            'end_time': schedule.end_time,
-            'is_override': False
-        }
-    except WeeklyShiftSchedule.DoesNotExist:
-        return None  # No shift scheduled
+    from .schedule_calendar import get_effective_schedule
+
+    schedule = get_effective_schedule(employee_id, target_date)
+    if schedule.is_day_off:
+        return None  # No shift
+
+    shift = {
+        'start_time': schedule.start_time,
+        'end_time': schedule.end_time,
+        'is_override': schedule.source == 'override'
+    }
+    if shift['is_override']:
+        shift['override_type'] = dict(ShiftOverride.OVERRIDE_TYPES)['custom']
+    return shift
 
 
 def get_employees_on_shift_now():
     """
     Get list of employees who should currently be on shift
+    Resolved by ShiftRoster: employees, overrides and weekly schedules in three queries
     """
-    now = timezone.now()
-    current_date = now.date()
-    current_time = now.time()
-    
-    on_shift = []
-    
-    for employee in Employee.objects.filter(status='active'):
-        shift = get_employee_shift_for_date(employee.id, current_date)
-        
-        if shift and shift['start_time'] <= current_time <= shift['end_time']:
-            on_shift.append({
-                'employee': employee,
-                'start_time': shift['start_time'],
-                'end_time': shift['end_time'],
-                'is_override': shift.get('is_override', False)
-            })
+    from .shift_roster import ShiftRoster
     
-    return on_shift
+    now = timezone.now()
+    return ShiftRoster(now.date()).on_shift(Employee.objects.filter(status='active'), now)
 
 
 def calculate_weekly_hours(employee_id):
@@ -2505,7 +2580,7 @@ class LocationTrackingEvent(models.Model):
         verbose_name='نوع الحدث'
     )
     timestamp = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name='وقت الحدث'
     )
     latitude = models.DecimalField(
@@ -2658,5 +2733,82 @@ class LocationTrackingSummary(models.Model):
         return round((inside_time / total_tracked_time) * 100, 1)
 
 
+
+class EmployeeDashboardSnapshot(models.Model):
+    """
+    Materialized employee dashboard payload for one day
+    Dropped by signals when the underlying data changes and rebuilt on next read
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='dashboard_snapshots',
+        verbose_name='الموظف'
+    )
+    date = models.DateField(verbose_name='التاريخ')
+    data = models.JSONField(default=dict, verbose_name='البيانات')
+    etag = models.CharField(max_length=40, verbose_name='ETag')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'لقطة لوحة الموظف'
+        verbose_name_plural = 'لقطات لوحة الموظفين'
+        unique_together = ['employee', 'date']
+    
+    def __str__(self):
+        return f"{self.employee.name} - {self.date}"
+
+
+class EffectiveSchedule(models.Model):
+    """
+    Materialized effective schedule: one row per employee and date, resolved
+    from ShiftOverride, DailySchedule (multi-branch) and WeeklyShiftSchedule.
+    Built by `python manage.py build_schedule_calendar`, kept fresh by signals.
+    """
+    SOURCE_CHOICES = [
+        ('override', 'استثناء دوام'),
+        ('daily', 'جدول الفرع'),
+        ('weekly', 'جدول أسبوعي'),
+        ('none', 'بدون جدول'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='effective_schedules',
+        verbose_name='الموظف'
+    )
+    date = models.DateField(verbose_name='التاريخ')
+    start_time = models.TimeField(null=True, blank=True, verbose_name='وقت البداية')
+    end_time = models.TimeField(null=True, blank=True, verbose_name='وقت النهاية')
+    branch = models.ForeignKey(
+        Branch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='effective_schedules',
+        verbose_name='الفرع'
+    )
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, verbose_name='المصدر')
+    is_day_off = models.BooleanField(default=False, verbose_name='يوم عطلة')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'جدول فعلي'
+        verbose_name_plural = 'الجداول الفعلية'
+        unique_together = ['employee', 'date']
+        indexes = [
+            models.Index(fields=['date', 'is_day_off']),
+        ]
+    
+    def __str__(self):
+        return f"{self.employee.name} - {self.date} ({self.source})"
+
+    def calculate_hours(self):
+        """Scheduled hours, with the same rules as WeeklyShiftSchedule.calculate_hours"""
+        return WeeklyShiftSchedule(start_time=self.start_time, end_time=self.end_time).calculate_hours()
+
 # Import Tenant models
 from .tenant_models import Tenant, TenantModule, ModuleDefinition, TenantAPIKey
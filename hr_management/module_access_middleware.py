@@ -5,9 +5,16 @@ Automatically checks if the tenant has access to the module being requested
 based on the URL path.
 """
 
+from django.conf import settings
 from django.http import JsonResponse
 from .tenant_models import TenantModule
 from .tenant_db_router import get_current_tenant
+from .tenant_cache import TenantResolutionCache
+import logging
+import random
+import re
+
+logger = logging.getLogger(__name__)
 
 
 # Map URL patterns to module keys
@@ -96,6 +103,85 @@ URL_MODULE_MAP = {
 }
 
 
+# URL prefixes that never require module access
+EXEMPT_URL_PREFIXES = [
+    '/admin/',
+    '/s/api/token/',
+    '/s/api/auth/',
+    '/s/api/tenants/',
+    '/s/api/modules/',
+    '/s/api/public/',
+    '/s/hr/api/token/',
+    '/s/hr/current-user/',  # Always allow current user endpoint
+    '/s/hr/create-tenant/',
+    '/s/hr/public/',
+    '/s/hr/client-portal/',
+    '/s/hr/client/auth/',
+    '/static/',
+    '/media/',
+]
+
+
+def _compile_prefixes(prefixes):
+    """
+    Compile URL prefixes into a single anchored regex.
+    Alternatives keep their declaration order, so the first matching
+    prefix wins exactly like a startswith() loop.
+    """
+    return re.compile('|'.join(re.escape(prefix) for prefix in prefixes))
+
+
+EXEMPT_URL_REGEX = _compile_prefixes(EXEMPT_URL_PREFIXES)
+URL_MODULE_REGEX = _compile_prefixes(URL_MODULE_MAP)
+
+# Enabled-module sets per tenant, invalidated by the TenantModule post_save signal
+module_cache = TenantResolutionCache()
+
+
+def get_tenant_modules(tenant):
+    """
+    Returns {module_key: (is_enabled, module_name)} for a tenant.
+    Cached in memory; one query to the main database on a miss.
+    NOTE: TenantModule is in the main database, not tenant database.
+    """
+    return module_cache.get('modules', tenant.id, lambda: {
+        module_key: (is_enabled, module_name)
+        for module_key, is_enabled, module_name in TenantModule.objects.using('default').filter(
+            tenant_id=tenant.id
+        ).values_list('module_key', 'is_enabled', 'module_name')
+    })
+
+
+def invalidate_tenant_modules(tenant_id):
+    """Drop the cached module set for a tenant"""
+    module_cache.invalidate('modules', tenant_id)
+
+
+def _log_decision(path, module_key, tenant, decision):
+    """
+    Structured access log. Denials are always logged, grants are sampled
+    at MODULE_ACCESS_LOG_SAMPLE_RATE (default 1%).
+    """
+    if decision == 'granted':
+        if random.random() >= getattr(settings, 'MODULE_ACCESS_LOG_SAMPLE_RATE', 0.01):
+            return
+        level = logging.DEBUG
+    else:
+        level = logging.WARNING
+
+    logger.log(
+        level,
+        f"module_access decision={decision} module={module_key} "
+        f"tenant={tenant.subdomain if tenant else None} path={path}",
+        extra={
+            'decision': decision,
+            'module_key': module_key,
+            'tenant': tenant.subdomain if tenant else None,
+            'path': path,
+        }
+    )
+
+
 class ModuleAccessMiddleware:
     """
     Middleware to check if tenant has access to requested module.
@@ -106,28 +192,11 @@ class ModuleAccessMiddleware:
         self.get_response = get_response
     
     def __call__(self, request):
-        # Skip middleware for:
-        # - Admin panel
-        # - Auth endpoints (including current-user for authentication)
-        # - Static files
-        # - Public endpoints
-        
+        # Skip middleware for admin panel, auth endpoints, static files
+        # and public endpoints (see EXEMPT_URL_PREFIXES)
         path = request.path
         
-        if (path.startswith('/admin/') or
-            path.startswith('/s/api/token/') or
-            path.startswith('/s/api/auth/') or
-            path.startswith('/s/api/tenants/') or
-            path.startswith('/s/api/modules/') or
-            path.startswith('/s/api/public/') or
-            path.startswith('/s/hr/api/token/') or
-            path.startswith('/s/hr/current-user/') or  # Always allow current user endpoint
-            path.startswith('/s/hr/create-tenant/') or
-            path.startswith('/s/hr/public/') or
-            path.startswith('/s/hr/client-portal/') or
-            path.startswith('/s/hr/client/auth/') or
-            path.startswith('/static/') or
-            path.startswith('/media/')):
+        if EXEMPT_URL_REGEX.match(path):
             return self.get_response(request)
         
         # Check if this path requires module access
@@ -140,42 +209,16 @@ class ModuleAccessMiddleware:
         # Get current tenant
         tenant = get_current_tenant()
         
-        print(f"\n🔍 MODULE ACCESS CHECK:")
-        print(f"   Path: {path}")
-        print(f"   Module Key: {module_key}")
-        print(f"   Tenant: {tenant}")
-        print(f"   Tenant ID: {tenant.id if tenant else 'None'}")
-        print(f"   X-Tenant-Subdomain Header: {request.headers.get('X-Tenant-Subdomain', 'NOT SET')}")
-        
         if not tenant:
             # No tenant context (might be in main database context)
-            print(f"   ❌ No tenant context found!")
+            _log_decision(path, module_key, None, 'no_tenant')
             return self.get_response(request)
         
         # Check if module is enabled for tenant
-        # NOTE: TenantModule is in the main database, not tenant database
-        # Must explicitly use .using('default') to query main database
-        try:
-            tenant_module = TenantModule.objects.using('default').get(
-                tenant=tenant,
-                module_key=module_key
-            )
-            
-            print(f"   ✅ Found TenantModule: {tenant_module.module_name}")
-            print(f"   Is Enabled: {tenant_module.is_enabled}")
-            
-            if not tenant_module.is_enabled:
-                print(f"   ❌ Module is disabled!")
-                return JsonResponse({
-                    'error': 'module_not_enabled',
-                    'message_ar': f'الوحدة "{tenant_module.module_name}" غير مفعلة لهذا العميل',
-                    'message_en': f'Module "{tenant_module.module_name}" is not enabled for this tenant',
-                    'module_key': module_key,
-                    'module_name': tenant_module.module_name
-                }, status=403)
-            
-        except TenantModule.DoesNotExist:
-            print(f"   ❌ TenantModule.DoesNotExist exception!")
+        module = get_tenant_modules(tenant).get(module_key)
+        
+        if module is None:
+            _log_decision(path, module_key, tenant, 'not_found')
             return JsonResponse({
                 'error': 'module_not_found',
                 'message_ar': f'الوحدة "{module_key}" غير متاحة',
@@ -183,8 +226,19 @@ class ModuleAccessMiddleware:
                 'module_key': module_key
             }, status=403)
         
+        is_enabled, module_name = module
+        if not is_enabled:
+            _log_decision(path, module_key, tenant, 'disabled')
+            return JsonResponse({
+                'error': 'module_not_enabled',
+                'message_ar': f'الوحدة "{module_name}" غير مفعلة لهذا العميل',
+                'message_en': f'Module "{module_name}" is not enabled for this tenant',
+                'module_key': module_key,
+                'module_name': module_name
+            }, status=403)
+        
         # Module is enabled, continue with request
-        print(f"   ✅ Module access granted!\n")
+        _log_decision(path, module_key, tenant, 'granted')
         return self.get_response(request)
     
     def _get_module_key_for_path(self, path):
@@ -192,8 +246,8 @@ class ModuleAccessMiddleware:
         Get module key for a given path.
         Returns None if path doesn't require module access.
         """
-        for url_pattern, module_key in URL_MODULE_MAP.items():
-            if path.startswith(url_pattern):
-                return module_key
+        match = URL_MODULE_REGEX.match(path)
+        if match:
+            return URL_MODULE_MAP[match.group(0)]
         
         return None
@@ -0,0 +1,300 @@
+"""
+Payroll Run
+Batch salary crediting for a day or a period
+
+run_payroll() computes every salary credit of a date range with the same
+rules as the attendance / work shift signals (attendance_salary and
+shift_salary are shared with them), from a handful of set-based queries:
+
+    employees, work shifts, schedule calendar rows, attendance records,
+    wallet systems, existing salary credits
+
+It is idempotent per employee and date: credits are keyed by business_date
+and their source record (attendance / work_shift). When the credits already
+in the ledger match the computed ones (amount, source and date) nothing is
+written; otherwise that day's credits are reversed and re-posted with
+bulk_create (wallet_ledger batch postings). Credits of a computed source are
+found whatever business_date they were posted under. Legacy single wallets
+are not touched.
+
+    python manage.py run_payroll --start 2025-01-01 --end 2025-01-31
+    POST hr/payroll/run/ {"start_date": "2025-01-01", "end_date": "2025-01-31"}
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import (
+    Employee, EmployeeAttendance, WorkShift, EmployeeWalletSystem, MultiWalletTransaction
+)
+from .schedule_calendar import get_effective_schedules
+from .wallet_ledger import post_batch, reverse_batch
+
+SALARY_DAYS = 30
+STANDARD_WORK_HOURS = 8
+GRACE_MINUTES = 15
+
+CENTS = Decimal('0.01')
+
+
+def daily_rate(employee):
+    return Decimal(employee.salary) / Decimal(SALARY_DAYS)
+
+
+def _aware(target_date, value):
+    """Attendance times may be datetimes or times of target_date"""
+    if isinstance(value, datetime.datetime):
+        return value
+    return timezone.make_aware(datetime.datetime.combine(target_date, value))
+
+
+def attendance_salary(record, employee):
+    """
+    (amount, status) for a checked-out attendance record or a leave day.
+    status is 'present' / 'late' after the grace period, or unchanged.
+    """
+    if record.status in ['absent', 'on_leave']:
+        if record.status == 'on_leave' and record.paid:
+            return daily_rate(employee), record.status
+        return Decimal(0), record.status
+    if not record.check_in or not record.check_out:
+        return Decimal(0), record.status
+
+    shift_start = _aware(record.date, employee.shift_start_time)
+    shift_end = _aware(record.date, employee.shift_end_time)
+    check_in_time = _aware(record.date, record.check_in)
+    check_out_time = _aware(record.date, record.check_out)
+
+    shift_hours = (shift_end - shift_start).total_seconds() / 3600
+    worked_hours = (check_out_time - check_in_time).total_seconds() / 3600
+
+    delay = (check_in_time - shift_start).total_seconds() / 60 if check_in_time > shift_start else 0
+    status = 'present' if delay <= GRACE_MINUTES else 'late'
+
+    if worked_hours < shift_hours / 2:
+        return Decimal(0), status
+    if worked_hours < shift_hours:
+        return daily_rate(employee) * Decimal(worked_hours / shift_hours), status
+
+    total_salary = daily_rate(employee)
+    if check_out_time > shift_end:
+        overtime_seconds = (check_out_time - shift_end).total_seconds()
+        if overtime_seconds > (15 * 60):
+            total_salary += Decimal(employee.overtime_rate) * Decimal(overtime_seconds / 3600)
+    return total_salary, status
+
+
+def shift_date(shift):
+    """Business date of a shift: the local date of its check-in"""
+    return timezone.localdate(shift.check_in) if shift.check_in else shift.attendance.date
+
+
+def has_work_shifts(record, using=None):
+    """Whether an attendance record has work shifts (they are paid instead of the record)"""
+    return WorkShift.objects.using(using).filter(attendance_id=record.pk).exists()
+
+
+def scheduled_hours_row(row):
+    """A calendar row as shift_salary's schedule: None (8 hour default) on days without scheduled hours"""
+    if row is None or row.is_day_off or not (row.start_time and row.end_time):
+        return None
+    return row
+
+
+def shift_salary(shift, employee, schedule=None):
+    """
+    (amount, description) for a work shift. schedule is the employee's
+    calendar row (EffectiveSchedule) for the shift's day, see
+    scheduled_hours_row (None: 8 hour default).
+    """
+    day = shift_date(shift)
+
+    if not shift.check_out or shift.status in ['absent', 'on_leave']:
+        if shift.status == 'on_leave' and shift.is_paid_leave:
+            return daily_rate(employee), f"Paid leave salary for {employee.name} - {day} ({shift.shift_type} shift)"
+        return Decimal(0), ''
+
+    hourly_rate = daily_rate(employee) / Decimal(STANDARD_WORK_HOURS)
+    shift_hours = schedule.calculate_hours() if schedule else STANDARD_WORK_HOURS
+
+    worked_seconds = (shift.check_out - shift.check_in).total_seconds() - ((shift.total_break_time or 0) * 60)
+    worked_hours = worked_seconds / 3600
+
+    # Less than an hour is not paid
+    if worked_hours < 1:
+        return Decimal(0), ''
+
+    total_salary = hourly_rate * Decimal(min(worked_hours, shift_hours))
+    overtime_info = ""
+    if worked_hours > shift_hours:
+        overtime_hours = worked_hours - shift_hours
+        # Overtime rate if set, otherwise 1.5x the regular rate
+        overtime_rate = Decimal(employee.overtime_rate) if employee.overtime_rate > 0 else (hourly_rate * Decimal(1.5))
+        total_salary += overtime_rate * Decimal(overtime_hours)
+        overtime_info = f" + {overtime_hours:.1f}h OT"
+
+    return total_salary, f"Shift salary for {employee.name} - {day} ({shift.shift_type}: {worked_hours:.1f}h{overtime_info})"
+
+
+def compute_salary_credits(start_date, end_date, employees, using=None):
+    """
+    {(employee_id, date): [(amount, description, source_type, source_id), ...]} for every employee-day
+    with attendance in the range. Work shifts take precedence over the
+    attendance record they belong to, as in the signals (has_work_shifts).
+    """
+    employees_by_id = {employee.id: employee for employee in employees}
+    ids = list(employees_by_id)
+    credits = defaultdict(list)
+
+    calendar = get_effective_schedules(ids, start_date, end_date, using=using)
+
+    # __date lookups use the current (local) time zone, like shift_date
+    shifts = WorkShift.objects.using(using).filter(
+        employee_id__in=ids,
+        check_in__date__range=(start_date, end_date)
+    ).select_related('attendance')
+
+    for shift in shifts:
+        day = shift_date(shift)
+        employee = employees_by_id[shift.employee_id]
+        amount, description = shift_salary(shift, employee, scheduled_hours_row(calendar.get((shift.employee_id, day))))
+        # Register the day even without pay, so stale credits get reversed
+        day_credits = credits[(shift.employee_id, day)]
+        if amount > 0:
+            day_credits.append((amount, description, 'work_shift', str(shift.id)))
+
+    records = EmployeeAttendance.objects.using(using).filter(
+        employee_id__in=ids, date__range=(start_date, end_date)
+    ).filter(Q(check_out__isnull=False) | Q(status='on_leave'))
+    # Same rule as has_work_shifts, for all records at once
+    attendance_with_shifts = set(
+        WorkShift.objects.using(using).filter(attendance__in=records).values_list('attendance_id', flat=True)
+    )
+    for record in records:
+        if record.id in attendance_with_shifts:
+            continue
+        amount, _ = attendance_salary(record, employees_by_id[record.employee_id])
+        day_credits = credits[(record.employee_id, record.date)]
+        if amount > 0:
+            day_credits.append((amount, f"Daily salary for {record.date}", 'attendance', str(record.id)))
+
+    return credits
+
+
+def existing_salary_credits(wallet_systems, start_date, end_date, credits=None, using=None):
+    """
+    {(employee_id, date): [MultiWalletTransaction, ...]} for the salary credits
+    already posted for business dates in the range, and for the sources of
+    `credits` (compute_salary_credits) whatever their business date. The
+    latter are keyed by the day their source is credited on now, so a credit
+    posted under another date is reconciled instead of posted twice.
+    """
+    employee_by_wallet = {pk: employee_id for employee_id, pk in wallet_systems.items()}
+    day_by_source = {
+        (source_type, source_id): key
+        for key, day_credits in (credits or {}).items()
+        for _, _, source_type, source_id in day_credits
+    }
+
+    matching = Q(business_date__range=(start_date, end_date))
+    source_ids = defaultdict(list)
+    for source_type, source_id in day_by_source:
+        source_ids[source_type].append(source_id)
+    for source_type, ids in source_ids.items():
+        matching |= Q(source_type=source_type, source_id__in=ids)
+
+    existing = defaultdict(list)
+    for wallet_transaction in MultiWalletTransaction.objects.using(using).filter(
+        matching,
+        wallet_system_id__in=list(employee_by_wallet),
+        transaction_type='salary_credit'
+    ):
+        key = day_by_source.get((wallet_transaction.source_type, wallet_transaction.source_id)) or (
+            employee_by_wallet[wallet_transaction.wallet_system_id], wallet_transaction.business_date
+        )
+        existing[key].append(wallet_transaction)
+    return existing
+
+
+def _wallet_systems(employees, using=None):
+    """{employee_id: wallet_system_id}, creating missing wallet systems"""
+    from .signals import get_or_create_wallet_system
+
+    wallet_systems = dict(
+        EmployeeWalletSystem.objects.using(using).filter(
+            employee_id__in=[employee.id for employee in employees]
+        ).values_list('employee_id', 'id')
+    )
+    for employee in employees:
+        if employee.id not in wallet_systems:
+            wallet_systems[employee.id] = get_or_create_wallet_system(employee, using=using).id
+    return wallet_systems
+
+
+def _postings(items):
+    """Comparable (amount, source_type, source_id, business_date) of credits"""
+    return sorted((Decimal(amount).quantize(CENTS), source_type, str(source_id), day)
+                  for amount, source_type, source_id, day in items)
+
+
+def run_payroll(start_date, end_date=None, employee_ids=None, dry_run=False, using=None):
+    """
+    Credit salaries for start_date..end_date (inclusive) to active employees
+    (or only employee_ids). Returns a summary dict.
+    """
+    end_date = end_date or start_date
+    db = using or MultiWalletTransaction.objects.db
+
+    employees = Employee.objects.using(db).filter(status='active')
+    if employee_ids is not None:
+        employees = employees.filter(id__in=employee_ids)
+    employees = list(employees)
+
+    credits = compute_salary_credits(start_date, end_date, employees, using=db)
+    wallet_systems = _wallet_systems(employees, using=db)
+    existing = existing_salary_credits(wallet_systems, start_date, end_date, credits, using=db)
+
+    stale, new, unchanged = [], [], 0
+    for key in set(credits) | set(existing):
+        employee_id, day = key
+        current = existing.get(key, [])
+        expected = credits.get(key, [])
+        # Same amounts under the same sources and date: nothing to repost
+        if _postings((t.amount, t.source_type, t.source_id, t.business_date) for t in current) == _postings(
+            (amount, source_type, source_id, day) for amount, _, source_type, source_id in expected
+        ):
+            unchanged += 1
+            continue
+        stale.extend(current)
+        new.extend(
+            MultiWalletTransaction(
+                wallet_system_id=wallet_systems[employee_id],
+                wallet_type='main',
+                transaction_type='salary_credit',
+                amount=Decimal(amount).quantize(CENTS),
+                description=description,
+                source_type=source_type,
+                source_id=source_id,
+                business_date=day
+            )
+            for amount, description, source_type, source_id in expected
+        )
+
+    if not dry_run:
+        with transaction.atomic(using=db):
+            reverse_batch(stale, using=db)
+            post_batch(new, using=db)
+
+    return {
+        'start_date': str(start_date),
+        'end_date': str(end_date),
+        'employees': len(employees),
+        'employee_days': len(set(credits) | set(existing)),
+        'unchanged': unchanged,
+        'reversed': len(stale),
+        'credited': len(new),
+        'total_credited': str(sum((t.amount for t in new), Decimal('0'))),
+        'dry_run': dry_run,
+    }
@@ -0,0 +1,49 @@
+"""
+Query Budget
+Guard for endpoints whose query count must not grow with page size
+
+    with query_budget(15, using=ClientComplaint.objects.db, label='complaint list'):
+        response = super().list(request, *args, **kwargs)
+
+Going over budget raises QueryBudgetExceeded when QUERY_BUDGET_STRICT is on
+(default: settings.DEBUG), so N+1 regressions fail loudly in development
+and tests; in production it only logs a warning.
+"""
+import logging
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget:
+    """Context manager counting queries executed on one database connection"""
+
+    def __init__(self, budget, using='default', label=''):
+        self.budget = budget
+        self.using = using
+        self.label = label
+        self.count = 0
+        self._wrapper_cm = None
+
+    def _count(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper_cm = connections[self.using].execute_wrapper(self._count)
+        self._wrapper_cm.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._wrapper_cm.__exit__(exc_type, exc, tb)
+        if exc_type is None and self.count > self.budget:
+            message = f"Query budget exceeded for {self.label or self.using}: {self.count} > {self.budget}"
+            if getattr(settings, 'QUERY_BUDGET_STRICT', settings.DEBUG):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return False
@@ -0,0 +1,205 @@
+"""
+Effective Schedule Calendar
+Materialized employee x date schedule (EffectiveSchedule)
+
+Resolution order, per employee and date:
+  1. approved ShiftOverride (day off types, or custom hours)
+  2. working DailySchedule of an active branch assignment (earliest start wins)
+  3. active WeeklyShiftSchedule (legacy)
+  4. otherwise a day off
+
+The calendar covers a rolling window (SCHEDULE_CALENDAR_DAYS, default 60)
+built nightly by `python manage.py build_schedule_calendar` (celery beat,
+see hr_management.schedule_tasks); signals on the schedule models
+recompute the affected employees' rows once per transaction.
+
+Read by get_employee_shift_for_date, the employee dashboard, the shift
+salary signal and payroll run (scheduled hours) and the daily report;
+dates not built yet are materialized on first read.
+"""
+from collections import defaultdict
+import datetime
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import (
+    Employee, ShiftOverride, DailySchedule, WeeklyShiftSchedule, EffectiveSchedule
+)
+from .shift_roster import DAY_OFF_OVERRIDES, schedule_day
+
+
+def calendar_window(start=None, days=None):
+    """Dates of the rolling window starting at `start` (default: today)"""
+    start = start or timezone.now().date()
+    days = days or getattr(settings, 'SCHEDULE_CALENDAR_DAYS', 60)
+    return [start + datetime.timedelta(days=i) for i in range(days)]
+
+
+def _daily_sort_key(schedule):
+    # Schedules without a start time sort last
+    return (schedule['shift_start_time'] is None, schedule['shift_start_time'] or datetime.time.min)
+
+
+def resolve_schedules(employee_ids, dates, using=None, filter_employees=True):
+    """
+    Effective schedule rows (unsaved EffectiveSchedule objects) for every
+    employee and date, from three queries. With filter_employees=False the
+    schedule tables are read whole (used for full rebuilds).
+    """
+    start, end = min(dates), max(dates)
+
+    overrides = ShiftOverride.objects.using(using).filter(date__range=(start, end), status='approved')
+    daily = DailySchedule.objects.using(using).filter(employee_branch__is_active=True, is_working_day=True)
+    weekly = WeeklyShiftSchedule.objects.using(using).filter(is_active=True)
+    if filter_employees:
+        overrides = overrides.filter(employee_id__in=employee_ids)
+        daily = daily.filter(employee_branch__employee_id__in=employee_ids)
+        weekly = weekly.filter(employee_id__in=employee_ids)
+
+    overrides_by_day = {(o.employee_id, o.date): o for o in overrides}
+    weekly_by_day = {(s.employee_id, s.day_of_week): s for s in weekly}
+    daily_by_day = defaultdict(list)
+    for schedule in daily.values(
+        'employee_branch__employee_id', 'employee_branch__branch_id',
+        'day_of_week', 'shift_start_time', 'shift_end_time'
+    ):
+        daily_by_day[(schedule['employee_branch__employee_id'], schedule['day_of_week'])].append(schedule)
+
+    rows = []
+    for employee_id in employee_ids:
+        for target_date in dates:
+            row = EffectiveSchedule(employee_id=employee_id, date=target_date)
+            override = overrides_by_day.get((employee_id, target_date))
+            day = schedule_day(target_date)
+
+            if override and override.override_type in DAY_OFF_OVERRIDES:
+                row.source, row.is_day_off = 'override', True
+            elif override and override.override_type == 'custom':
+                row.source = 'override'
+                row.start_time, row.end_time = override.start_time, override.end_time
+            elif daily_by_day.get((employee_id, day)):
+                earliest = min(daily_by_day[(employee_id, day)], key=_daily_sort_key)
+                row.source = 'daily'
+                row.start_time, row.end_time = earliest['shift_start_time'], earliest['shift_end_time']
+                row.branch_id = earliest['employee_branch__branch_id']
+            elif (employee_id, day) in weekly_by_day:
+                schedule = weekly_by_day[(employee_id, day)]
+                row.source = 'weekly'
+                row.start_time, row.end_time = schedule.start_time, schedule.end_time
+            else:
+                row.source, row.is_day_off = 'none', True
+            rows.append(row)
+    return rows
+
+
+def build_calendar(dates, employee_ids=None, using=None):
+    """
+    Recompute calendar rows for the given employees (default: all active)
+    on the given dates. Returns the number of rows written.
+    """
+    db = using or EffectiveSchedule.objects.db
+    rebuild_all = employee_ids is None
+    if rebuild_all:
+        employee_ids = list(Employee.objects.using(db).filter(status='active').values_list('id', flat=True))
+
+    rows = resolve_schedules(employee_ids, dates, using=db, filter_employees=not rebuild_all)
+
+    with transaction.atomic(using=db):
+        stale = EffectiveSchedule.objects.using(db).filter(date__in=dates)
+        if not rebuild_all:
+            stale = stale.filter(employee_id__in=employee_ids)
+        stale.delete()
+        EffectiveSchedule.objects.using(db).bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def refresh_employee_calendar(employee_id, extra_dates=(), using=None):
+    """Recompute one employee's rows over the rolling window (plus extra_dates)"""
+    refresh_employees_calendar({employee_id: extra_dates}, using)
+
+
+def refresh_employees_calendar(extra_dates_by_employee, using=None):
+    """
+    Recompute the rows of several employees ({employee_id: extra_dates}) over
+    the rolling window plus all their extra dates, in one build
+    """
+    employee_ids = list(Employee.objects.using(using).filter(
+        pk__in=list(extra_dates_by_employee)
+    ).values_list('id', flat=True))
+    if not employee_ids:
+        return
+    dates = set(calendar_window())
+    for extra_dates in extra_dates_by_employee.values():
+        dates.update(extra_dates)
+    build_calendar(sorted(dates), employee_ids, using)
+
+
+# Employees whose rows wait for the current transaction to commit, per database
+_pending = threading.local()
+
+
+def queue_employee_refresh(employee_id, using, extra_dates=()):
+    """
+    Recompute an employee's rows after commit. Saves within one transaction
+    (a week of DailySchedule edits) are coalesced into a single rebuild.
+    """
+    if not hasattr(_pending, 'refreshes'):
+        _pending.refreshes = {}
+    pending = _pending.refreshes.setdefault(using, {})
+    pending.setdefault(employee_id, set()).update(extra_dates)
+    # Every save registers the flush, so a rolled back transaction only
+    # leaves its employees to the next commit (the rebuild is idempotent)
+    transaction.on_commit(lambda: flush_employee_refreshes(using), using=using)
+
+
+def flush_employee_refreshes(using):
+    """Rebuild all queued employees of a database (no-op when already flushed)"""
+    pending = getattr(_pending, 'refreshes', {}).pop(using, None)
+    if pending:
+        refresh_employees_calendar(pending, using)
+
+
+def ensure_calendar(target_date, using=None):
+    """
+    Build the calendar for a date unless every active employee already has
+    a row on it (per-employee refreshes leave partially built dates)
+    """
+    missing = Employee.objects.using(using).filter(status='active').exclude(
+        effective_schedules__date=target_date
+    )
+    if missing.exists():
+        build_calendar([target_date], using=using)
+
+
+def get_effective_schedule(employee_id, target_date, using=None):
+    """Calendar row for an employee and date, materialized on a miss"""
+    row = EffectiveSchedule.objects.using(using).filter(employee_id=employee_id, date=target_date).first()
+    if row is None:
+        build_calendar([target_date], [employee_id], using)
+        row = EffectiveSchedule.objects.using(using).get(employee_id=employee_id, date=target_date)
+    return row
+
+
+def get_effective_schedules(employee_ids, start_date, end_date, using=None):
+    """
+    {(employee_id, date): calendar row} for the employees over a date range,
+    materializing the missing rows in one build
+    """
+    dates = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    rows = EffectiveSchedule.objects.using(using).filter(
+        employee_id__in=employee_ids, date__range=(start_date, end_date)
+    )
+    calendar = {(row.employee_id, row.date): row for row in rows}
+
+    missing = [(employee_id, day) for employee_id in employee_ids for day in dates
+               if (employee_id, day) not in calendar]
+    if missing:
+        missing_ids = sorted({employee_id for employee_id, _ in missing})
+        missing_dates = sorted({day for _, day in missing})
+        build_calendar(missing_dates, missing_ids, using)
+        for row in EffectiveSchedule.objects.using(using).filter(
+            employee_id__in=missing_ids, date__in=missing_dates
+        ):
+            calendar[(row.employee_id, row.date)] = row
+    return calendar
@@ -0,0 +1,18 @@
+"""
+Celery tasks for the materialized effective-schedule calendar
+"""
+from celery import shared_task
+from django.core.management import call_command
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def build_schedule_calendars():
+    """
+    Roll every tenant's schedule calendar forward (runs nightly).
+    Equivalent to: python manage.py run_for_all_tenants build_schedule_calendar --prune
+    """
+    logger.info('📅 Building schedule calendars for all tenants')
+    call_command('run_for_all_tenants', 'build_schedule_calendar', '--prune')
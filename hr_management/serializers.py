@@ -25,6 +25,7 @@ from .models import (
     get_employee_shift_for_date, calculate_weekly_hours
 )
 from utils.timezone_utils import system_now
+from .sparse_fields import SparseFieldsetMixin
 
 
 class BranchSerializer(serializers.ModelSerializer):
@@ -418,9 +419,13 @@ class MultiWalletTransactionSerializer(serializers.ModelSerializer):
         fields = [
             "id", "wallet_type", "transaction_type", "amount", "description",
             "reimbursement_request", "related_transaction", "created_at", 
-            "created_by", "created_by_name", "employee_name"
+            "created_by", "created_by_name", "employee_name",
+            "source_type", "source_id", "business_date"
+        ]
+        read_only_fields = [
+            "created_at", "created_by", "employee_name", "created_by_name",
+            "source_type", "source_id", "business_date"
         ]
-        read_only_fields = ["created_at", "created_by", "employee_name", "created_by_name"]
     
     def validate(self, data):
         transaction_type = data.get('transaction_type')
@@ -648,6 +653,13 @@ class TaskSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_by', 'created_at', 'updated_at', 'time_spent', 'is_overdue', 'is_paused', 'paused_at', 'total_pause_time', 'employee_name', 'team_name']
 
 
+class TaskListSerializer(SparseFieldsetMixin, TaskSerializer):
+    """Task list pages: nested comments/subtasks only with ?expand=comments,subtasks"""
+    
+    class Meta(TaskSerializer.Meta):
+        expandable_fields = ['comments', 'subtasks']
+
+
 class ShareableTaskLinkSerializer(serializers.ModelSerializer):
     """Serializer for shareable task links"""
     task_title = serializers.CharField(source='task.title', read_only=True)
@@ -1131,11 +1143,19 @@ class ClientComplaintSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at',
             # Automated status tracking fields
             'automated_status', 'automated_status_message', 'display_status_combined', 
-            'last_responder', 'last_response_time', 'delay_status',
+            'last_responder', 'last_response_time', 'delay_status', 'next_deadline_at',
             'attachments', 'assignments', 'employee_assignments', 'tasks', 'comments', 'status_history'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'is_overdue', 'task_statistics', 
-                           'automated_status', 'last_responder', 'last_response_time', 'delay_status']
+                           'automated_status', 'last_responder', 'last_response_time', 'delay_status',
+                           'next_deadline_at']
+
+
+class ClientComplaintListSerializer(SparseFieldsetMixin, ClientComplaintSerializer):
+    """Complaint list pages: nested relations only with ?expand=<field>,..."""
+    
+    class Meta(ClientComplaintSerializer.Meta):
+        expandable_fields = ['attachments', 'assignments', 'employee_assignments', 'tasks', 'comments', 'status_history']
 
 
 class ClientComplaintStatusUpdateSerializer(serializers.Serializer):
@@ -0,0 +1,109 @@
+"""
+Shift Roster
+Effective shifts for many employees and dates from a constant number of queries
+
+ShiftRoster loads the approved overrides of a date range and the active
+weekly schedules in two queries, then resolves shifts in memory with the
+same rules as get_employee_shift_for_date (override first, weekly
+schedule second).
+"""
+from collections import defaultdict
+from django.utils import timezone
+from .models import ShiftOverride, WeeklyShiftSchedule, WorkShift, EmployeeAttendance
+
+DAY_OFF_OVERRIDES = ['day_off', 'vacation', 'sick_leave', 'holiday']
+
+
+def schedule_day(target_date):
+    """Python weekday (0=Monday) -> schedule day_of_week (0=Sunday)"""
+    return (target_date.weekday() + 1) % 7
+
+
+class ShiftRoster:
+    """
+    Effective shifts between start_date and end_date (inclusive),
+    optionally limited to some employees
+    """
+
+    def __init__(self, start_date, end_date=None, employee_ids=None):
+        self.start_date = start_date
+        self.end_date = end_date or start_date
+
+        overrides = ShiftOverride.objects.filter(
+            date__range=(self.start_date, self.end_date),
+            status='approved'
+        )
+        schedules = WeeklyShiftSchedule.objects.filter(is_active=True)
+        if employee_ids is not None:
+            overrides = overrides.filter(employee_id__in=employee_ids)
+            schedules = schedules.filter(employee_id__in=employee_ids)
+
+        # (employee, date) and (employee, day_of_week) are unique on these models
+        self._overrides = {(o.employee_id, o.date): o for o in overrides}
+        self._schedules = {(s.employee_id, s.day_of_week): s for s in schedules}
+
+    def shift_for(self, employee_id, target_date):
+        """Same result as get_employee_shift_for_date, without queries"""
+        override = self._overrides.get((employee_id, target_date))
+        if override:
+            if override.override_type in DAY_OFF_OVERRIDES:
+                return None
+            if override.override_type == 'custom':
+                return {
+                    'start_time': override.start_time,
+                    'end_time': override.end_time,
+                    'is_override': True,
+                    'override_type': override.get_override_type_display()
+                }
+
+        schedule = self._schedules.get((employee_id, schedule_day(target_date)))
+        if schedule:
+            return {
+                'start_time': schedule.start_time,
+                'end_time': schedule.end_time,
+                'is_override': False
+            }
+        return None
+
+    def shifts_for(self, employee_id, dates):
+        """{date: shift or None} for one employee"""
+        return {d: self.shift_for(employee_id, d) for d in dates}
+
+    def on_shift(self, employees, now=None):
+        """
+        Employees whose effective shift covers `now`
+        (same shape as get_employees_on_shift_now)
+        """
+        now = now or timezone.now()
+        current_time = now.time()
+
+        on_shift = []
+        for employee in employees:
+            shift = self.shift_for(employee.id, now.date())
+            if shift and shift['start_time'] <= current_time <= shift['end_time']:
+                on_shift.append({
+                    'employee': employee,
+                    'start_time': shift['start_time'],
+                    'end_time': shift['end_time'],
+                    'is_override': shift.get('is_override', False)
+                })
+        return on_shift
+
+
+def load_attendance(employee_ids, target_date):
+    """
+    Today's work shifts and attendance records for many employees in two queries.
+    Returns (shifts_by_employee, attendance_by_employee); shift lists are ordered by check-in.
+    """
+    shifts_by_employee = defaultdict(list)
+    for shift in WorkShift.objects.filter(
+        employee_id__in=employee_ids,
+        check_in__date=target_date
+    ).order_by('check_in'):
+        shifts_by_employee[shift.employee_id].append(shift)
+
+    attendance_by_employee = {
+        record.employee_id: record
+        for record in EmployeeAttendance.objects.filter(employee_id__in=employee_ids, date=target_date)
+    }
+    return shifts_by_employee, attendance_by_employee
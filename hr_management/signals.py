@@ -4,12 +4,15 @@ from django.dispatch import receiver
 from hr_management.models import Employee, User
 from .models import (
     Wallet, WalletTransaction, EmployeeAttendance, WorkShift, LeaveRequest,
-    EmployeeWalletSystem, MainWallet, ReimbursementWallet, AdvanceWallet, MultiWalletTransaction
+    EmployeeWalletSystem, MainWallet, ReimbursementWallet, AdvanceWallet, MultiWalletTransaction,
+    Branch, EmployeeBranch, DailySchedule, WeeklyShiftSchedule, ShiftOverride, Complaint,
+    ClientComplaint, TicketDelayThreshold
 )
+from .branch_index import invalidate_branch_index
+from .wallet_ledger import post_transaction, reverse_transaction, reverse_batch, source_transactions
+from .payroll import attendance_salary, shift_salary, shift_date, has_work_shifts, scheduled_hours_row
 from django.utils import timezone
-from django.db import transaction as db_transaction
 from django.db import models
-import decimal
 from datetime import datetime, timedelta
 
 
@@ -31,48 +34,143 @@ def get_or_create_wallet_system(employee, using=None):
     
     return wallet_system
 
-def create_multi_wallet_transaction(wallet_system, wallet_type, transaction_type, amount, description, created_by=None):
+def create_multi_wallet_transaction(wallet_system, wallet_type, transaction_type, amount, description, created_by=None,
+                                    source_type='', source_id='', business_date=None):
     """Create a transaction and update the appropriate wallet balance"""
-    with db_transaction.atomic():
-        # Create the transaction record
-        wallet_transaction = MultiWalletTransaction.objects.create(
-            wallet_system=wallet_system,
-            wallet_type=wallet_type,
-            transaction_type=transaction_type,
-            amount=amount,
-            description=description,
-            created_by=created_by
-        )
-        
-        # Update the appropriate wallet balance
-        if wallet_type == 'main':
-            wallet = wallet_system.main_wallet
-        elif wallet_type == 'reimbursement':
-            wallet = wallet_system.reimbursement_wallet
-        elif wallet_type == 'advance':
-            wallet = wallet_system.advance_wallet
-        else:
-            raise ValueError(f"Invalid wallet type: {wallet_type}")
-        
-        # Determine if this is a credit or debit based on transaction type
-        credit_transactions = [
-            'salary_credit', 'bonus_credit', 'manual_deposit', 'reimbursement_payment',
-            'reimbursement_approved', 'advance_taken'
-        ]
-        debit_transactions = [
-            'advance_withdrawal', 'manual_withdrawal', 'advance_deduction', 
-            'reimbursement_paid', 'advance_repaid'
-        ]
-        
-        if transaction_type in credit_transactions:
-            wallet.balance = decimal.Decimal(str(wallet.balance)) + decimal.Decimal(str(amount))
-        elif transaction_type in debit_transactions:
-            wallet.balance = decimal.Decimal(str(wallet.balance)) - decimal.Decimal(str(amount))
-        else:
-            raise ValueError(f"Unknown transaction type: {transaction_type}")
-        
-        wallet.save()
-        return wallet_transaction
+    return post_transaction(
+        wallet_system, wallet_type, transaction_type, amount, description, created_by=created_by,
+        source_type=source_type, source_id=source_id, business_date=business_date
+    )
+
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+def refresh_branch_index(sender, instance, using, **kwargs):
+    """Rebuild the tenant's branch spatial index on next use"""
+    invalidate_branch_index(using)
+
+
+# Employee dashboard snapshots - drop them when the underlying data changes
+@receiver(post_save, sender=WorkShift)
+@receiver(post_delete, sender=WorkShift)
+@receiver(post_save, sender=ShiftOverride)
+@receiver(post_delete, sender=ShiftOverride)
+@receiver(post_save, sender=WeeklyShiftSchedule)
+@receiver(post_delete, sender=WeeklyShiftSchedule)
+@receiver(post_save, sender=EmployeeBranch)
+@receiver(post_delete, sender=EmployeeBranch)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+@receiver(post_save, sender=Complaint)
+@receiver(post_delete, sender=Complaint)
+@receiver(post_save, sender=EmployeeWalletSystem)
+def refresh_employee_dashboard(sender, instance, using, **kwargs):
+    """Invalidate the dashboard snapshot of the employee the record belongs to"""
+    from .employee_dashboard import invalidate_dashboard_snapshots
+    invalidate_dashboard_snapshots(instance.employee_id, using)
+
+
+@receiver(post_save, sender=DailySchedule)
+@receiver(post_delete, sender=DailySchedule)
+def refresh_employee_dashboard_for_schedule(sender, instance, using, **kwargs):
+    from .employee_dashboard import invalidate_dashboard_snapshots
+    employee_id = EmployeeBranch.objects.using(using).filter(
+        pk=instance.employee_branch_id
+    ).values_list('employee_id', flat=True).first()
+    if employee_id:
+        invalidate_dashboard_snapshots(employee_id, using)
+
+
+# Effective schedule calendar - recompute the employee's rolling window
+def schedule_calendar_refresh(employee_id, using, extra_dates=()):
+    """
+    Recompute after commit: cascade deletes of an employee send these
+    signals before the employee row itself is gone
+    """
+    from .schedule_calendar import queue_employee_refresh
+    queue_employee_refresh(employee_id, using, extra_dates)
+
+
+@receiver(post_save, sender=ShiftOverride)
+@receiver(post_delete, sender=ShiftOverride)
+@receiver(post_save, sender=WeeklyShiftSchedule)
+@receiver(post_delete, sender=WeeklyShiftSchedule)
+@receiver(post_save, sender=EmployeeBranch)
+@receiver(post_delete, sender=EmployeeBranch)
+def refresh_schedule_calendar(sender, instance, using, **kwargs):
+    # Overrides can fall outside the window
+    extra_dates = [instance.date] if sender is ShiftOverride else []
+    schedule_calendar_refresh(instance.employee_id, using, extra_dates)
+
+
+@receiver(post_save, sender=DailySchedule)
+@receiver(post_delete, sender=DailySchedule)
+def refresh_schedule_calendar_for_daily_schedule(sender, instance, using, **kwargs):
+    employee_id = EmployeeBranch.objects.using(using).filter(
+        pk=instance.employee_branch_id
+    ).values_list('employee_id', flat=True).first()
+    if employee_id:
+        schedule_calendar_refresh(employee_id, using)
+
+
+@receiver(post_save, sender=Employee)
+def refresh_schedule_calendar_for_employee(sender, instance, created, using, **kwargs):
+    """New employees get their calendar rows straight away"""
+    if created and not kwargs.get('raw', False):
+        schedule_calendar_refresh(instance.id, using)
+
+
+@receiver(post_save, sender=MainWallet)
+@receiver(post_save, sender=ReimbursementWallet)
+@receiver(post_save, sender=AdvanceWallet)
+def refresh_employee_dashboard_for_wallet(sender, instance, using, **kwargs):
+    from .employee_dashboard import invalidate_dashboard_snapshots
+    employee_id = EmployeeWalletSystem.objects.using(using).filter(
+        pk=instance.wallet_system_id
+    ).values_list('employee_id', flat=True).first()
+    if employee_id:
+        invalidate_dashboard_snapshots(employee_id, using)
+
+
+# Fields next_deadline_at depends on
+TICKET_DEADLINE_FIELDS = {
+    'last_response_time', 'last_responder', 'automated_status', 'delay_status',
+    'status', 'priority', 'custom_threshold',
+}
+
+
+@receiver(pre_save, sender=ClientComplaint)
+def schedule_ticket_deadline(sender, instance, update_fields=None, **kwargs):
+    """Keep the ticket's next delay / auto-close due time in step with its state"""
+    if kwargs.get('raw', False):
+        return
+    if update_fields is not None and not TICKET_DEADLINE_FIELDS & set(update_fields):
+        return
+    from .ticket_automation import TicketStatusManager
+    if not instance.last_response_time:
+        instance.next_deadline_at = None
+        return
+    thresholds = TicketStatusManager.get_thresholds_for_complaint(instance)
+    instance.next_deadline_at = TicketStatusManager.next_deadline(instance, thresholds)
+
+
+@receiver(post_save, sender=ClientComplaint)
+def persist_ticket_deadline(sender, instance, using, update_fields=None, **kwargs):
+    """
+    save(update_fields=[...]) only writes the listed fields: store the
+    deadline recomputed above when a deadline field was saved without it
+    """
+    if kwargs.get('raw', False) or update_fields is None:
+        return
+    if TICKET_DEADLINE_FIELDS & set(update_fields) and 'next_deadline_at' not in update_fields:
+        ClientComplaint.objects.using(using).filter(pk=instance.pk).update(next_deadline_at=instance.next_deadline_at)
+
+
+@receiver(post_save, sender=TicketDelayThreshold)
+@receiver(post_delete, sender=TicketDelayThreshold)
+def reschedule_tickets_for_threshold(sender, instance, using, **kwargs):
+    from .ticket_automation import reschedule_tickets
+    reschedule_tickets(using=using)
+
 
 @receiver(post_save, sender=User)
 def create_employee_for_superuser(sender, instance, created, **kwargs):
@@ -127,7 +225,6 @@ def create_central_wallet(sender, instance, created, **kwargs):
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.utils import timezone
-import decimal
 
 @receiver(pre_save, sender=EmployeeAttendance)
 def add_daily_salary_to_wallet(sender, instance, **kwargs):
@@ -146,70 +243,31 @@ def add_daily_salary_to_wallet(sender, instance, **kwargs):
     # Also create legacy wallet for backward compatibility
     legacy_wallet, _ = Wallet.objects.get_or_create(employee=employee)
 
-    # Check if there are WorkShift records for this date
-    work_shifts_exist = WorkShift.objects.filter(employee=employee, date=instance.date).exists()
-    
-    if work_shifts_exist:
+    # Work shifts of this record are paid by the WorkShift signal
+    if has_work_shifts(instance, using=instance._state.db):
         # Skip salary calculation as WorkShift signal will handle it
         return
 
-    daily_salary = decimal.Decimal(employee.salary) / decimal.Decimal(30)
-
-    shift_start = timezone.make_aware(
-        timezone.datetime.combine(instance.date, employee.shift_start_time)
-    )
-    shift_end = timezone.make_aware(
-        timezone.datetime.combine(instance.date, employee.shift_end_time)
-    )
-    
-    # Handle check_in - could be datetime or time
-    if instance.check_in:
-        if isinstance(instance.check_in, timezone.datetime):
-            check_in_time = instance.check_in
-        else:
-            check_in_time = timezone.make_aware(
-                timezone.datetime.combine(instance.date, instance.check_in)
-            )
-    else:
-        check_in_time = None
-    
-    # Handle check_out - could be datetime or time
-    if instance.check_out:
-        if isinstance(instance.check_out, timezone.datetime):
-            check_out_time = instance.check_out
-        else:
-            check_out_time = timezone.make_aware(
-                timezone.datetime.combine(instance.date, instance.check_out)
-            )
-    else:
-        check_out_time = None
+    total_salary, instance.status = attendance_salary(instance, employee)
 
     if instance.status in ["absent", "on_leave"]:
         # Remove any existing multi-wallet transaction for this date
-        existing_transactions = MultiWalletTransaction.objects.filter(
-            wallet_system=wallet_system,
-            wallet_type='main',
-            description=f"Daily salary for {instance.date}"
-        )
-        for trans in existing_transactions:
-            # Reverse the transaction by subtracting the amount
-            if trans.transaction_type in ['salary_credit']:
-                wallet_system.main_wallet.balance = decimal.Decimal(str(wallet_system.main_wallet.balance)) - decimal.Decimal(str(trans.amount))
-                wallet_system.main_wallet.save()
-            trans.delete()
-
-        # Only pay if it's paid leave
-        if instance.status == "on_leave" and instance.paid:
-            total_salary = daily_salary
-            if total_salary > 0:
-                create_multi_wallet_transaction(
-                    wallet_system=wallet_system,
-                    wallet_type='main',
-                    transaction_type='salary_credit',
-                    amount=total_salary,
-                    description=f"Daily salary for {instance.date}",
-                    created_by=None
-                )
+        for trans in source_transactions('attendance', instance.id, 'salary_credit'):
+            reverse_transaction(trans)
+
+        # Only paid leave is paid
+        if total_salary > 0:
+            create_multi_wallet_transaction(
+                wallet_system=wallet_system,
+                wallet_type='main',
+                transaction_type='salary_credit',
+                amount=total_salary,
+                description=f"Daily salary for {instance.date}",
+                created_by=None,
+                source_type='attendance',
+                source_id=instance.id,
+                business_date=instance.date
+            )
         
         # Also handle legacy wallet for backward compatibility
         central_wallet = Wallet.objects.get(employee=None)
@@ -227,7 +285,7 @@ def add_daily_salary_to_wallet(sender, instance, **kwargs):
             description=f"Daily salary deduction for {employee.name} ({instance.date})"
         ).delete()
 
-        if instance.status == "on_leave" and instance.paid and total_salary > 0:
+        if total_salary > 0:
             legacy_wallet.balance += total_salary
             legacy_wallet.save()
 
@@ -249,51 +307,9 @@ def add_daily_salary_to_wallet(sender, instance, **kwargs):
             )
         return
 
-    # Calculate worked hours
-    shift_hours = (shift_end - shift_start).total_seconds() / 3600
-    half_shift_hours = shift_hours / 2
-    worked_hours = (check_out_time - check_in_time).total_seconds() / 3600
-
-    # Grace period
-    grace_minutes = 15
-    delay = (check_in_time - shift_start).total_seconds() / 60 if check_in_time > shift_start else 0
-    if delay <= grace_minutes:
-        delay = 0
-        instance.status = "present"
-    else:
-        instance.status = "late"
-
-    # Calculate salary
-    total_salary = decimal.Decimal(0)
-
-    if worked_hours < half_shift_hours:
-        total_salary = decimal.Decimal(0)
-    elif worked_hours < shift_hours:
-        ratio = worked_hours / shift_hours
-        total_salary = daily_salary * decimal.Decimal(ratio)
-    else:
-        total_salary = daily_salary
-
-        # Calculate overtime
-        if check_out_time > shift_end:
-            overtime_seconds = (check_out_time - shift_end).total_seconds()
-            if overtime_seconds > (15 * 60):
-                overtime_hours = overtime_seconds / 3600
-                overtime_pay = decimal.Decimal(employee.overtime_rate) * decimal.Decimal(overtime_hours)
-                total_salary += overtime_pay
-
     # Remove any existing multi-wallet transaction for this date
-    existing_transactions = MultiWalletTransaction.objects.filter(
-        wallet_system=wallet_system,
-        wallet_type='main',
-        description=f"Daily salary for {instance.date}"
-    )
-    for trans in existing_transactions:
-        # Reverse the transaction by subtracting the amount
-        if trans.transaction_type in ['salary_credit']:
-            wallet_system.main_wallet.balance = decimal.Decimal(str(wallet_system.main_wallet.balance)) - decimal.Decimal(str(trans.amount))
-            wallet_system.main_wallet.save()
-        trans.delete()
+    for trans in source_transactions('attendance', instance.id, 'salary_credit'):
+        reverse_transaction(trans)
 
     # Create new salary transaction if amount > 0
     if total_salary > 0:
@@ -303,7 +319,10 @@ def add_daily_salary_to_wallet(sender, instance, **kwargs):
             transaction_type='salary_credit',
             amount=total_salary,
             description=f"Daily salary for {instance.date}",
-            created_by=None
+            created_by=None,
+            source_type='attendance',
+            source_id=instance.id,
+            business_date=instance.date
         )
 
     # Also handle legacy wallet for backward compatibility
@@ -355,33 +374,24 @@ def add_shift_salary_to_wallet(sender, instance, **kwargs):
     if not instance.check_out or instance.status in ["absent", "on_leave"]:
         # Handle leave cases
         if instance.status == "on_leave" and instance.is_paid_leave:
-            daily_salary = decimal.Decimal(employee.salary) / decimal.Decimal(30)
+            daily_salary, description = shift_salary(instance, employee)
             
             # Remove existing multi-wallet transaction if this is an update
-            # Use a more flexible filter to handle both old and new description formats
-            existing_transactions = MultiWalletTransaction.objects.filter(
-                wallet_system=wallet_system,
-                wallet_type='main',
-                description__contains=f"Shift {instance.id}"
-            ).filter(
-                transaction_type='salary_credit'
-            )
-            for trans in existing_transactions:
-                if trans.transaction_type in ['salary_credit']:
-                    wallet_system.main_wallet.balance = decimal.Decimal(str(wallet_system.main_wallet.balance)) - decimal.Decimal(str(trans.amount))
-                    wallet_system.main_wallet.save()
-                trans.delete()
+            for trans in source_transactions('work_shift', instance.id, 'salary_credit'):
+                reverse_transaction(trans)
             
             # Add paid leave salary to multi-wallet
             if daily_salary > 0:
-                shift_date = instance.check_in.date() if instance.check_in else instance.attendance.date
                 create_multi_wallet_transaction(
                     wallet_system=wallet_system,
                     wallet_type='main',
                     transaction_type='salary_credit',
                     amount=daily_salary,
-                    description=f"Paid leave salary for {employee.name} - {shift_date} ({instance.shift_type} shift)",
-                    created_by=None
+                    description=description,
+                    created_by=None,
+                    source_type='work_shift',
+                    source_id=instance.id,
+                    business_date=shift_date(instance)
                 )
             
             # Handle legacy wallet for backward compatibility
@@ -409,7 +419,7 @@ def add_shift_salary_to_wallet(sender, instance, **kwargs):
                     wallet=legacy_wallet,
                     transaction_type="deposit",
                     amount=daily_salary,
-                    description=f"Paid leave salary for {employee.name} - {shift_date} ({instance.shift_type} shift)"
+                    description=description
                 )
                 
                 central_wallet.balance -= daily_salary
@@ -419,131 +429,31 @@ def add_shift_salary_to_wallet(sender, instance, **kwargs):
                     wallet=central_wallet,
                     transaction_type="withdrawal",
                     amount=daily_salary,
-                    description=f"Paid leave salary deduction for {employee.name} - {shift_date} ({instance.shift_type} shift)"
+                    description=description.replace("Paid leave salary for", "Paid leave salary deduction for")
                 )
         return
     
-    # Calculate daily salary
-    daily_salary = decimal.Decimal(employee.salary) / decimal.Decimal(30)
-    
-    # Calculate hourly rate for more accurate multi-shift calculations
-    # Assuming 8-hour standard workday
-    standard_work_hours = 8
-    hourly_rate = daily_salary / decimal.Decimal(standard_work_hours)
-    
-    # Get the date from the check_in time or attendance record
-    shift_date = instance.check_in.date() if instance.check_in else instance.attendance.date
-    
-    # Get shift schedule for this day
-    from .models import WeeklyShiftSchedule
-    day_of_week = shift_date.weekday()
-    our_day_of_week = (day_of_week + 1) % 7  # Convert to Sunday=0
-    
-    try:
-        shift_schedule = WeeklyShiftSchedule.objects.get(
-            employee=employee,
-            day_of_week=our_day_of_week,
-            is_active=True
-        )
-        
-        # Convert string times to time objects if needed
-        start_time = shift_schedule.start_time
-        end_time = shift_schedule.end_time
-        
-        if isinstance(start_time, str):
-            from datetime import datetime as dt
-            start_time = dt.strptime(start_time, '%H:%M:%S').time() if len(start_time) > 5 else dt.strptime(start_time, '%H:%M').time()
-        if isinstance(end_time, str):
-            from datetime import datetime as dt
-            end_time = dt.strptime(end_time, '%H:%M:%S').time() if len(end_time) > 5 else dt.strptime(end_time, '%H:%M').time()
-        
-        shift_start = timezone.make_aware(
-            timezone.datetime.combine(shift_date, start_time)
-        )
-        shift_end = timezone.make_aware(
-            timezone.datetime.combine(shift_date, end_time)
-        )
-        
-        # Calculate scheduled shift hours
-        shift_hours = shift_schedule.calculate_hours()
-        
-    except WeeklyShiftSchedule.DoesNotExist:
-        # Fallback to old system or default 8 hours
-        shift_start = None
-        shift_end = None
-        shift_hours = 8  # Default
-    
-    # Use the actual check-in and check-out times from the WorkShift
-    check_in_datetime = instance.check_in
-    check_out_datetime = instance.check_out
-    
-    if not check_in_datetime or not check_out_datetime:
-        return
-    
-    # Handle break time
-    total_break_minutes = instance.total_break_time or 0
-    
-    # Calculate worked hours
-    worked_seconds = (check_out_datetime - check_in_datetime).total_seconds() - (total_break_minutes * 60)
-    worked_hours = worked_seconds / 3600
-    
-    # Grace period for late arrival
-    grace_minutes = 15
-    delay = 0
-    if shift_start:
-        delay = (check_in_datetime - shift_start).total_seconds() / 60 if check_in_datetime > shift_start else 0
-        if delay <= grace_minutes:
-            delay = 0
-    
-    # Calculate salary based on actual worked hours (better for multi-shift scenarios)
-    total_salary = decimal.Decimal(0)
-    
-    # Minimum threshold: if worked less than 1 hour, no pay
-    if worked_hours < 1:
-        total_salary = decimal.Decimal(0)
-    else:
-        # Pay based on actual hours worked (more fair for multiple shifts)
-        base_hours = min(worked_hours, shift_hours)
-        total_salary = hourly_rate * decimal.Decimal(base_hours)
-        
-        # Calculate overtime if worked beyond scheduled shift end
-        if worked_hours > shift_hours:
-            overtime_hours = worked_hours - shift_hours
-            # Use overtime rate if available, otherwise 1.5x regular rate
-            overtime_rate = decimal.Decimal(employee.overtime_rate) if employee.overtime_rate > 0 else (hourly_rate * decimal.Decimal(1.5))
-            overtime_pay = overtime_rate * decimal.Decimal(overtime_hours)
-            total_salary += overtime_pay
+    # Same calculation as the batch payroll run
+    from .schedule_calendar import get_effective_schedule
+    schedule = scheduled_hours_row(get_effective_schedule(employee.id, shift_date(instance), using=instance._state.db))
+    total_salary, description = shift_salary(instance, employee, schedule)
     
     # Remove existing multi-wallet transaction if this is an update
-    # Use a more flexible filter to handle both old and new description formats
-    existing_transactions = MultiWalletTransaction.objects.filter(
-        wallet_system=wallet_system,
-        wallet_type='main',
-        description__contains=f"Shift {instance.id}"
-    ).filter(
-        transaction_type='salary_credit'
-    )
-    for trans in existing_transactions:
-        if trans.transaction_type in ['salary_credit']:
-            wallet_system.main_wallet.balance = decimal.Decimal(str(wallet_system.main_wallet.balance)) - decimal.Decimal(str(trans.amount))
-            wallet_system.main_wallet.save()
-        trans.delete()
+    for trans in source_transactions('work_shift', instance.id, 'salary_credit'):
+        reverse_transaction(trans)
     
     # Add new salary to multi-wallet if amount > 0
     if total_salary > 0:
-        # Calculate overtime details for description
-        overtime_info = ""
-        if worked_hours > shift_hours:
-            overtime_hours = worked_hours - shift_hours
-            overtime_info = f" + {overtime_hours:.1f}h OT"
-        
         create_multi_wallet_transaction(
             wallet_system=wallet_system,
             wallet_type='main',
             transaction_type='salary_credit',
             amount=total_salary,
-            description=f"Shift salary for {employee.name} - {shift_date} ({instance.shift_type}: {worked_hours:.1f}h{overtime_info})",
-            created_by=None
+            description=description,
+            created_by=None,
+            source_type='work_shift',
+            source_id=instance.id,
+            business_date=shift_date(instance)
         )
 
     # Handle legacy wallet for backward compatibility
@@ -572,7 +482,7 @@ def add_shift_salary_to_wallet(sender, instance, **kwargs):
             wallet=legacy_wallet,
             transaction_type="deposit",
             amount=total_salary,
-            description=f"Shift salary for {employee.name} - {shift_date} ({instance.shift_type}: {worked_hours:.1f}h{overtime_info})"
+            description=description
         )
         
         central_wallet.balance -= total_salary
@@ -582,7 +492,7 @@ def add_shift_salary_to_wallet(sender, instance, **kwargs):
             wallet=central_wallet,
             transaction_type="withdrawal",
             amount=total_salary,
-            description=f"Shift salary deduction for {employee.name} - {shift_date} ({instance.shift_type}: {worked_hours:.1f}h{overtime_info})"
+            description=description.replace("Shift salary for", "Shift salary deduction for")
         )
 
 
@@ -679,35 +589,17 @@ def cleanup_attendance_transactions(sender, instance, **kwargs):
     except Wallet.DoesNotExist:
         central_wallet = None
     
-    # Clean up WorkShift-related transactions first
+    # Salary credits of the day (shift and attendance based) in one indexed lookup
+    reverse_batch(MultiWalletTransaction.objects.filter(
+        wallet_system=wallet_system,
+        business_date=attendance_date,
+        transaction_type='salary_credit'
+    ))
+
+    # Clean up legacy WorkShift-related transactions
     work_shifts = WorkShift.objects.filter(employee=employee, check_in__date=attendance_date)
     
     for shift in work_shifts:
-        # Remove multi-wallet transactions for this specific shift
-        # Match both old and new description formats
-        shift_transactions = MultiWalletTransaction.objects.filter(
-            wallet_system=wallet_system
-        ).filter(
-            models.Q(description__contains=f"Shift {shift.id}") |
-            models.Q(description__contains=f"shift {shift.id}") |
-            models.Q(description__contains=f"- {shift.check_in.date()} ({shift.shift_type}")
-        )
-        
-        for tx in shift_transactions:
-            # Reverse the wallet balance
-            if tx.wallet_type == 'main':
-                wallet_system.main_wallet.balance = decimal.Decimal(str(wallet_system.main_wallet.balance)) - decimal.Decimal(str(tx.amount))
-                wallet_system.main_wallet.save()
-            elif tx.wallet_type == 'reimbursement':
-                wallet_system.reimbursement_wallet.balance = decimal.Decimal(str(wallet_system.reimbursement_wallet.balance)) - decimal.Decimal(str(tx.amount))
-                wallet_system.reimbursement_wallet.save()
-            elif tx.wallet_type == 'advance':
-                wallet_system.advance_wallet.balance = decimal.Decimal(str(wallet_system.advance_wallet.balance)) - decimal.Decimal(str(tx.amount))
-                wallet_system.advance_wallet.save()
-            
-            # Delete the transaction
-            tx.delete()
-        
         # Remove legacy wallet transactions for this specific shift
         if central_wallet:
             legacy_transactions = WalletTransaction.objects.filter(
@@ -737,21 +629,6 @@ def cleanup_attendance_transactions(sender, instance, **kwargs):
     
     # Clean up legacy attendance-based transactions (if no WorkShifts exist)
     if not work_shifts.exists():
-        # Remove multi-wallet transactions for this attendance date
-        daily_transactions = MultiWalletTransaction.objects.filter(
-            wallet_system=wallet_system,
-            description__contains=f"Daily salary for {attendance_date}"
-        )
-        
-        for tx in daily_transactions:
-            # Reverse the wallet balance
-            if tx.wallet_type == 'main':
-                wallet_system.main_wallet.balance = decimal.Decimal(str(wallet_system.main_wallet.balance)) - decimal.Decimal(str(tx.amount))
-                wallet_system.main_wallet.save()
-            
-            # Delete the transaction
-            tx.delete()
-        
         # Remove legacy daily transactions  
         if central_wallet:
             legacy_daily_transactions = WalletTransaction.objects.filter(
@@ -778,7 +655,6 @@ def cleanup_attendance_transactions(sender, instance, **kwargs):
 def cleanup_workshift_transactions(sender, instance, **kwargs):
     """Clean up transactions when a WorkShift is deleted individually"""
     employee = instance.employee
-    wallet_system = get_or_create_wallet_system(employee)
     legacy_wallet, _ = Wallet.objects.get_or_create(employee=employee)
     
     try:
@@ -787,29 +663,7 @@ def cleanup_workshift_transactions(sender, instance, **kwargs):
         central_wallet = None
     
     # Remove multi-wallet transactions for this specific shift
-    # Match both old and new description formats
-    shift_transactions = MultiWalletTransaction.objects.filter(
-        wallet_system=wallet_system
-    ).filter(
-        models.Q(description__contains=f"Shift {instance.id}") |
-        models.Q(description__contains=f"shift {instance.id}") |
-        models.Q(description__contains=f"- {instance.check_in.date()} ({instance.shift_type}")
-    )
-    
-    for tx in shift_transactions:
-        # Reverse the wallet balance
-        if tx.wallet_type == 'main':
-            wallet_system.main_wallet.balance = decimal.Decimal(str(wallet_system.main_wallet.balance)) - decimal.Decimal(str(tx.amount))
-            wallet_system.main_wallet.save()
-        elif tx.wallet_type == 'reimbursement':
-            wallet_system.reimbursement_wallet.balance = decimal.Decimal(str(wallet_system.reimbursement_wallet.balance)) - decimal.Decimal(str(tx.amount))
-            wallet_system.reimbursement_wallet.save()
-        elif tx.wallet_type == 'advance':
-            wallet_system.advance_wallet.balance = decimal.Decimal(str(wallet_system.advance_wallet.balance)) - decimal.Decimal(str(tx.amount))
-            wallet_system.advance_wallet.save()
-        
-        # Delete the transaction
-        tx.delete()
+    reverse_batch(source_transactions('work_shift', instance.id))
     
     # Remove legacy wallet transactions for this specific shift
     if central_wallet:
@@ -842,6 +696,7 @@ def cleanup_workshift_transactions(sender, instance, **kwargs):
 # ==================== TENANT INITIALIZATION SIGNALS ====================
 
 from hr_management.tenant_models import Tenant
+from hr_management.tenant_bootstrap import registry
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.db import connections
@@ -941,6 +796,7 @@ def initialize_tenant_database(sender, instance, created, **kwargs):
             print(f"🔄 Running migrations...", flush=True)
             from django.core.management import call_command
             call_command('migrate', '--database', db_alias, verbosity=0)
+            registry.record(db_alias)
             logger.info(f"✅ Migrations completed for {db_alias}")
             print(f"✅ Migrations completed!", flush=True)
             
@@ -0,0 +1,75 @@
+"""
+Sparse Fieldsets
+?fields= / ?expand= support for list serializers
+
+    ?fields=id,title,status   only these fields are rendered
+    ?expand=comments,subtasks include heavy nested fields that list
+                              serializers leave out by default
+
+Serializers opt in with SparseFieldsetMixin and list their heavy nested
+fields in Meta.expandable_fields. Views pass the resulting field set to
+optimize_queryset(), so joins and prefetches follow the requested fields.
+"""
+
+
+def parse_fieldset(request, param):
+    """Comma-separated query parameter -> set of names (empty if absent)"""
+    if request is None:
+        return set()
+    value = request.query_params.get(param, '')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Drops fields not requested via ?fields=, and Meta.expandable_fields
+    unless named in ?expand=. Only applies to the top-level serializer
+    (nested serializers are built without a request in their context).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+
+        requested = parse_fieldset(request, 'fields')
+        expand = parse_fieldset(request, 'expand')
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+
+        for name in list(self.fields):
+            if name in expand:
+                continue
+            if name in expandable or (requested and name not in requested):
+                self.fields.pop(name)
+
+
+def sparse_fields(serializer_class, request):
+    """Names of the fields serializer_class will render for this request"""
+    return set(serializer_class(context={'request': request}).fields)
+
+
+def optimize_queryset(queryset, fields, select_related=None, prefetch_related=None):
+    """
+    Apply only the select_related / prefetch_related lookups needed for fields.
+
+    select_related / prefetch_related: {field_name: [lookups]}; prefetch
+    lookups may be strings or Prefetch objects.
+    """
+    joins, prefetches, seen = [], [], set()
+    for name, lookups in (select_related or {}).items():
+        if name in fields:
+            joins.extend(lookup for lookup in lookups if lookup not in joins)
+    for name, lookups in (prefetch_related or {}).items():
+        if name in fields:
+            for lookup in lookups:
+                key = getattr(lookup, 'prefetch_to', lookup)
+                if key not in seen:
+                    seen.add(key)
+                    prefetches.append(lookup)
+
+    if joins:
+        queryset = queryset.select_related(*joins)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
@@ -0,0 +1,91 @@
+"""
+Task Dashboard Engine
+Set-based aggregation for the manager task dashboard
+
+Per-employee status counts and overdue counts come from one grouped
+query, tasks are fetched once and bucketed per employee in memory.
+"""
+from collections import defaultdict
+from django.db.models import Count, Q
+from .models import Employee, Task, overdue_q
+
+
+def annotate_task_counts(employees, date, now=None):
+    """
+    Annotate an Employee queryset with task counters for a date:
+    total_tasks, completed_tasks, in_progress_tasks, not_completed_tasks, overdue_tasks
+    """
+    on_date = Q(tasks__date=date)
+    return employees.annotate(
+        total_tasks=Count('tasks', filter=on_date),
+        completed_tasks=Count('tasks', filter=on_date & Q(tasks__status='done')),
+        in_progress_tasks=Count('tasks', filter=on_date & Q(tasks__status='doing')),
+        not_completed_tasks=Count('tasks', filter=on_date & Q(tasks__status='to_do')),
+        overdue_tasks=Count('tasks', filter=on_date & overdue_q(now, prefix='tasks__')),
+    )
+
+
+def get_tasks_by_employee(employee_ids, date, now=None):
+    """
+    Tasks for the given employees on a date, fetched in one query
+    (plus prefetches for nested comments/subtasks) and grouped by employee id
+    """
+    tasks = Task.objects.with_overdue(now).filter(
+        employee_id__in=employee_ids,
+        date=date
+    ).select_related(
+        'employee', 'created_by', 'team'
+    ).prefetch_related(
+        'comments__author', 'subtasks__assigned_employee'
+    )
+
+    buckets = defaultdict(list)
+    for task in tasks:
+        buckets[task.employee_id].append(task)
+    return buckets
+
+
+def get_team_summary(date):
+    """Team-wide counters for a date in a single aggregate query"""
+    totals = Task.objects.filter(date=date).aggregate(
+        total_tasks=Count('id'),
+        completed_tasks=Count('id', filter=Q(status='done')),
+        active_employees=Count('employee', distinct=True),
+    )
+    total = totals['total_tasks']
+    completion_rate = (totals['completed_tasks'] / total * 100) if total > 0 else 0
+
+    return {
+        'total_tasks': total,
+        'completed_tasks': totals['completed_tasks'],
+        'completion_rate': round(completion_rate, 2),
+        'total_employees': Employee.objects.count(),
+        'active_employees': totals['active_employees'],
+    }
+
+
+def build_employee_rows(employees, date, serialize_tasks):
+    """
+    Build dashboard rows for an (already annotated and paginated) list of employees.
+
+    serialize_tasks: callable turning a list of tasks into serialized data
+    """
+    tasks_by_employee = get_tasks_by_employee([e.id for e in employees], date)
+
+    rows = []
+    for employee in employees:
+        total = employee.total_tasks
+        completion_rate = (employee.completed_tasks / total * 100) if total > 0 else 0
+
+        rows.append({
+            'employee_id': employee.id,
+            'employee_name': employee.name,
+            'total_tasks': total,
+            'completed_tasks': employee.completed_tasks,
+            'in_progress_tasks': employee.in_progress_tasks,
+            'not_completed_tasks': employee.not_completed_tasks,
+            'completion_rate': round(completion_rate, 2),
+            'overdue_tasks': employee.overdue_tasks,
+            'tasks': serialize_tasks(tasks_by_employee.get(employee.id, [])),
+        })
+    return rows
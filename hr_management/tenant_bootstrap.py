@@ -0,0 +1,132 @@
+"""
+Tenant Database Bootstrap Registry
+Keeps migrations out of the request path
+
+Tenant databases are migrated once, by the `bootstrap_tenants` management
+command (or when a tenant is set up), and the applied schema version is
+recorded in a persistent JSON registry. The request path only registers the
+connection alias and never runs `migrate`.
+"""
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_schema_version = None
+
+
+def get_registry_path():
+    """Returns the path of the bootstrap registry file"""
+    return getattr(
+        settings,
+        'TENANT_BOOTSTRAP_REGISTRY',
+        os.path.join(settings.BASE_DIR, 'tenant_bootstrap.json')
+    )
+
+
+def get_schema_version():
+    """
+    Returns a short hash of the current migration leaf nodes.
+    Computed from the migration files on disk (no database access), once per process.
+    """
+    global _schema_version
+    if _schema_version is None:
+        from django.db.migrations.loader import MigrationLoader
+
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaves = sorted(f"{app}.{name}" for app, name in loader.graph.leaf_nodes())
+        _schema_version = hashlib.sha1('\n'.join(leaves).encode('utf-8')).hexdigest()[:12]
+    return _schema_version
+
+
+class TenantBootstrapRegistry:
+    """
+    Persistent record of which tenant databases have been migrated,
+    and to which schema version.
+
+    Format: {"tenant_adam": {"schema_version": "...", "bootstrapped_at": "..."}}
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_registry_path()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not read tenant bootstrap registry {self.path}: {e}")
+                self._entries = {}
+        return self._entries
+
+    def get(self, db_alias):
+        """Returns the registry entry for a database alias, or None"""
+        return self._load().get(db_alias)
+
+    def is_current(self, db_alias):
+        """True if the database was bootstrapped with the current schema version"""
+        entry = self.get(db_alias)
+        return bool(entry) and entry.get('schema_version') == get_schema_version()
+
+    def record(self, db_alias, schema_version=None):
+        """Record a successful migration of db_alias and persist the registry"""
+        with _lock:
+            # Re-read so entries written by other processes are preserved
+            self._entries = None
+            entries = self._load()
+            entries[db_alias] = {
+                'schema_version': schema_version or get_schema_version(),
+                'bootstrapped_at': timezone.now().isoformat(),
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def reload(self):
+        """Forget the in-memory copy; the next read hits the file again"""
+        self._entries = None
+
+
+registry = TenantBootstrapRegistry()
+
+
+def bootstrap_tenant_database(tenant, force=False):
+    """
+    Register and migrate a tenant database if its schema version is out of date.
+
+    Args:
+        tenant: Tenant instance
+        force: Run migrate even if the registry says the database is current
+
+    Returns:
+        tuple: (migrated: bool, error: str)
+    """
+    from .tenant_middleware import setup_tenant_database
+
+    db_alias = setup_tenant_database(tenant)
+
+    if not force and registry.is_current(db_alias):
+        return False, None
+
+    try:
+        call_command('migrate', database=db_alias, interactive=False, run_syncdb=True, verbosity=0)
+    except Exception as e:
+        error_msg = f"Migration error for {db_alias}: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+    registry.record(db_alias)
+    logger.info(f"✓ Bootstrapped {db_alias} (schema {get_schema_version()})")
+    return True, None
@@ -0,0 +1,105 @@
+"""
+Tenant Resolution Cache
+In-process cache for resolving tenants by custom domain or subdomain
+Avoids hitting the main database on every request
+"""
+from collections import OrderedDict
+from django.conf import settings
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Sentinel stored for lookups that matched no active tenant
+_MISSING = object()
+
+
+class TenantResolutionCache:
+    """
+    Thread-safe LRU cache with TTL for tenant lookups
+
+    Keys are (kind, value) tuples, e.g. ('custom', 'mycompany.com') or
+    ('subdomain', 'adam'). Negative results are cached too, so repeated
+    requests for the main domain don't query the database either.
+    """
+
+    def __init__(self, ttl=None, max_size=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'TENANT_CACHE_TTL', 300)
+        self.max_size = max_size if max_size is not None else getattr(settings, 'TENANT_CACHE_MAX_SIZE', 1024)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind, value, loader):
+        """
+        Return the cached tenant for (kind, value), calling loader() on a miss.
+        loader must return a Tenant instance or None.
+        """
+        key = (kind, value)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                tenant, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return None if tenant is _MISSING else tenant
+                del self._entries[key]
+
+        tenant = loader()
+
+        with self._lock:
+            self._entries[key] = (_MISSING if tenant is None else tenant, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return tenant
+
+    def invalidate(self, kind, value):
+        """Drop a single cached entry"""
+        with self._lock:
+            self._entries.pop((kind, value), None)
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+        logger.debug("Tenant resolution cache cleared")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+tenant_cache = TenantResolutionCache()
+
+
+def get_tenant_by_custom_domain(domain):
+    """Resolve an active tenant by custom domain (cached)"""
+    from .tenant_models import Tenant
+
+    return tenant_cache.get('custom', domain, lambda: Tenant.objects.using('default').filter(
+        domain_type='custom',
+        custom_domain=domain,
+        is_active=True
+    ).first())
+
+
+def get_tenant_by_subdomain(subdomain):
+    """Resolve an active tenant by subdomain (cached)"""
+    from .tenant_models import Tenant
+
+    return tenant_cache.get('subdomain', subdomain, lambda: Tenant.objects.using('default').filter(
+        subdomain=subdomain,
+        is_active=True
+    ).first())
+
+
+def invalidate_tenant_cache():
+    """
+    Invalidate all cached tenant lookups.
+    Called from Tenant post_save/post_delete signals. A full clear is used
+    because a saved tenant may have changed the domain it was cached under.
+    """
+    tenant_cache.clear()
@@ -0,0 +1,193 @@
+"""
+All-Tenant Client Report
+Clients (registered client users and anonymous complaint submitters) across
+every active tenant database
+
+Each tenant is queried in parallel through tenant_fanout and returns rows
+sorted by (date_joined, id) descending; the per-tenant lists are merged on
+(date_joined, tenant_subdomain, id), which is also the keyset pagination cursor.
+
+Exports stream instead: iter_all_clients() walks tenants one by one and
+reads each cursor with fetchmany, so memory stays constant whatever the
+total client count.
+"""
+import csv
+import json
+import logging
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from .tenant_fanout import fan_out, merge_page, get_tenant_alias
+
+logger = logging.getLogger(__name__)
+
+# Column order of the CSV export
+EXPORT_COLUMNS = [
+    'tenant_subdomain', 'tenant_name', 'tenant_id', 'id', 'client_type',
+    'first_name', 'last_name', 'email', 'phone', 'is_active', 'date_joined', 'last_login',
+]
+
+CLIENTS_SQL = """
+    SELECT * FROM (
+        SELECT id, email, first_name, last_name, '' as phone, is_active,
+               date_joined, last_login, 'registered' as client_type
+        FROM hr_management_user
+        WHERE role = 'client'
+
+        UNION ALL
+
+        SELECT id, client_email as email, client_name as first_name,
+               '' as last_name, client_phone as phone, 1 as is_active,
+               created_at as date_joined, NULL as last_login, 'complaint' as client_type
+        FROM hr_management_clientcomplaint
+        WHERE client_user_id IS NULL OR client_user_id = ''
+    ) AS clients
+    {where}
+    ORDER BY date_joined DESC, id DESC
+    {limit}
+"""
+
+COUNT_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM hr_management_user WHERE role = 'client') +
+        (SELECT COUNT(*) FROM hr_management_clientcomplaint
+         WHERE client_user_id IS NULL OR client_user_id = '')
+"""
+
+
+def client_sort_key(client):
+    """Merge / cursor key of a client row"""
+    return (str(client['date_joined']), client['tenant_subdomain'], str(client['id']))
+
+
+def _after_cursor(tenant, after):
+    """
+    WHERE clause for this tenant's rows that sort after the cursor
+    (descending on date_joined, tenant_subdomain, id)
+    """
+    date_joined, subdomain, client_id = after
+    if tenant.subdomain < subdomain:
+        return "WHERE date_joined <= %s", [date_joined]
+    if tenant.subdomain == subdomain:
+        return "WHERE date_joined < %s OR (date_joined = %s AND id < %s)", [date_joined, date_joined, client_id]
+    return "WHERE date_joined < %s", [date_joined]
+
+
+def _with_tenant(columns, row, tenant):
+    """Row tuple -> client dict tagged with its tenant"""
+    client_data = dict(zip(columns, row))
+    client_data['tenant_name'] = tenant.name
+    client_data['tenant_subdomain'] = tenant.subdomain
+    client_data['tenant_id'] = str(tenant.id)
+    return client_data
+
+
+def fetch_tenant_clients(tenant, db_alias, after=None, limit=None):
+    """
+    Client rows of one tenant database, newest first.
+    after: cursor tuple from client_sort_key; limit: max rows
+    """
+    where, params = _after_cursor(tenant, after) if after else ('', [])
+    limit_sql = ''
+    if limit is not None:
+        limit_sql = 'LIMIT %s'
+        params.append(limit)
+
+    with connections[db_alias].cursor() as cursor:
+        cursor.execute(CLIENTS_SQL.format(where=where, limit=limit_sql), params)
+        columns = [col[0] for col in cursor.description]
+        rows = cursor.fetchall()
+
+    return [_with_tenant(columns, row, tenant) for row in rows]
+
+
+def count_tenant_clients(db_alias):
+    """Total client rows in one tenant database"""
+    with connections[db_alias].cursor() as cursor:
+        cursor.execute(COUNT_SQL)
+        return cursor.fetchone()[0]
+
+
+def format_client(client):
+    """ISO-format the date columns for JSON output"""
+    for field in ('date_joined', 'last_login'):
+        value = client.get(field)
+        if value:
+            client[field] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    return client
+
+
+def collect_clients(tenants, after=None, limit=None):
+    """
+    Fan out over tenants and merge their clients.
+
+    Returns (clients, total_clients, has_more, failed_tenants). With a limit,
+    each tenant returns at most limit + 1 rows and total_clients comes from a
+    COUNT query; failed_tenants lists tenants that errored or timed out.
+    """
+    def job(tenant, db_alias):
+        fetch_limit = limit + 1 if limit is not None else None
+        clients = fetch_tenant_clients(tenant, db_alias, after, fetch_limit)
+        total = count_tenant_clients(db_alias) if limit is not None else len(clients)
+        return clients, total
+
+    streams, total_clients, failed_tenants = [], 0, []
+    for result in fan_out(tenants, job):
+        if result.ok:
+            clients, total = result.value
+            streams.append(clients)
+            total_clients += total
+        else:
+            failed_tenants.append(result.error_info())
+
+    clients, has_more = merge_page(streams, client_sort_key, limit, reverse=True)
+    return clients, total_clients, has_more, failed_tenants
+
+
+def iter_all_clients(tenants, chunk_size=None):
+    """
+    Yield formatted client dicts tenant by tenant (newest first within a tenant),
+    reading chunk_size rows at a time (default CLIENT_EXPORT_CHUNK_SIZE, 500).
+    A tenant whose query fails is logged and skipped.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CLIENT_EXPORT_CHUNK_SIZE', 500)
+
+    for tenant in tenants:
+        db_alias = get_tenant_alias(tenant)
+        if not db_alias:
+            continue
+        try:
+            with connections[db_alias].cursor() as cursor:
+                cursor.execute(CLIENTS_SQL.format(where='', limit=''))
+                columns = [col[0] for col in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield format_client(_with_tenant(columns, row, tenant))
+        except Exception as e:
+            logger.error(f"Client export failed for tenant {tenant.subdomain}: {e}")
+        finally:
+            connections[db_alias].close()
+
+
+def iter_ndjson(clients):
+    """One JSON document per line"""
+    for client in clients:
+        yield json.dumps(client, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() returns the value (for csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(clients):
+    """Header row, then one CSV line per client"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for client in clients:
+        yield writer.writerow([client.get(column, '') for column in EXPORT_COLUMNS])
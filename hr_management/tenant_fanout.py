@@ -0,0 +1,149 @@
+"""
+Cross-Tenant Fan-out
+Run the same query against many tenant databases in parallel
+
+fan_out() submits one job per tenant to a bounded thread pool and yields
+each tenant's result as soon as it finishes, so callers can stream partial
+results. A tenant that runs longer than the per-tenant timeout is reported
+as failed instead of holding up the whole report. Per-tenant pages sorted
+on the same key can be combined with merge_page() (keyset pagination).
+"""
+import base64
+import heapq
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class TenantResult:
+    """Outcome of one tenant's job: either a value or an error"""
+    __slots__ = ('tenant', 'value', 'error', 'elapsed')
+
+    def __init__(self, tenant, value=None, error=None, elapsed=0.0):
+        self.tenant = tenant
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def error_info(self):
+        """JSON-friendly description of a failed tenant"""
+        return {
+            'tenant_subdomain': self.tenant.subdomain,
+            'tenant_id': str(self.tenant.id),
+            'error': str(self.error) or type(self.error).__name__,
+        }
+
+
+def get_tenant_alias(tenant):
+    """
+    Register the tenant database connection and return its alias,
+    or None if the tenant has no database file
+    """
+    from .tenant_middleware import setup_tenant_database
+
+    db_path = os.path.join(settings.BASE_DIR, f'tenant_{tenant.subdomain}.sqlite3')
+    if not os.path.exists(db_path):
+        logger.warning(f"Database file not found for tenant {tenant.subdomain}: {db_path}")
+        return None
+    return setup_tenant_database(tenant)
+
+
+def _run(func, tenant, db_alias, started):
+    """Worker body: run func and release this thread's connection"""
+    started[tenant.pk] = time.monotonic()
+    try:
+        return func(tenant, db_alias)
+    finally:
+        connections[db_alias].close()
+
+
+def fan_out(tenants, func, max_workers=None, timeout=None):
+    """
+    Run func(tenant, db_alias) for every tenant and yield a TenantResult per
+    tenant in completion order.
+
+    max_workers: pool size (default TENANT_FANOUT_MAX_WORKERS, 8)
+    timeout: seconds a single tenant may run (default TENANT_FANOUT_TIMEOUT, 10)
+
+    Tenants without a database file are skipped. A timed-out job cannot be
+    interrupted; its result is discarded when it eventually finishes.
+    """
+    max_workers = max_workers or getattr(settings, 'TENANT_FANOUT_MAX_WORKERS', 8)
+    timeout = timeout or getattr(settings, 'TENANT_FANOUT_TIMEOUT', 10)
+
+    # Register aliases up front: settings.DATABASES is not thread-safe
+    jobs = []
+    for tenant in tenants:
+        db_alias = get_tenant_alias(tenant)
+        if db_alias:
+            jobs.append((tenant, db_alias))
+    if not jobs:
+        return
+
+    started = {}
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)), thread_name_prefix='tenant-fanout')
+    try:
+        pending = {
+            executor.submit(_run, func, tenant, db_alias, started): tenant
+            for tenant, db_alias in jobs
+        }
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[t.pk] + timeout for t in pending.values() if t.pk in started]
+            wait_for = max(min(deadlines) - now, 0) if deadlines else timeout
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                tenant = pending.pop(future)
+                elapsed = time.monotonic() - started.get(tenant.pk, now)
+                error = future.exception()
+                if error is not None:
+                    logger.error(f"Fan-out job failed for tenant {tenant.subdomain}: {error}")
+                    yield TenantResult(tenant, error=error, elapsed=elapsed)
+                else:
+                    yield TenantResult(tenant, value=future.result(), elapsed=elapsed)
+
+            now = time.monotonic()
+            for future, tenant in list(pending.items()):
+                if tenant.pk in started and now - started[tenant.pk] > timeout:
+                    pending.pop(future)
+                    logger.warning(f"Fan-out job timed out for tenant {tenant.subdomain} after {timeout}s")
+                    yield TenantResult(tenant, error=TimeoutError(f'Timed out after {timeout}s'), elapsed=now - started[tenant.pk])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def merge_page(streams, key, limit=None, reverse=False):
+    """
+    Merge per-tenant lists that are each sorted by key.
+    Returns (rows, has_more); without a limit all rows are returned.
+    """
+    merged = heapq.merge(*streams, key=key, reverse=reverse)
+    if limit is None:
+        return list(merged), False
+    rows = list(islice(merged, limit + 1))
+    return rows[:limit], len(rows) > limit
+
+
+def encode_cursor(values):
+    """Opaque keyset cursor for the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
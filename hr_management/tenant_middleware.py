@@ -7,12 +7,13 @@ from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 from django.db import connections
-from .tenant_models import Tenant, TenantModule
+from .tenant_models import TenantModule
 from .tenant_db_router import set_current_tenant, clear_current_tenant, get_current_tenant as get_tenant_from_router
+from .tenant_cache import get_tenant_by_custom_domain, get_tenant_by_subdomain
+from .tenant_bootstrap import registry
 import logging
 import os
 import threading
-from django.core.management import call_command
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +53,9 @@ def clear_thread_local_tenant():
 def setup_tenant_database(tenant):
     """
     Dynamically add tenant database to Django settings
+    
+    Only registers the connection alias. Migrations are applied out of the
+    request path by `python manage.py bootstrap_tenants` (see tenant_bootstrap).
     """
     db_alias = f"tenant_{tenant.subdomain}"
     
@@ -81,10 +85,8 @@ def setup_tenant_database(tenant):
             'MIRROR': None,
         },
     }
-    try:
-        call_command('migrate', database=db_alias, interactive=False, run_syncdb=True)
-    except Exception as e:
-        pass
+    if registry.get(db_alias) is None:
+        logger.warning(f"Tenant database {db_alias} is not bootstrapped. Run: python manage.py bootstrap_tenants")
     
     logger.info(f"Configured database for tenant {tenant.subdomain}: {db_path}")
     
@@ -106,6 +108,9 @@ class TenantMiddleware(MiddlewareMixin):
         1. X-Requested-From header (custom domains)
         2. X-Tenant-Subdomain header (subdomain-based access)
         3. Host extraction (fallback for direct access)
+        
+        Lookups go through the tenant resolution cache, so warm requests
+        don't query the main database.
         """
         tenant = None
         
@@ -113,11 +118,7 @@ class TenantMiddleware(MiddlewareMixin):
         requested_from = request.headers.get('X-Requested-From')
         if requested_from:
             # Try to find tenant by custom domain
-            tenant = Tenant.objects.using('default').filter(
-                domain_type='custom',
-                custom_domain=requested_from,
-                is_active=True
-            ).first()
+            tenant = get_tenant_by_custom_domain(requested_from)
             if tenant:
                 logger.info(f"✅ [P1] Tenant from X-Requested-From: {tenant.name} (domain: {requested_from})")
                 request.tenant = tenant
@@ -131,10 +132,7 @@ class TenantMiddleware(MiddlewareMixin):
         # PRIORITY 2: Check for X-Tenant-Subdomain header (subdomain-based access)
         subdomain_header = request.headers.get('X-Tenant-Subdomain')
         if subdomain_header:
-            tenant = Tenant.objects.using('default').filter(
-                subdomain=subdomain_header,
-                is_active=True
-            ).first()
+            tenant = get_tenant_by_subdomain(subdomain_header)
             if tenant:
                 logger.info(f"✅ [P2] Tenant from X-Tenant-Subdomain: {tenant.name} ({subdomain_header})")
                 request.tenant = tenant
@@ -150,11 +148,7 @@ class TenantMiddleware(MiddlewareMixin):
         logger.info(f"🌐 [P3] Fallback: Extracting tenant from host: {host}")
         
         # Try custom domain first
-        tenant = Tenant.objects.using('default').filter(
-            domain_type='custom',
-            custom_domain=host,
-            is_active=True
-        ).first()
+        tenant = get_tenant_by_custom_domain(host)
         
         if tenant:
             logger.info(f"✅ Tenant identified by custom domain from host: {tenant.name} ({host})")
@@ -163,10 +157,7 @@ class TenantMiddleware(MiddlewareMixin):
             subdomain = self._extract_subdomain(host)
             if subdomain:
                 logger.info(f"🔍 Extracted subdomain from host: {subdomain}")
-                tenant = Tenant.objects.using('default').filter(
-                    subdomain=subdomain,
-                    is_active=True
-                ).first()
+                tenant = get_tenant_by_subdomain(subdomain)
                 if tenant:
                     logger.info(f"✅ Tenant identified by subdomain from host: {tenant.name} ({subdomain})")
             else:
@@ -0,0 +1,141 @@
+"""
+Tenant Command Runner
+Run a management command against every tenant database in parallel
+
+run_command_for_tenants() starts one worker process per tenant, at most
+`concurrency` at a time. Each worker registers the tenant database alias,
+sets the router's current tenant and runs the command with call_command,
+so commands written for "the current database" (check_ticket_delays,
+init_ticket_thresholds, ...) work unchanged. A worker that exceeds the
+per-tenant timeout is terminated; the other tenants are not held up.
+
+    python manage.py run_for_all_tenants check_ticket_delays
+"""
+import io
+import logging
+import multiprocessing
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from django.conf import settings
+from django.db import connections
+from .tenant_fanout import TenantResult, get_tenant_alias
+
+logger = logging.getLogger(__name__)
+
+# Characters of command output kept per tenant in the summary
+OUTPUT_LIMIT = 4000
+
+
+class TenantCommandError(Exception):
+    """The command raised in the tenant worker (or the worker died)"""
+
+
+def _context():
+    # fork reuses the parent's loaded apps; spawn re-imports Django in each worker
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')
+
+
+def _worker(tenant_pk, command, args, conn):
+    """Worker process body: run the command in the tenant's database context"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+    from django.core.management import call_command
+    from .tenant_db_router import set_current_tenant, clear_current_tenant
+    from .tenant_middleware import setup_tenant_database
+    from .tenant_models import Tenant
+
+    out = io.StringIO()
+    result = {'output': '', 'error': None}
+    try:
+        tenant = Tenant.objects.using('default').get(pk=tenant_pk)
+        setup_tenant_database(tenant)
+        set_current_tenant(tenant)
+        call_command(command, *args, stdout=out, stderr=out)
+    except BaseException as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    finally:
+        clear_current_tenant()
+        connections.close_all()
+        result['output'] = out.getvalue()[-OUTPUT_LIMIT:]
+        conn.send(result)
+        conn.close()
+
+
+def run_command_for_tenants(tenants, command, args=(), concurrency=None, timeout=None):
+    """
+    Run `command` with `args` for every tenant and yield a TenantResult per
+    tenant in completion order (value: {'output': ...}).
+
+    concurrency: worker processes (default TENANT_COMMAND_CONCURRENCY, 4)
+    timeout: seconds a single tenant may run (default TENANT_COMMAND_TIMEOUT, 600)
+
+    Tenants without a database file are yielded first, as skipped
+    (value None, error FileNotFoundError).
+    """
+    concurrency = concurrency or getattr(settings, 'TENANT_COMMAND_CONCURRENCY', 4)
+    timeout = timeout or getattr(settings, 'TENANT_COMMAND_TIMEOUT', 600)
+
+    jobs = deque()
+    for tenant in tenants:
+        if get_tenant_alias(tenant):
+            jobs.append(tenant)
+        else:
+            yield TenantResult(tenant, error=FileNotFoundError('Tenant database not found'))
+
+    # Workers must not inherit open database handles
+    connections.close_all()
+
+    ctx = _context()
+    running = {}  # result pipe -> (tenant, process, started)
+    try:
+        while jobs or running:
+            while jobs and len(running) < concurrency:
+                tenant = jobs.popleft()
+                receiver, sender = ctx.Pipe(duplex=False)
+                process = ctx.Process(
+                    target=_worker, args=(tenant.pk, command, list(args), sender),
+                    name=f'tenant-{tenant.subdomain}'
+                )
+                process.start()
+                sender.close()
+                running[receiver] = (tenant, process, time.monotonic())
+
+            now = time.monotonic()
+            next_deadline = min(started + timeout for _, _, started in running.values())
+            for receiver in wait(list(running), timeout=max(next_deadline - now, 0)):
+                tenant, process, started = running.pop(receiver)
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    result = None
+                process.join()
+                elapsed = time.monotonic() - started
+
+                if result is None:
+                    error = TenantCommandError(f'Worker exited with code {process.exitcode}')
+                    yield TenantResult(tenant, error=error, elapsed=elapsed)
+                elif result['error']:
+                    logger.error(f"{command} failed for tenant {tenant.subdomain}: {result['error']}")
+                    yield TenantResult(tenant, value={'output': result['output']},
+                                       error=TenantCommandError(result['error']), elapsed=elapsed)
+                else:
+                    yield TenantResult(tenant, value={'output': result['output']}, elapsed=elapsed)
+
+            now = time.monotonic()
+            for receiver, (tenant, process, started) in list(running.items()):
+                if now - started > timeout:
+                    running.pop(receiver)
+                    process.terminate()
+                    process.join()
+                    logger.warning(f"{command} timed out for tenant {tenant.subdomain} after {timeout}s")
+                    yield TenantResult(tenant, error=TimeoutError(f'Timed out after {timeout}s'), elapsed=now - started)
+    finally:
+        for tenant, process, _ in running.values():
+            process.terminate()
+            process.join()
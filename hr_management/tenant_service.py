@@ -14,6 +14,7 @@ from django.core.management import call_command
 from django.db import connections, connection
 from .tenant_models import Tenant, TenantModule, ModuleDefinition
 from .tenant_db_router import get_tenant_db_config
+from .tenant_bootstrap import registry
 import logging
 
 logger = logging.getLogger(__name__)
@@ -496,6 +497,7 @@ class TenantService:
         try:
             # Use --fake-initial to handle existing tables
             call_command('migrate', '--fake-initial', database=db_alias, verbosity=0, interactive=False)
+            registry.record(db_alias)
             
             logger.info(f"✓ Migrations completed for {db_alias}")
             return True, None
@@ -1,11 +1,12 @@
 # Django Signals for Tenant Management
 # Auto-creates TenantModule records and Complaint Categories when a Tenant is created
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.db import connections
 from .tenant_models import Tenant, TenantModule, ModuleDefinition
 from .models import ComplaintCategory
+from .tenant_cache import invalidate_tenant_cache
 import logging
 import os
 
@@ -58,6 +59,16 @@ def create_tenant_modules(sender, instance, created, **kwargs):
             logger.error(f"Error creating complaint categories for tenant {instance.name}: {e}")
 
 
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_resolution_cache(sender, instance, **kwargs):
+    """
+    Drop cached tenant lookups whenever a tenant is saved or deleted
+    (domain, subdomain or is_active may have changed)
+    """
+    invalidate_tenant_cache()
+
+
 def populate_tenant_complaint_categories(tenant):
     """
     Automatically populate complaint categories for a new tenant
@@ -180,11 +191,16 @@ def populate_tenant_complaint_categories(tenant):
 
 
 @receiver(post_save, sender=TenantModule)
+@receiver(post_delete, sender=TenantModule)
 def update_tenant_config_on_module_change(sender, instance, **kwargs):
     """
-    Regenerate tenant's config.json whenever a module is enabled/disabled
+    Regenerate tenant's config.json whenever a module is enabled/disabled,
+    and drop the tenant's cached module set used by ModuleAccessMiddleware
     """
     from .tenant_service import TenantService
+    from .module_access_middleware import invalidate_tenant_modules
+    
+    invalidate_tenant_modules(instance.tenant_id)
     
     try:
         TenantService.update_tenant_config(instance.tenant)
@@ -12,6 +12,7 @@ from django.shortcuts import get_object_or_404
 from django.http import JsonResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.db.models import Count
 import os
 import json
 
@@ -27,6 +28,7 @@ from .tenant_serializers import (
     TenantConfigSerializer
 )
 from .tenant_service import TenantService
+from .tenant_fanout import fan_out
 
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
@@ -657,6 +659,19 @@ def check_module_access(request):
         )
 
 
+def _tenant_usage(tenant, db_alias):
+    """Employee / client / complaint counts of one tenant database"""
+    from .models import User, Employee, ClientComplaint
+    
+    return {
+        'tenant_subdomain': tenant.subdomain,
+        'tenant_name': tenant.name,
+        'employees': Employee.objects.using(db_alias).count(),
+        'clients': User.objects.using(db_alias).filter(role='client').count(),
+        'complaints': ClientComplaint.objects.using(db_alias).count(),
+    }
+
+
 @api_view(['GET'])
 @authentication_classes([JWTAuthentication, SessionAuthentication])
 def tenant_statistics(request):
@@ -675,13 +690,15 @@ def tenant_statistics(request):
     active_tenants = Tenant.objects.filter(is_active=True).count()
     inactive_tenants = total_tenants - active_tenants
     
-    # Module usage statistics
+    # Module usage statistics (one grouped count instead of one query per module)
+    enabled_counts = dict(
+        TenantModule.objects.filter(is_enabled=True)
+        .values_list('module_key')
+        .annotate(count=Count('id'))
+    )
     module_stats = {}
     for module in ModuleDefinition.objects.all():
-        enabled_count = TenantModule.objects.filter(
-            module_key=module.module_key,
-            is_enabled=True
-        ).count()
+        enabled_count = enabled_counts.get(module.module_key, 0)
         module_stats[module.module_key] = {
             'name': module.module_name,
             'enabled_count': enabled_count,
@@ -689,11 +706,23 @@ def tenant_statistics(request):
             'percentage': round((enabled_count / total_tenants * 100), 2) if total_tenants > 0 else 0
         }
     
+    # Per-tenant usage, queried across tenant databases in parallel
+    tenant_usage = []
+    failed_tenants = []
+    for result in fan_out(Tenant.objects.filter(is_active=True), _tenant_usage):
+        if result.ok:
+            tenant_usage.append(result.value)
+        else:
+            failed_tenants.append(result.error_info())
+    tenant_usage.sort(key=lambda usage: usage['tenant_subdomain'])
+    
     return Response({
         'total_tenants': total_tenants,
         'active_tenants': active_tenants,
         'inactive_tenants': inactive_tenants,
-        'module_statistics': module_stats
+        'module_statistics': module_stats,
+        'tenant_usage': tenant_usage,
+        'failed_tenants': failed_tenants
     })
 
 
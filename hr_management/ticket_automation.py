@@ -1,10 +1,58 @@
 """
 Automated Ticket Status Management System
 Handles time-aware status transitions, priority-based delays, and smart notifications
+
+Every ticket stores its next due time (delay or auto-close) in
+ClientComplaint.next_deadline_at, recomputed whenever the ticket is saved.
+The hourly check_ticket_delays run only loads tickets whose deadline has
+passed (indexed range query), see process_due_tickets().
 """
+import logging
 from django.utils import timezone
 from datetime import timedelta
 
+logger = logging.getLogger(__name__)
+
+
+class ThresholdCache:
+    """
+    All delay thresholds loaded once (the table is tiny); resolves the
+    thresholds of a complaint in memory, same rules as
+    TicketStatusManager.get_thresholds_for_complaint
+    """
+
+    def __init__(self, using=None, model=None):
+        if model is None:
+            from .models import TicketDelayThreshold as model
+        self.model = model
+        self.using = using
+        thresholds = list(model.objects.using(using).all())
+        self._by_id = {t.id: t for t in thresholds}
+        self._by_priority = {
+            t.priority: t for t in thresholds
+            if t.threshold_type == 'priority' and t.is_active
+        }
+        self._global = next((t for t in thresholds if t.threshold_type == 'global'), None)
+
+    def for_complaint(self, complaint):
+        if complaint.custom_threshold_id and complaint.custom_threshold_id in self._by_id:
+            return self._by_id[complaint.custom_threshold_id]
+
+        threshold = self._by_priority.get(TicketStatusManager.map_priority(complaint.priority))
+        if threshold:
+            return threshold
+
+        if self._global is None:
+            self._global, _ = self.model.objects.using(self.using).get_or_create(
+                threshold_type='global',
+                defaults={
+                    'system_response_hours': 24,
+                    'client_response_hours': 48,
+                    'auto_close_hours': 48,
+                }
+            )
+        return self._global
+
 
 class TicketStatusManager:
     """
@@ -63,6 +111,41 @@ class TicketStatusManager:
             )
             return threshold
     
+    @staticmethod
+    def delay_threshold_hours(complaint, thresholds):
+        """Client replied last: waiting for the system; otherwise waiting for the client"""
+        if complaint.last_responder == TicketStatusManager.RESPONDER_CLIENT:
+            return thresholds.system_response_hours
+        return thresholds.client_response_hours
+
+    @staticmethod
+    def delay_applies(complaint):
+        """Delay tracking stops once a ticket is closed/resolved (unless awaiting confirmation)"""
+        return not (
+            complaint.status in ['closed', 'resolved'] and
+            complaint.automated_status not in [TicketStatusManager.STATUS_RESOLVED_PENDING]
+        )
+
+    @staticmethod
+    def next_deadline(complaint, thresholds):
+        """
+        When the scheduler next has to look at this ticket: the delay
+        deadline (if not delayed yet) or the auto-close deadline, whichever
+        comes first. None when nothing is pending.
+        """
+        if not complaint.last_response_time:
+            return None
+
+        deadlines = []
+        if complaint.delay_status is None and TicketStatusManager.delay_applies(complaint):
+            threshold_hours = TicketStatusManager.delay_threshold_hours(complaint, thresholds)
+            deadlines.append(complaint.last_response_time + timedelta(hours=threshold_hours))
+
+        if complaint.automated_status == TicketStatusManager.STATUS_RESOLVED_PENDING:
+            deadlines.append(complaint.last_response_time + timedelta(hours=thresholds.auto_close_hours))
+
+        return min(deadlines) if deadlines else None
+
     @staticmethod
     def calculate_time_until_delay(complaint):
         """Calculate hours/minutes until ticket becomes delayed"""
@@ -74,12 +157,7 @@ class TicketStatusManager:
         time_since_response = now - complaint.last_response_time
         
         # Determine which threshold applies
-        if complaint.last_responder == TicketStatusManager.RESPONDER_CLIENT:
-            # Waiting for system response
-            threshold_hours = thresholds.system_response_hours
-        else:
-            # Waiting for client response
-            threshold_hours = thresholds.client_response_hours
+        threshold_hours = TicketStatusManager.delay_threshold_hours(complaint, thresholds)
         
         threshold_delta = timedelta(hours=threshold_hours)
         time_remaining = threshold_delta - time_since_response
@@ -198,3 +276,94 @@ class TicketStatusManager:
             return True
         
         return False
+
+
+def process_due_tickets(now=None, dry_run=False, using=None):
+    """
+    Mark delayed / auto-close the tickets whose next_deadline_at has passed.
+    Thresholds come from one ThresholdCache; changes are written with one
+    bulk_update, then notifications are sent.
+
+    Returns {'checked': count, 'delayed': [tickets], 'auto_closed': [tickets], 'notifications': count}.
+    """
+    from .models import ClientComplaint
+    from .notifications import NotificationService
+
+    now = now or timezone.now()
+    db = using or ClientComplaint.objects.db
+    cache = ThresholdCache(using=db)
+
+    due = list(ClientComplaint.objects.using(db).filter(next_deadline_at__lte=now).order_by('next_deadline_at'))
+    delayed, auto_closed = [], []
+
+    for complaint in due:
+        thresholds = cache.for_complaint(complaint)
+        if complaint.last_response_time and TicketStatusManager.delay_applies(complaint) and complaint.delay_status is None:
+            threshold_hours = TicketStatusManager.delay_threshold_hours(complaint, thresholds)
+            if now - complaint.last_response_time >= timedelta(hours=threshold_hours):
+                complaint.delay_status = (
+                    TicketStatusManager.STATUS_DELAYED_SYSTEM
+                    if complaint.last_responder == TicketStatusManager.RESPONDER_CLIENT
+                    else TicketStatusManager.STATUS_DELAYED_CLIENT
+                )
+                delayed.append(complaint)
+
+        if (complaint.automated_status == TicketStatusManager.STATUS_RESOLVED_PENDING and
+                complaint.last_response_time and
+                now - complaint.last_response_time >= timedelta(hours=thresholds.auto_close_hours)):
+            complaint.automated_status = TicketStatusManager.STATUS_AUTO_CLOSED
+            complaint.status = 'closed'
+            auto_closed.append(complaint)
+
+        complaint.next_deadline_at = TicketStatusManager.next_deadline(complaint, thresholds)
+        complaint.updated_at = now
+
+    result = {'checked': len(due), 'delayed': delayed, 'auto_closed': auto_closed, 'notifications': 0}
+    if dry_run:
+        return result
+
+    ClientComplaint.objects.using(db).bulk_update(
+        due, ['delay_status', 'automated_status', 'status', 'next_deadline_at', 'updated_at'], batch_size=500
+    )
+
+    for complaint in delayed:
+        try:
+            if complaint.delay_status == TicketStatusManager.STATUS_DELAYED_SYSTEM:
+                NotificationService.notify_system_delay(complaint)
+            else:
+                NotificationService.notify_client_delay(complaint)
+            result['notifications'] += 1
+        except Exception as e:
+            logger.error(f'Failed to send delay notification for complaint {complaint.id}: {e}')
+
+    for complaint in auto_closed:
+        try:
+            NotificationService.notify_auto_closed(complaint)
+            result['notifications'] += 1
+        except Exception as e:
+            logger.error(f'Failed to send auto-close notification for complaint {complaint.id}: {e}')
+
+    return result
+
+
+def reschedule_tickets(queryset=None, using=None):
+    """
+    Recompute next_deadline_at for tickets, by default those with a pending
+    deadline (used when thresholds change; tickets without a deadline do
+    not depend on thresholds). Returns the number of tickets.
+    """
+    from .models import ClientComplaint
+
+    db = using or ClientComplaint.objects.db
+    if queryset is None:
+        queryset = ClientComplaint.objects.using(db).filter(next_deadline_at__isnull=False)
+    cache = ThresholdCache(using=db)
+
+    tickets = list(queryset.only(
+        'id', 'priority', 'status', 'custom_threshold', 'last_response_time',
+        'last_responder', 'automated_status', 'delay_status', 'next_deadline_at'
+    ))
+    for complaint in tickets:
+        complaint.next_deadline_at = TicketStatusManager.next_deadline(complaint, cache.for_complaint(complaint))
+    ClientComplaint.objects.using(db).bulk_update(tickets, ['next_deadline_at'], batch_size=500)
+    return len(tickets)
@@ -19,7 +19,7 @@ from .views import (
     # Task Sharing Views
     CreateShareableTaskLinkView, ViewSharedTaskView, ListTaskShareLinksView, DeactivateShareLinkView,
     # Multi-wallet views
-    EmployeeWalletSystemView, WalletTransferCreateView,
+    EmployeeWalletSystemView, WalletTransferCreateView, PayrollRunView,
     # Client Complaint System views
     ComplaintCategoryViewSet, PublicComplaintCategoryListView, ClientComplaintViewSet,
     ClientComplaintStatusViewSet, PublicClientComplaintCreateView, ClientComplaintReviewView, 
@@ -172,6 +172,7 @@ urlpatterns = [
     path("employees/<uuid:employee_id>/multi-wallet/transactions/", WalletTransactionCreateView.as_view(), name="multi-wallet-transaction"),
     path("employees/<uuid:employee_id>/multi-wallet/transactions/history/", WalletTransactionListView.as_view(), name="multi-wallet-transaction-history"),
     path("employees/<uuid:employee_id>/wallet-transfers/", WalletTransferCreateView.as_view(), name="wallet-transfer"),
+    path("payroll/run/", PayrollRunView.as_view(), name="payroll-run"),
     
     #central wallet
     path("central-wallet/", CentralWalletDetailView.as_view(), name="central-wallet-detail"),
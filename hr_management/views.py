@@ -2,7 +2,8 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django.core.exceptions import ValidationError, PermissionDenied
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
-from django.db.models import Q, Count, Sum, Avg
+from django.conf import settings
+from django.db.models import Q, Count, Sum, Avg, Prefetch
 import datetime
 from datetime import date, time, timedelta
 from decimal import Decimal
@@ -28,11 +29,23 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework import status as rest_status  # Explicit import to avoid conflicts
 from .custom_permissions import IsEmployer, IsAdminOrComplaintAdmin, HasModuleAccess
+from .tenant_db_router import TenantDatabaseRouter
+from .location_ingestion import LocationPing, ingest_location_ping
+from .branch_index import get_branch_index
+from .task_dashboard import annotate_task_counts, build_employee_rows, get_team_summary
+from .complaint_stats import get_complaint_stats, get_cached
+from .employee_dashboard import get_dashboard_snapshot
+from .query_budget import query_budget
+from .sparse_fields import sparse_fields, optimize_queryset
+from .shift_roster import ShiftRoster, load_attendance
+from .schedule_calendar import ensure_calendar
+from .wallet_ledger import post_transaction
+from .payroll import run_payroll
 from .models import (
     Branch, EmployeeBranch, DailySchedule,  # Branch, EmployeeBranch and DailySchedule models
     Employee, EmployeeDocument, EmployeeNote, EmployeeAttendance, WorkShift,
     LeaveRequest, Complaint, ComplaintReply, ComplaintAttachment, Wallet, WalletTransaction,
-    ReimbursementRequest, Task, Subtask, TaskReport, TaskComment, Team, TeamMembership,
+    ReimbursementRequest, Task, Subtask, TaskReport, TaskComment, Team, TeamMembership, overdue_q,
     TeamTask, OfficeLocation, ShareableTaskLink,  # Added ShareableTaskLink
     # Multi-wallet models
     EmployeeWalletSystem, MainWallet, ReimbursementWallet, AdvanceWallet,
@@ -45,7 +58,7 @@ from .models import (
     # Ticket Automation models
     TicketDelayThreshold,
     # Shift Scheduling models
-    WeeklyShiftSchedule, ShiftOverride, ShiftAttendance,
+    WeeklyShiftSchedule, ShiftOverride, ShiftAttendance, EffectiveSchedule,
     # Location Tracking models
     LocationTrackingEvent, LocationTrackingSummary,
     # Utility functions
@@ -59,7 +72,7 @@ from .serializers import (
     LeaveRequestReviewSerializer, ComplaintSerializer, ComplaintReplySerializer,
     WalletSerializer, WalletTransactionSerializer, CentralWalletSerializer,
     CentralWalletTransactionSerializer, ReimbursementAttachmentSerializer,
-    ReimbursementRequestSerializer, ReimbursementReviewSerializer, TaskSerializer,
+    ReimbursementRequestSerializer, ReimbursementReviewSerializer, TaskSerializer, TaskListSerializer,
     TaskCreateSerializer, TaskUpdateSerializer, SubtaskSerializer, TaskReportSerializer,
     TaskCommentSerializer, ManagerTaskDashboardSerializer, TeamSerializer,
     TeamCreateSerializer, TeamMembershipSerializer, TeamTaskSerializer, OfficeLocationSerializer,
@@ -67,7 +80,7 @@ from .serializers import (
     # Multi-wallet serializers
     EmployeeWalletSystemSerializer, MultiWalletTransactionSerializer, WalletTransferSerializer,
     # Client Complaint System serializers
-    ComplaintCategorySerializer, ClientComplaintSerializer, ClientComplaintSubmissionSerializer,
+    ComplaintCategorySerializer, ClientComplaintSerializer, ClientComplaintListSerializer, ClientComplaintSubmissionSerializer,
     ClientComplaintStatusSerializer, ClientComplaintStatusUpdateSerializer,
     ClientComplaintAttachmentSerializer, ClientComplaintCommentSerializer,
     ClientComplaintStatusHistorySerializer, ClientComplaintAssignmentSerializer,
@@ -199,21 +212,17 @@ class BranchViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        branches = Branch.objects.filter(is_active=True)
+        # Cached per-tenant spatial index, results come back sorted by distance
+        index = get_branch_index(Branch.objects.db)
         nearby_branches = []
         
-        for branch in branches:
-            distance = branch.calculate_distance(latitude, longitude)
-            if distance <= max_distance:
-                is_within, _ = branch.is_within_radius(latitude, longitude)
-                nearby_branches.append({
-                    'branch': BranchSerializer(branch, context={'request': request}).data,
-                    'distance_meters': round(distance, 2),
-                    'within_attendance_radius': is_within
-                })
-        
-        # Sort by distance
-        nearby_branches.sort(key=lambda x: x['distance_meters'])
+        for branch, distance in index.within(latitude, longitude, max_distance):
+            is_within = not branch.require_location or distance <= branch.attendance_radius
+            nearby_branches.append({
+                'branch': BranchSerializer(branch, context={'request': request}).data,
+                'distance_meters': round(distance, 2),
+                'within_attendance_radius': is_within
+            })
         
         return Response(nearby_branches)
 
@@ -531,208 +540,16 @@ class EmployeeDashboardStatsView(APIView):
             if not hasattr(user, 'employee'):
                 return Response({"error": "User is not an employee"}, status=400)
             
-            employee = user.employee
-            today = timezone.now().date()
-            
-            # Get today's work shifts (NEW - using WorkShift model)
-            today_shifts = WorkShift.objects.filter(
-                employee=employee,
-                check_in__date=today
-            ).order_by('check_in')
-            
-            # Check if there's an ONGOING shift from ANY previous day (not checked out yet)
-            ongoing_shift = WorkShift.objects.filter(
-                employee=employee,
-                check_out__isnull=True
-            ).order_by('-check_in').first()
-            
-            # Use ongoing shift if exists, otherwise use today's shift
-            active_shift = ongoing_shift if ongoing_shift else today_shifts.filter(check_out__isnull=True).first()
-            latest_shift = ongoing_shift if ongoing_shift else today_shifts.last()
-            
-            # Determine attendance status based on shifts
-            has_checked_in = (ongoing_shift is not None) or today_shifts.exists()
-            has_active_shift = active_shift is not None
+            # Single-row read of the materialized snapshot (see employee_dashboard)
+            snapshot = get_dashboard_snapshot(user.employee)
+            etag = f'"{snapshot.etag}"'
             
-            # Check if employee has a scheduled shift today or if it's a day off
-            day_of_week = today.weekday()
-            our_day_of_week = (day_of_week + 1) % 7  # Convert to Sunday=0
-            
-            # Default status
-            attendance_status = 'absent'
-            is_late = False
-            late_minutes = 0
-            
-            # First, check if there's an approved override (vacation, sick leave, etc.)
-            try:
-                override = ShiftOverride.objects.get(
-                    employee=employee,
-                    date=today,
-                    status='approved'
-                )
-                
-                if override.override_type in ['day_off', 'vacation', 'sick_leave', 'holiday']:
-                    attendance_status = 'day_off'
-                    # No need to check further - it's a confirmed day off
-                    has_checked_in = False
-                    has_active_shift = False
-            except ShiftOverride.DoesNotExist:
-                pass
-            
-            # If not a day off, check if there's a scheduled shift for today
-            if attendance_status != 'day_off':
-                # First check NEW multi-branch system (DailySchedule)
-                daily_schedules = DailySchedule.objects.filter(
-                    employee_branch__employee=employee,
-                    employee_branch__is_active=True,
-                    day_of_week=our_day_of_week,
-                    is_working_day=True
-                )
-                
-                if daily_schedules.exists():
-                    # Employee has at least one working schedule today in new system
-                    # Get the earliest shift start time from all branches
-                    earliest_schedule = daily_schedules.filter(
-                        shift_start_time__isnull=False
-                    ).order_by('shift_start_time').first()
-                    
-                    if earliest_schedule and has_checked_in and latest_shift:
-                        expected_start = earliest_schedule.shift_start_time
-                        if isinstance(expected_start, str):
-                            import datetime as dt
-                            expected_start = dt.datetime.strptime(expected_start, '%H:%M:%S').time() if len(expected_start) > 5 else dt.datetime.strptime(expected_start, '%H:%M').time()
-                        
-                        # Compare check-in time with expected start time (grace period: 15 minutes)
-                        check_in_time = latest_shift.check_in.time()
-                        expected_start_dt = timezone.datetime.combine(today, expected_start)
-                        check_in_dt = timezone.datetime.combine(today, check_in_time)
-                        grace_period = timezone.timedelta(minutes=15)
-                        
-                        if check_in_dt > (expected_start_dt + grace_period):
-                            is_late = True
-                            late_minutes = int((check_in_dt - expected_start_dt).total_seconds() / 60)
-                            attendance_status = 'late'
-                        else:
-                            attendance_status = 'present'
-                    elif earliest_schedule and has_checked_in:
-                        # Has schedule and checked in (even without shift start time)
-                        attendance_status = 'present'
-                    elif earliest_schedule:
-                        # Has schedule but hasn't checked in yet
-                        attendance_status = 'absent'
-                    else:
-                        # Has working day schedule but no shift times defined
-                        if has_checked_in:
-                            attendance_status = 'present'
-                        else:
-                            attendance_status = 'absent'
-                else:
-                    # Fallback to OLD system (WeeklyShiftSchedule) for backward compatibility
-                    try:
-                        shift_schedule = WeeklyShiftSchedule.objects.get(
-                            employee=employee,
-                            day_of_week=our_day_of_week,
-                            is_active=True
-                        )
-                        
-                        # There is a scheduled shift for today
-                        if has_checked_in and latest_shift:
-                            expected_start = shift_schedule.start_time
-                            if isinstance(expected_start, str):
-                                import datetime as dt
-                                expected_start = dt.datetime.strptime(expected_start, '%H:%M:%S').time() if len(expected_start) > 5 else dt.datetime.strptime(expected_start, '%H:%M').time()
-                            
-                            # Compare check-in time with expected start time (grace period: 15 minutes)
-                            check_in_time = latest_shift.check_in.time()
-                            expected_start_dt = timezone.datetime.combine(today, expected_start)
-                            check_in_dt = timezone.datetime.combine(today, check_in_time)
-                            grace_period = timezone.timedelta(minutes=15)
-                            
-                            if check_in_dt > (expected_start_dt + grace_period):
-                                is_late = True
-                                late_minutes = int((check_in_dt - expected_start_dt).total_seconds() / 60)
-                                attendance_status = 'late'
-                            else:
-                                attendance_status = 'present'
-                        else:
-                            # Shift scheduled but hasn't checked in yet
-                            attendance_status = 'absent'
-                    
-                    except WeeklyShiftSchedule.DoesNotExist:
-                        # No schedule defined in either system - it's a weekly day off
-                        if has_checked_in:
-                            # They checked in on their day off
-                            attendance_status = 'present'
-                        else:
-                            # No shift scheduled for this day - it's their weekly day off
-                            attendance_status = 'day_off'
-            
-            # Get wallet system balances (new multi-wallet system) 
-            try:
-                wallet_system = EmployeeWalletSystem.objects.get(employee=employee)
-                main_wallet = wallet_system.main_wallet
-                reimbursement_wallet = wallet_system.reimbursement_wallet
-                advance_wallet = wallet_system.advance_wallet
-                
-                wallet_data = {
-                    "main_balance": str(main_wallet.balance),
-                    "reimbursement_balance": str(reimbursement_wallet.balance),
-                    "advance_balance": str(advance_wallet.balance),
-                    "total_balance": str(main_wallet.balance + reimbursement_wallet.balance - advance_wallet.balance)
-                }
-            except EmployeeWalletSystem.DoesNotExist:
-                # Create wallet system if it doesn't exist
-                from .signals import get_or_create_wallet_system
-                wallet_system = get_or_create_wallet_system(employee)
-                main_wallet = wallet_system.main_wallet
-                reimbursement_wallet = wallet_system.reimbursement_wallet 
-                advance_wallet = wallet_system.advance_wallet
-                
-                wallet_data = {
-                    "main_balance": str(main_wallet.balance),
-                    "reimbursement_balance": str(reimbursement_wallet.balance),
-                    "advance_balance": str(advance_wallet.balance),
-                    "total_balance": str(main_wallet.balance + reimbursement_wallet.balance - advance_wallet.balance)
-                }
-
-            # Get pending leave requests
-            pending_leaves = LeaveRequest.objects.filter(
-                employee=employee,
-                status='pending'
-            ).count()
-
-            # Get total leave requests
-            total_leaves = LeaveRequest.objects.filter(employee=employee).count()
-
-            # Get recent complaints
-            recent_complaints = Complaint.objects.filter(
-                employee=employee
-            ).order_by('-created_at')[:3]
-            
-            data = {
-                'attendance_today': {
-                    'checked_in': latest_shift.check_in.strftime('%H:%M') if latest_shift else None,
-                    'checked_out': latest_shift.check_out.strftime('%H:%M') if latest_shift and latest_shift.check_out else None,
-                    'status': attendance_status,
-                    'is_late': is_late,
-                    'late_minutes': late_minutes,
-                    'has_active_shift': has_active_shift,
-                    'active_shift_id': str(active_shift.id) if active_shift else None
-                },
-                'wallet_data': wallet_data,
-                'pending_leaves': pending_leaves,
-                'total_leaves': total_leaves,
-                'recent_complaints': [
-                    {
-                        'id': str(complaint.id),
-                        'title': complaint.title,
-                        'status': complaint.status,
-                        'created_at': complaint.created_at
-                    } for complaint in recent_complaints
-                ]
-            }
-            
-            return Response(data)
+            if request.headers.get('If-None-Match') == etag:
+                response = Response(status=304)
+            else:
+                response = Response(snapshot.data)
+            response['ETag'] = etag
+            return response
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -1952,6 +1769,27 @@ class ReimbursementUndoApprovalView(APIView):
 
 # TO-DO System Views
 
+# Relations behind TaskSerializer fields (see sparse_fields.optimize_queryset)
+TASK_SELECT_RELATED = {
+    'employee_name': ['employee'],
+    'created_by_name': ['created_by'],
+    'team_name': ['team'],
+}
+TASK_PREFETCH_RELATED = {
+    'comments': ['comments__author'],
+    'subtasks': ['subtasks__assigned_employee'],
+}
+
+
+def filter_overdue(queryset, request):
+    """Annotate `overdue` and apply ?overdue=true|false"""
+    queryset = queryset.with_overdue()
+    overdue = request.query_params.get('overdue')
+    if overdue in ('true', 'false'):
+        queryset = queryset.filter(overdue=(overdue == 'true'))
+    return queryset
+
+
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
@@ -1961,6 +1799,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         """Use different serializers for create vs other operations"""
         if self.action == 'create':
             return TaskCreateSerializer
+        if self.action == 'list':
+            return TaskListSerializer
         return TaskSerializer
     
     def get_queryset(self):
@@ -1982,6 +1822,12 @@ class TaskViewSet(viewsets.ModelViewSet):
                 except Employee.DoesNotExist:
                     queryset = queryset.none()
             # Admins can access any task for individual operations
+            if self.action == 'list':
+                queryset = filter_overdue(queryset, self.request)
+                queryset = optimize_queryset(
+                    queryset, sparse_fields(TaskListSerializer, self.request),
+                    TASK_SELECT_RELATED, TASK_PREFETCH_RELATED
+                )
             return queryset
         
         # For list view, apply date filtering
@@ -2082,13 +1928,16 @@ class TaskViewSet(viewsets.ModelViewSet):
 
 class AdminTaskManagementView(generics.ListAPIView):
     """Enhanced task management view for admins and team managers"""
-    serializer_class = TaskSerializer
+    serializer_class = TaskListSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
         user = self.request.user
-        queryset = Task.objects.select_related('employee', 'team', 'created_by').prefetch_related('subtasks')
+        queryset = optimize_queryset(
+            Task.objects.all(), sparse_fields(TaskListSerializer, self.request),
+            TASK_SELECT_RELATED, TASK_PREFETCH_RELATED
+        )
         
         # Permission filtering
         if user.role == 'admin':
@@ -2143,6 +1992,9 @@ class AdminTaskManagementView(generics.ListAPIView):
         if priority and priority != 'all':
             queryset = queryset.filter(priority=priority)
         
+        # Overdue filtering (?overdue=true|false), computed in SQL
+        queryset = filter_overdue(queryset, self.request)
+        
         # Employee filtering
         employee_id = self.request.query_params.get('employee_id')
         if employee_id and employee_id != 'all':
@@ -2173,7 +2025,7 @@ class AdminTaskManagementView(generics.ListAPIView):
         sort_by = self.request.query_params.get('sort_by', 'created_at')
         sort_order = self.request.query_params.get('sort_order', 'desc')
         
-        valid_sort_fields = ['created_at', 'date', 'priority', 'status', 'title', 'employee__name', 'team__name']
+        valid_sort_fields = ['created_at', 'date', 'priority', 'status', 'title', 'employee__name', 'team__name', 'overdue']
         if sort_by in valid_sort_fields:
             if sort_order == 'desc':
                 sort_by = f'-{sort_by}'
@@ -2231,14 +2083,24 @@ class TodayTasksView(APIView):
         if user.role in ['employee', 'admin']:
             try:
                 employee = user.employee
+                now = system_now()
                 tasks = Task.objects.filter(employee=employee, date=today)
-                serializer = TaskSerializer(tasks, many=True, context={'request': request})
+                serializer = TaskSerializer(
+                    optimize_queryset(tasks.with_overdue(now), sparse_fields(TaskSerializer, request), TASK_SELECT_RELATED, TASK_PREFETCH_RELATED),
+                    many=True, context={'request': request}
+                )
                 
-                # Calculate summary stats
-                total_tasks = tasks.count()
-                completed_tasks = tasks.filter(status='done').count()
-                in_progress_tasks = tasks.filter(status='doing').count()
-                overdue_tasks = sum(1 for task in tasks if task.is_overdue)
+                # Calculate summary stats in one aggregate query
+                totals = tasks.aggregate(
+                    total=Count('id'),
+                    completed=Count('id', filter=Q(status='done')),
+                    in_progress=Count('id', filter=Q(status='doing')),
+                    overdue=Count('id', filter=overdue_q(now)),
+                )
+                total_tasks = totals['total']
+                completed_tasks = totals['completed']
+                in_progress_tasks = totals['in_progress']
+                overdue_tasks = totals['overdue']
                 
                 completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
                 
@@ -2282,50 +2144,35 @@ class ManagerDashboardView(APIView):
         else:
             date = datetime.date.today()
         
-        # Get all employees with their tasks for the date
-        employees = Employee.objects.all()
-        dashboard_data = []
-        
-        for employee in employees:
-            tasks = Task.objects.filter(employee=employee, date=date)
-            
-            total_tasks = tasks.count()
-            completed_tasks = tasks.filter(status='done').count()
-            in_progress_tasks = tasks.filter(status='doing').count()
-            not_completed_tasks = tasks.filter(status='to_do').count()
-            overdue_tasks = sum(1 for task in tasks if task.is_overdue)
-            
-            completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-            
-            dashboard_data.append({
-                'employee_id': employee.id,
-                'employee_name': employee.name,
-                'total_tasks': total_tasks,
-                'completed_tasks': completed_tasks,
-                'in_progress_tasks': in_progress_tasks,
-                'not_completed_tasks': not_completed_tasks,
-                'completion_rate': round(completion_rate, 2),
-                'overdue_tasks': overdue_tasks,
-                'tasks': TaskSerializer(tasks, many=True, context={'request': request}).data
-            })
+        # Per-employee counters come from one grouped query (see task_dashboard)
+        employees = annotate_task_counts(Employee.objects.all(), date).order_by('name', 'id')
         
-        # Overall team stats
-        all_tasks = Task.objects.filter(date=date)
-        team_total = all_tasks.count()
-        team_completed = all_tasks.filter(status='done').count()
-        team_completion_rate = (team_completed / team_total * 100) if team_total > 0 else 0
+        # Paginate over employees only when requested, to keep the response shape
+        paginator = None
+        if 'page' in request.query_params or 'page_size' in request.query_params:
+            paginator = StandardResultsSetPagination()
+            employees = paginator.paginate_queryset(employees, request, view=self)
         
-        return Response({
+        dashboard_data = build_employee_rows(
+            list(employees),
+            date,
+            lambda tasks: TaskSerializer(tasks, many=True, context={'request': request}).data
+        )
+        
+        response_data = {
             'date': date,
             'employees': dashboard_data,
-            'team_summary': {
-                'total_tasks': team_total,
-                'completed_tasks': team_completed,
-                'completion_rate': round(team_completion_rate, 2),
-                'total_employees': employees.count(),
-                'active_employees': len([emp for emp in dashboard_data if emp['total_tasks'] > 0])
+            'team_summary': get_team_summary(date)
+        }
+        
+        if paginator is not None:
+            response_data['pagination'] = {
+                'count': paginator.page.paginator.count,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
             }
-        })
+        
+        return Response(response_data)
 
 
 class TaskReportViewSet(viewsets.ModelViewSet):
@@ -3227,47 +3074,10 @@ def get_or_create_wallet_system(employee):
 
 def create_wallet_transaction(wallet_system, wallet_type, transaction_type, amount, description, created_by=None, reimbursement_request=None):
     """Create a transaction and update the appropriate wallet balance"""
-    with transaction.atomic():
-        # Create the transaction record
-        wallet_transaction = MultiWalletTransaction.objects.create(
-            wallet_system=wallet_system,
-            wallet_type=wallet_type,
-            transaction_type=transaction_type,
-            amount=amount,
-            description=description,
-            created_by=created_by,
-            reimbursement_request=reimbursement_request
-        )
-        
-        # Update the appropriate wallet balance
-        if wallet_type == 'main':
-            wallet = wallet_system.main_wallet
-        elif wallet_type == 'reimbursement':
-            wallet = wallet_system.reimbursement_wallet
-        elif wallet_type == 'advance':
-            wallet = wallet_system.advance_wallet
-        else:
-            raise ValueError(f"Invalid wallet type: {wallet_type}")
-        
-        # Determine if this is a credit or debit based on transaction type
-        credit_transactions = [
-            'salary_credit', 'bonus_credit', 'manual_deposit', 'reimbursement_payment',
-            'reimbursement_approved', 'advance_taken'
-        ]
-        debit_transactions = [
-            'advance_withdrawal', 'manual_withdrawal', 'advance_deduction', 
-            'reimbursement_paid', 'advance_repaid', 'reimbursement_reversed'  # For undo operations
-        ]
-        
-        if transaction_type in credit_transactions:
-            wallet.balance = Decimal(str(wallet.balance)) + Decimal(str(amount))
-        elif transaction_type in debit_transactions:
-            wallet.balance = Decimal(str(wallet.balance)) - Decimal(str(amount))
-        else:
-            raise ValueError(f"Unknown transaction type: {transaction_type}")
-        
-        wallet.save()
-        return wallet_transaction
+    return post_transaction(
+        wallet_system, wallet_type, transaction_type, amount, description,
+        created_by=created_by, reimbursement_request=reimbursement_request
+    )
 
 def transfer_between_wallets(wallet_system, from_wallet_type, to_wallet_type, amount, description, transfer_type, created_by=None):
     """Transfer money between different wallet types for the same employee"""
@@ -3462,6 +3272,45 @@ class WalletTransferCreateView(generics.CreateAPIView):
         )
 
 
+class PayrollRunView(APIView):
+    """
+    Batch salary crediting for a day or a period (admin only).
+    POST {"start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD"?, "employee_ids": [...]?, "dry_run": bool?}
+    Re-running over the same dates only corrects days whose credits changed.
+    """
+    permission_classes = [IsAuthenticated]
+
+    # A year per request keeps the run inside one web request
+    MAX_DAYS = 366
+
+    def post(self, request):
+        if request.user.role != 'admin':
+            raise PermissionDenied("Only admins can run payroll")
+
+        try:
+            start_date = datetime.datetime.strptime(request.data.get('start_date', ''), '%Y-%m-%d').date()
+            end_date = request.data.get('end_date')
+            end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else start_date
+        except (TypeError, ValueError):
+            return Response({'error': 'start_date / end_date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if end_date < start_date or (end_date - start_date).days >= self.MAX_DAYS:
+            return Response(
+                {'error': f'end_date must be on or after start_date and at most {self.MAX_DAYS} days later'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # JSON true or form "true" / "1"; "false" and "0" are not a dry run
+        dry_run = str(request.data.get('dry_run', False)).lower() in ('true', '1')
+
+        summary = run_payroll(
+            start_date, end_date,
+            employee_ids=request.data.get('employee_ids') or None,
+            dry_run=dry_run
+        )
+        return Response(summary)
+
+
 # Client Complaint System Views
 
 class ComplaintCategoryViewSet(viewsets.ModelViewSet):
@@ -3484,6 +3333,39 @@ class PublicComplaintCategoryListView(generics.ListAPIView):
     permission_classes = []  # No authentication required
 
 
+# Relations behind ClientComplaintSerializer fields, so a page costs the
+# same number of queries whatever its size (see sparse_fields.optimize_queryset)
+COMPLAINT_SELECT_RELATED = {
+    'category_name': ['category'],
+    'category_color': ['category'],
+    'reviewed_by_name': ['reviewed_by'],
+    'resolved_by_name': ['resolved_by'],
+    'status_display': ['custom_status'],
+    'status_color': ['custom_status'],
+    'effective_status': ['custom_status'],
+    'display_status_combined': ['custom_status'],
+    'custom_status_details': ['custom_status__created_by'],
+}
+COMPLAINT_PREFETCH_RELATED = {
+    'attachments': ['attachments'],
+    'assignments': [Prefetch('assignments', queryset=ClientComplaintAssignment.objects.select_related('team', 'assigned_by'))],
+    'employee_assignments': [Prefetch('employee_assignments', queryset=ClientComplaintEmployeeAssignment.objects.select_related('employee', 'assigned_by'))],
+    'tasks': [Prefetch('tasks', queryset=ClientComplaintTask.objects.select_related('task', 'team', 'created_by'))],
+    'comments': [
+        Prefetch('comments', queryset=ClientComplaintComment.objects.select_related('author')),
+        Prefetch('client_replies', queryset=ClientComplaintReply.objects.select_related('admin_responded_by')),
+    ],
+    'status_history': [Prefetch('status_history', queryset=ClientComplaintStatusHistory.objects.select_related('changed_by'))],
+}
+
+
+def optimize_complaint_queryset(queryset, fields):
+    """Joins, prefetches and task counters for the requested complaint fields"""
+    if 'task_statistics' in fields:
+        queryset = queryset.with_task_statistics()
+    return optimize_queryset(queryset, fields, COMPLAINT_SELECT_RELATED, COMPLAINT_PREFETCH_RELATED)
+
+
 class ClientComplaintViewSet(viewsets.ModelViewSet):
     """ViewSet for managing client complaints"""
     queryset = ClientComplaint.objects.all()
@@ -3493,13 +3375,13 @@ class ClientComplaintViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'create':
             return ClientComplaintSubmissionSerializer
+        if self.action == 'list':
+            return ClientComplaintListSerializer
         return ClientComplaintSerializer
     
     def get_queryset(self):
-        queryset = ClientComplaint.objects.select_related(
-            'category', 'reviewed_by', 'resolved_by'
-        ).prefetch_related(
-            'attachments', 'assignments__team', 'tasks__task', 'comments__author', 'status_history__changed_by'
+        queryset = optimize_complaint_queryset(
+            ClientComplaint.objects.all(), sparse_fields(self.get_serializer_class(), self.request)
         )
         
         # Filter based on user role and team assignments (unless filtering by specific team)
@@ -3547,6 +3429,11 @@ class ClientComplaintViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-created_at')
     
+    def list(self, request, *args, **kwargs):
+        budget = getattr(settings, 'COMPLAINT_LIST_QUERY_BUDGET', 15)
+        with query_budget(budget, using=ClientComplaint.objects.db, label='complaint list'):
+            return super().list(request, *args, **kwargs)
+    
     def destroy(self, request, *args, **kwargs):
         """Delete a complaint - Only admins can delete complaints"""
         complaint = self.get_object()
@@ -4171,20 +4058,19 @@ class ClientComplaintCommentViewSet(viewsets.ModelViewSet):
 
 class TeamComplaintDashboardView(generics.ListAPIView):
     """Dashboard view for teams to see their assigned complaints"""
-    serializer_class = ClientComplaintSerializer
+    serializer_class = ClientComplaintListSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
         user_teams = Team.objects.filter(memberships__employee__user=self.request.user)
         
-        queryset = ClientComplaint.objects.filter(
-            assignments__team__in=user_teams,
-            assignments__is_active=True
-        ).distinct().select_related(
-            'category', 'reviewed_by', 'resolved_by'
-        ).prefetch_related(
-            'attachments', 'assignments__team', 'tasks__task', 'comments__author', 'status_history__changed_by'
+        queryset = optimize_complaint_queryset(
+            ClientComplaint.objects.filter(
+                assignments__team__in=user_teams,
+                assignments__is_active=True
+            ).distinct(),
+            sparse_fields(ClientComplaintListSerializer, self.request)
         )
         
         # Filter by status if provided
@@ -4223,89 +4109,18 @@ class ComplaintDashboardStatsView(APIView):
                 assignments__is_active=True
             ).distinct()
         
-        # Basic counts
-        total_complaints = complaints.count()
-        pending_review = complaints.filter(status='pending_review').count()
-        approved = complaints.filter(status='approved').count()
-        rejected = complaints.filter(status='rejected').count()
-        in_progress = complaints.filter(status='in_progress').count()
-        resolved = complaints.filter(status='resolved').count()
-        closed = complaints.filter(status='closed').count()
-        overdue_complaints = complaints.filter(status__in=['pending_review', 'approved', 'in_progress']).count()
-        urgent_complaints = complaints.filter(priority='urgent').count()
-        
-        # Recent complaints (last 10)
-        recent_complaints = complaints.select_related('category').order_by('-created_at')[:10]
-        recent_complaints_data = ClientComplaintSerializer(recent_complaints, many=True).data
-        
-        # Complaints by category
-        complaints_by_category = []
-        categories = ComplaintCategory.objects.filter(is_active=True)
-        for category in categories:
-            count = complaints.filter(category=category).count()
-            if count > 0:
-                complaints_by_category.append({
-                    'category_name': category.name,
-                    'count': count,
-                    'color': category.color
-                })
+        # Counters, breakdowns and resolution times from a few aggregate queries,
+        # cached per tenant and scope for a short TTL (see complaint_stats)
+        scope = 'admin' if request.user.role == 'admin' else f'user:{request.user.id}'
         
-        # Complaints by priority
-        complaints_by_priority = [
-            {
-                'priority': 'urgent',
-                'count': complaints.filter(priority='urgent').count()
-            },
-            {
-                'priority': 'medium',
-                'count': complaints.filter(priority='medium').count()
-            },
-            {
-                'priority': 'low',
-                'count': complaints.filter(priority='low').count()
-            }
-        ]
+        def build():
+            stats = get_complaint_stats(complaints)
+            # Recent complaints (last 10)
+            recent_complaints = complaints.select_related('category').order_by('-created_at')[:10]
+            stats['recent_complaints'] = ClientComplaintSerializer(recent_complaints, many=True).data
+            return stats
         
-        # Resolution times (simplified - would need more complex query for accurate times)
-        resolved_complaints = complaints.filter(status='resolved', resolved_at__isnull=False)
-        if resolved_complaints.exists():
-            # Calculate average resolution time in hours
-            total_time = 0
-            count = 0
-            for complaint in resolved_complaints:
-                if complaint.created_at and complaint.resolved_at:
-                    time_diff = complaint.resolved_at - complaint.created_at
-                    total_time += time_diff.total_seconds() / 3600  # Convert to hours
-                    count += 1
-            
-            avg_resolution = total_time / count if count > 0 else 0
-            resolution_times = {
-                'average_resolution_hours': round(avg_resolution, 2),
-                'fastest_resolution_hours': 1,  # Placeholder
-                'slowest_resolution_hours': round(avg_resolution * 2, 2)  # Placeholder
-            }
-        else:
-            resolution_times = {
-                'average_resolution_hours': 0,
-                'fastest_resolution_hours': 0,
-                'slowest_resolution_hours': 0
-            }
-        
-        return Response({
-            'total_complaints': total_complaints,
-            'pending_review': pending_review,
-            'approved': approved,
-            'rejected': rejected,
-            'in_progress': in_progress,
-            'resolved': resolved,
-            'closed': closed,
-            'overdue_complaints': overdue_complaints,
-            'urgent_complaints': urgent_complaints,
-            'recent_complaints': recent_complaints_data,
-            'complaints_by_category': complaints_by_category,
-            'complaints_by_priority': complaints_by_priority,
-            'resolution_times': resolution_times
-        })
+        return Response(get_cached(scope, build))
 
 
 class ClientComplaintTaskCreateView(APIView):
@@ -5311,6 +5126,8 @@ class ShiftAttendanceViewSet(viewsets.ModelViewSet):
         GET /api/shifts/attendance/current_status/?employee_id=<uuid>
         """
         employee_id = request.query_params.get('employee_id')
+        now = timezone.now()
+        today = now.date()
         
         if employee_id:
             # Single employee status
@@ -5318,64 +5135,10 @@ class ShiftAttendanceViewSet(viewsets.ModelViewSet):
                 employee = Employee.objects.get(id=employee_id)
             except Employee.DoesNotExist:
                 return Response({'error': 'موظف غير موجود'}, status=status.HTTP_404_NOT_FOUND)
-                
-            today = timezone.now().date()
-            current_time = timezone.now().time()
             
-            shift = get_employee_shift_for_date(employee_id, today)
-            
-            if shift:
-                # Check actual attendance from WorkShift (old system)
-                try:
-                    # Get today's work shifts
-                    today_shifts = WorkShift.objects.filter(
-                        employee=employee,
-                        check_in__date=today
-                    ).order_by('check_in')
-                    
-                    latest_shift = today_shifts.last()
-                    active_shift = today_shifts.filter(check_out__isnull=True).first()
-                    
-                    has_clocked_in = latest_shift is not None
-                    clock_in_time = latest_shift.check_in.time() if latest_shift else None
-                    
-                    # Get attendance status
-                    try:
-                        attendance_record = EmployeeAttendance.objects.get(employee=employee, date=today)
-                        att_status = attendance_record.get_status_display()
-                        
-                        # Calculate late minutes if late
-                        if attendance_record.status == 'late' and clock_in_time:
-                            expected_start = shift['start_time']
-                            check_in_dt = timezone.datetime.combine(today, clock_in_time)
-                            expected_dt = timezone.datetime.combine(today, expected_start)
-                            late_minutes = int((check_in_dt - expected_dt).total_seconds() / 60)
-                        else:
-                            late_minutes = 0
-                    except EmployeeAttendance.DoesNotExist:
-                        att_status = 'لم يسجل دخول'
-                        late_minutes = 0
-                    
-                except Exception as e:
-                    has_clocked_in = False
-                    clock_in_time = None
-                    att_status = 'لم يسجل دخول'
-                    late_minutes = 0
-                
-                data = {
-                    'employee_id': str(employee.id),
-                    'employee_name': employee.name,
-                    'is_on_shift': shift['start_time'] <= current_time <= shift['end_time'],
-                    'shift_start': shift['start_time'].strftime('%H:%M'),
-                    'shift_end': shift['end_time'].strftime('%H:%M'),
-                    'has_clocked_in': has_clocked_in,
-                    'clock_in_time': clock_in_time.strftime('%H:%M') if clock_in_time else None,
-                    'clock_out_time': today_shift.check_out.strftime('%H:%M') if has_clocked_in and today_shift.check_out else None,
-                    'status': att_status,
-                    'late_minutes': late_minutes
-                }
-            else:
-                data = {
+            shift = ShiftRoster(today, employee_ids=[employee.id]).shift_for(employee.id, today)
+            if not shift:
+                return Response({
                     'employee_id': str(employee.id),
                     'employee_name': employee.name,
                     'is_on_shift': False,
@@ -5385,67 +5148,62 @@ class ShiftAttendanceViewSet(viewsets.ModelViewSet):
                     'clock_in_time': None,
                     'status': 'عطلة',
                     'late_minutes': 0
-                }
+                })
             
+            shifts_by_employee, attendance_by_employee = load_attendance([employee.id], today)
+            data = self._status_row(
+                employee, shift, shifts_by_employee[employee.id], attendance_by_employee.get(employee.id), today
+            )
+            data['is_on_shift'] = shift['start_time'] <= now.time() <= shift['end_time']
             return Response(data)
+        
+        # All employees currently on shift: a constant number of queries
+        # (employees, overrides, schedules, work shifts, attendance records)
+        employees_on_shift = get_employees_on_shift_now()
+        shifts_by_employee, attendance_by_employee = load_attendance(
+            [emp_shift['employee'].id for emp_shift in employees_on_shift], today
+        )
+        
+        status_data = []
+        for emp_shift in employees_on_shift:
+            employee = emp_shift['employee']
+            status_data.append(self._status_row(
+                employee, emp_shift, shifts_by_employee[employee.id], attendance_by_employee.get(employee.id), today
+            ))
+        return Response(status_data)
+    
+    def _status_row(self, employee, shift, today_shifts, attendance_record, today):
+        """Status of an employee with a shift today, from preloaded work shifts and attendance"""
+        # Check actual attendance from WorkShift (old system)
+        latest_shift = today_shifts[-1] if today_shifts else None
+        has_clocked_in = latest_shift is not None
+        clock_in_time = latest_shift.check_in.time() if latest_shift else None
+        
+        # Get attendance status
+        late_minutes = 0
+        if attendance_record:
+            att_status = attendance_record.get_status_display()
+            
+            # Calculate late minutes if late
+            if attendance_record.status == 'late' and clock_in_time:
+                check_in_dt = timezone.datetime.combine(today, clock_in_time)
+                expected_dt = timezone.datetime.combine(today, shift['start_time'])
+                late_minutes = int((check_in_dt - expected_dt).total_seconds() / 60)
         else:
-            # All employees currently on shift
-            employees_on_shift = get_employees_on_shift_now()
-            
-            status_data = []
-            today = timezone.now().date()
-            
-            for emp_shift in employees_on_shift:
-                employee = emp_shift['employee']
-                
-                # Check actual attendance from WorkShift (old system)
-                try:
-                    today_shifts = WorkShift.objects.filter(
-                        employee=employee,
-                        check_in__date=today
-                    ).order_by('check_in')
-                    
-                    latest_shift = today_shifts.last()
-                    
-                    has_clocked_in = latest_shift is not None
-                    clock_in_time = latest_shift.check_in.time() if latest_shift else None
-                    
-                    # Get attendance status
-                    try:
-                        attendance_record = EmployeeAttendance.objects.get(employee=employee, date=today)
-                        att_status = attendance_record.get_status_display()
-                        
-                        # Calculate late minutes if late
-                        if attendance_record.status == 'late' and clock_in_time:
-                            expected_start = emp_shift['start_time']
-                            check_in_dt = timezone.datetime.combine(today, clock_in_time)
-                            expected_dt = timezone.datetime.combine(today, expected_start)
-                            late_minutes = int((check_in_dt - expected_dt).total_seconds() / 60)
-                        else:
-                            late_minutes = 0
-                    except EmployeeAttendance.DoesNotExist:
-                        att_status = 'لم يسجل دخول'
-                        late_minutes = 0
-                        
-                except Exception as e:
-                    has_clocked_in = False
-                    clock_in_time = None
-                    att_status = 'لم يسجل دخول'
-                    late_minutes = 0
-                
-                status_data.append({
-                    'employee_id': str(employee.id),
-                    'employee_name': employee.name,
-                    'is_on_shift': True,
-                    'shift_start': emp_shift['start_time'].strftime('%H:%M'),
-                    'shift_end': emp_shift['end_time'].strftime('%H:%M'),
-                    'has_clocked_in': has_clocked_in,
-                    'clock_in_time': clock_in_time.strftime('%H:%M') if clock_in_time else None,
-                    'status': att_status,
-                    'late_minutes': late_minutes
-                })
-            
-            return Response(status_data)
+            att_status = 'لم يسجل دخول'
+        
+        return {
+            'employee_id': str(employee.id),
+            'employee_name': employee.name,
+            'is_on_shift': True,
+            'shift_start': shift['start_time'].strftime('%H:%M'),
+            'shift_end': shift['end_time'].strftime('%H:%M'),
+            'has_clocked_in': has_clocked_in,
+            'clock_in_time': clock_in_time.strftime('%H:%M') if clock_in_time else None,
+            'clock_out_time': latest_shift.check_out.strftime('%H:%M') if latest_shift and latest_shift.check_out else None,
+            'status': att_status,
+            'late_minutes': late_minutes
+        }
     
     @action(detail=False, methods=['get'])
     def daily_report(self, request):
@@ -5456,24 +5214,14 @@ class ShiftAttendanceViewSet(viewsets.ModelViewSet):
         date_str = request.query_params.get('date', timezone.now().date().isoformat())
         report_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
         
-        # Get all employees scheduled for this date
-        day_of_week = report_date.weekday()
-        # Convert Python weekday (0=Monday) to our system (0=Sunday)
-        if day_of_week == 6:
-            day_of_week = 0
-        else:
-            day_of_week += 1
-        
-        scheduled_employees = WeeklyShiftSchedule.objects.filter(
-            day_of_week=day_of_week,
-            is_active=True
-        ).exclude(
-            employee__shift_overrides__date=report_date,
-            employee__shift_overrides__override_type__in=['day_off', 'vacation', 'sick_leave', 'holiday'],
-            employee__shift_overrides__status='approved'
-        ).select_related('employee')
-        
-        total_scheduled = scheduled_employees.count()
+        # Employees scheduled for this date, from the effective schedule calendar
+        # (overrides, multi-branch daily schedules and weekly schedules)
+        ensure_calendar(report_date)
+        total_scheduled = EffectiveSchedule.objects.filter(
+            date=report_date,
+            is_day_off=False,
+            employee__status='active'
+        ).count()
         
         # Get attendance records
         attendance_records = ShiftAttendance.objects.filter(date=report_date).select_related('employee')
@@ -5729,97 +5477,16 @@ class LocationPingView(APIView):
             latitude = round_gps_coordinate(latitude)
             longitude = round_gps_coordinate(longitude)
             
-            # Get employee's active branches
-            employee_branches = EmployeeBranch.objects.filter(
-                employee=employee,
-                is_active=True
-            ).select_related('branch')
-            
-            if not employee_branches.exists():
-                return Response({'status': 'ok', 'message': 'No active branches'}, status=200)
-            
-            # Find nearest branch and calculate distance
-            nearest_branch = None
-            min_distance = float('inf')
-            
-            for eb in employee_branches:
-                branch = eb.branch
-                distance = branch.calculate_distance(latitude, longitude)
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_branch = branch
-            
-            if not nearest_branch:
-                return Response({'status': 'ok', 'message': 'No branch found'}, status=200)
-            
-            within_radius = min_distance <= nearest_branch.attendance_radius
-            
-            # Get active shift
-            active_shift = WorkShift.objects.filter(
-                employee=employee,
-                is_active=True,
-                check_out__isnull=True
-            ).first()
-            
-            # Get or create today's summary
-            today = timezone.now().date()
-            summary, created = LocationTrackingSummary.objects.get_or_create(
-                employee=employee,
-                date=today,
-                defaults={
-                    'shift': active_shift,
-                    'first_ping': timezone.now(),
-                    'last_ping': timezone.now()
-                }
-            )
-            
-            # Update last ping
-            summary.last_ping = timezone.now()
-            
-            # Determine event type and update summary
-            event_type = 'ping'
-            duration_outside = None
-            
-            if not within_radius and not summary.currently_outside:
-                # Employee just exited
-                event_type = 'exit'
-                summary.currently_outside = True
-                summary.current_exit_started = timezone.now()
-                summary.total_exits += 1
-                
-            elif within_radius and summary.currently_outside:
-                # Employee just entered back
-                event_type = 'enter'
-                summary.currently_outside = False
-                
-                # Calculate duration outside
-                if summary.current_exit_started:
-                    duration = (timezone.now() - summary.current_exit_started).total_seconds()
-                    duration_outside = int(duration)
-                    summary.total_time_outside += duration_outside
-                    
-                    # Update longest exit
-                    if duration_outside > summary.longest_exit_duration:
-                        summary.longest_exit_duration = duration_outside
-                    
-                    summary.current_exit_started = None
-            
-            summary.save()
-            
-            # Create tracking event
-            LocationTrackingEvent.objects.create(
-                employee=employee,
-                shift=active_shift,
-                branch=nearest_branch,
-                event_type=event_type,
+            # Summary/event bookkeeping is batched (see location_ingestion)
+            ping = LocationPing(
+                employee_id=employee.id,
                 latitude=latitude,
                 longitude=longitude,
-                distance_from_branch=int(min_distance),
-                within_radius=within_radius,
-                duration_outside=duration_outside,
-                battery_level=battery_level,
-                accuracy=accuracy
+                received_at=timezone.now(),
+                accuracy=accuracy,
+                battery_level=battery_level
             )
+            ingest_location_ping(ping, TenantDatabaseRouter().get_tenant_db_alias())
             
             # Return minimal response (don't reveal tracking)
             return Response({
@@ -0,0 +1,282 @@
+"""
+Wallet Ledger
+Single write path for multi-wallet balances
+
+MultiWalletTransaction is an append-only ledger; wallet balances are moved
+with UPDATE ... SET balance = balance + delta, touching only the balance
+column, so concurrent credits never overwrite each other.
+
+WalletBalanceSnapshot keeps end-of-day balances (`python manage.py
+snapshot_wallet_balances`, nightly). balance_at() starts from the latest
+snapshot on or before a date and only sums the ledger rows after it.
+Reversing (deleting) a ledger row drops the snapshots it invalidates.
+"""
+import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, When, F, Sum, Value, DecimalField
+from django.utils import timezone
+from .models import (
+    MainWallet, ReimbursementWallet, AdvanceWallet,
+    MultiWalletTransaction, WalletBalanceSnapshot, EmployeeDashboardSnapshot
+)
+
+# Wallets per UPDATE ... CASE statement in batch postings
+BATCH_SIZE = 200
+
+CREDIT_TRANSACTIONS = [
+    'salary_credit', 'bonus_credit', 'manual_deposit', 'reimbursement_payment',
+    'reimbursement_approved', 'advance_taken'
+]
+DEBIT_TRANSACTIONS = [
+    'advance_withdrawal', 'manual_withdrawal', 'advance_deduction',
+    'reimbursement_paid', 'advance_repaid', 'reimbursement_reversed'  # For undo operations
+]
+
+# wallet_type -> (model, related name on EmployeeWalletSystem)
+WALLETS = {
+    'main': (MainWallet, 'main_wallet'),
+    'reimbursement': (ReimbursementWallet, 'reimbursement_wallet'),
+    'advance': (AdvanceWallet, 'advance_wallet'),
+}
+
+
+def signed_amount(transaction_type, amount):
+    """Balance delta of a transaction: positive for credits, negative for debits"""
+    amount = Decimal(str(amount))
+    if transaction_type in CREDIT_TRANSACTIONS:
+        return amount
+    if transaction_type in DEBIT_TRANSACTIONS:
+        return -amount
+    raise ValueError(f"Unknown transaction type: {transaction_type}")
+
+
+def _delta_expression():
+    """SUM of signed ledger amounts, for aggregate()/annotate()"""
+    return Sum(
+        Case(
+            When(transaction_type__in=CREDIT_TRANSACTIONS, then=F('amount')),
+            When(transaction_type__in=DEBIT_TRANSACTIONS, then=-F('amount')),
+            default=Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+def _wallet_model(wallet_type):
+    if wallet_type not in WALLETS:
+        raise ValueError(f"Invalid wallet type: {wallet_type}")
+    return WALLETS[wallet_type]
+
+
+def _end_of_day(day):
+    return timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+
+
+def _apply_delta(wallet_system, wallet_type, delta, db, since):
+    """Move a wallet balance by delta and drop state derived from it"""
+    from .employee_dashboard import invalidate_dashboard_snapshots
+
+    model, related_name = _wallet_model(wallet_type)
+    model.objects.using(db).filter(wallet_system_id=wallet_system.id).update(balance=F('balance') + delta)
+
+    # Snapshots on or after the affected day no longer match the ledger
+    WalletBalanceSnapshot.objects.using(db).filter(
+        wallet_system_id=wallet_system.id, wallet_type=wallet_type, date__gte=since
+    ).delete()
+
+    # update() skips the wallet post_save signals, so invalidate explicitly
+    invalidate_dashboard_snapshots(wallet_system.employee_id, db)
+
+    # Keep an already loaded wallet instance in step for callers reading it back
+    wallet = wallet_system._state.fields_cache.get(related_name)
+    if wallet is not None:
+        wallet.refresh_from_db(using=db, fields=['balance'])
+
+
+def _apply_deltas(deltas, db, since):
+    """
+    Batch form of _apply_delta. deltas: {(wallet_type, wallet_system_id): delta};
+    one UPDATE per wallet type and chunk of wallets.
+    """
+    by_type = {}
+    for (wallet_type, wallet_system_id), delta in deltas.items():
+        if delta:
+            by_type.setdefault(wallet_type, {})[wallet_system_id] = delta
+
+    for wallet_type, wallet_deltas in by_type.items():
+        model, _ = _wallet_model(wallet_type)
+        ids = list(wallet_deltas)
+        for i in range(0, len(ids), BATCH_SIZE):
+            chunk = ids[i:i + BATCH_SIZE]
+            model.objects.using(db).filter(wallet_system_id__in=chunk).update(balance=F('balance') + Case(
+                *[When(wallet_system_id=pk, then=Value(wallet_deltas[pk])) for pk in chunk],
+                default=Value(Decimal('0')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ))
+        WalletBalanceSnapshot.objects.using(db).filter(
+            wallet_system_id__in=ids, wallet_type=wallet_type, date__gte=since
+        ).delete()
+
+    wallet_system_ids = {pk for wallet_deltas in by_type.values() for pk in wallet_deltas}
+    if wallet_system_ids:
+        EmployeeDashboardSnapshot.objects.using(db).filter(
+            employee__wallet_system__in=wallet_system_ids
+        ).delete()
+
+
+def post_transaction(wallet_system, wallet_type, transaction_type, amount, description,
+                     created_by=None, reimbursement_request=None, source_type='', source_id='',
+                     business_date=None, using=None):
+    """
+    Append a ledger row and apply its delta to the wallet balance.
+    source_type / source_id / business_date identify the record behind it
+    (unique per transaction type), see source_transactions().
+    """
+    _wallet_model(wallet_type)
+    delta = signed_amount(transaction_type, amount)
+    db = using or wallet_system._state.db or MultiWalletTransaction.objects.db
+
+    with transaction.atomic(using=db):
+        wallet_transaction = MultiWalletTransaction.objects.using(db).create(
+            wallet_system=wallet_system,
+            wallet_type=wallet_type,
+            transaction_type=transaction_type,
+            amount=amount,
+            description=description,
+            created_by=created_by,
+            reimbursement_request=reimbursement_request,
+            source_type=source_type,
+            source_id=str(source_id) if source_id else '',
+            business_date=business_date
+        )
+        _apply_delta(wallet_system, wallet_type, delta, db, timezone.localdate(wallet_transaction.created_at))
+    return wallet_transaction
+
+
+def reverse_transaction(wallet_transaction, using=None):
+    """Delete a ledger row and undo its delta on the wallet balance"""
+    db = using or wallet_transaction._state.db or MultiWalletTransaction.objects.db
+    wallet_system = wallet_transaction.wallet_system
+
+    with transaction.atomic(using=db):
+        delta = signed_amount(wallet_transaction.transaction_type, wallet_transaction.amount)
+        since = timezone.localdate(wallet_transaction.created_at)
+        wallet_transaction.delete(using=db)
+        _apply_delta(wallet_system, wallet_transaction.wallet_type, -delta, db, since)
+
+
+def post_batch(transactions, using=None):
+    """
+    Append many unsaved MultiWalletTransaction rows (wallet_system_id set)
+    with bulk_create and apply their net deltas per wallet.
+    """
+    if not transactions:
+        return []
+    db = using or MultiWalletTransaction.objects.db
+    deltas = {}
+    for wallet_transaction in transactions:
+        key = (wallet_transaction.wallet_type, wallet_transaction.wallet_system_id)
+        deltas[key] = deltas.get(key, Decimal('0')) + signed_amount(
+            wallet_transaction.transaction_type, wallet_transaction.amount
+        )
+
+    with transaction.atomic(using=db):
+        created = MultiWalletTransaction.objects.using(db).bulk_create(transactions, batch_size=500)
+        _apply_deltas(deltas, db, timezone.localdate())
+    return created
+
+
+def reverse_batch(transactions, using=None):
+    """Delete many ledger rows and undo their net deltas per wallet"""
+    transactions = list(transactions)
+    if not transactions:
+        return 0
+    db = using or MultiWalletTransaction.objects.db
+    deltas = {}
+    for wallet_transaction in transactions:
+        key = (wallet_transaction.wallet_type, wallet_transaction.wallet_system_id)
+        deltas[key] = deltas.get(key, Decimal('0')) - signed_amount(
+            wallet_transaction.transaction_type, wallet_transaction.amount
+        )
+    since = min(timezone.localdate(t.created_at) for t in transactions)
+
+    with transaction.atomic(using=db):
+        MultiWalletTransaction.objects.using(db).filter(pk__in=[t.pk for t in transactions]).delete()
+        _apply_deltas(deltas, db, since)
+    return len(transactions)
+
+
+def source_transactions(source_type, source_id, transaction_type=None, using=None):
+    """Ledger rows posted for one source record (unique index lookup)"""
+    queryset = MultiWalletTransaction.objects.using(using).filter(source_type=source_type, source_id=str(source_id))
+    if transaction_type:
+        queryset = queryset.filter(transaction_type=transaction_type)
+    return queryset
+
+
+def ledger_delta(wallet_system_id, wallet_type, after=None, until=None, using=None):
+    """Sum of signed amounts for one wallet with after <= created_at < until"""
+    queryset = MultiWalletTransaction.objects.using(using).filter(
+        wallet_system_id=wallet_system_id, wallet_type=wallet_type
+    )
+    if after is not None:
+        queryset = queryset.filter(created_at__gte=after)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset.aggregate(delta=_delta_expression())['delta'] or Decimal('0')
+
+
+def balance_at(wallet_system, wallet_type, day, using=None):
+    """
+    Wallet balance at the end of `day`: latest snapshot on or before the day
+    plus the ledger rows after it. Without a snapshot, the current balance
+    minus the ledger rows after the day.
+    """
+    model, _ = _wallet_model(wallet_type)
+    snapshot = WalletBalanceSnapshot.objects.using(using).filter(
+        wallet_system_id=wallet_system.id, wallet_type=wallet_type, date__lte=day
+    ).order_by('-date').first()
+
+    if snapshot:
+        if snapshot.date == day:
+            return snapshot.balance
+        return snapshot.balance + ledger_delta(
+            wallet_system.id, wallet_type, after=_end_of_day(snapshot.date), until=_end_of_day(day), using=using
+        )
+
+    current = model.objects.using(using).filter(
+        wallet_system_id=wallet_system.id
+    ).values_list('balance', flat=True).first() or Decimal('0')
+    return current - ledger_delta(wallet_system.id, wallet_type, after=_end_of_day(day), using=using)
+
+
+def snapshot_balances(day=None, using=None):
+    """
+    Store end-of-day balances of every wallet for `day` (default: yesterday).
+    One grouped ledger query per wallet type; returns the number of snapshots.
+    """
+    day = day or timezone.localdate() - datetime.timedelta(days=1)
+    db = using or WalletBalanceSnapshot.objects.db
+    cutoff = _end_of_day(day)
+
+    snapshots = []
+    for wallet_type, (model, _) in WALLETS.items():
+        # Balances now, minus everything posted after the end of the day
+        later = dict(
+            MultiWalletTransaction.objects.using(db).filter(
+                wallet_type=wallet_type, created_at__gte=cutoff
+            ).values('wallet_system_id').annotate(delta=_delta_expression()).values_list('wallet_system_id', 'delta')
+        )
+        for wallet_system_id, balance in model.objects.using(db).values_list('wallet_system_id', 'balance'):
+            snapshots.append(WalletBalanceSnapshot(
+                wallet_system_id=wallet_system_id,
+                wallet_type=wallet_type,
+                date=day,
+                balance=balance - (later.get(wallet_system_id) or Decimal('0'))
+            ))
+
+    with transaction.atomic(using=db):
+        WalletBalanceSnapshot.objects.using(db).filter(date=day).delete()
+        WalletBalanceSnapshot.objects.using(db).bulk_create(snapshots, batch_size=500)
+    return len(snapshots)
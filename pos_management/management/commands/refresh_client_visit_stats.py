@@ -0,0 +1,15 @@
+"""
+Recompute the denormalized distribution stats on Client
+Run after imports or bulk edits that bypass the distribution signals
+(all tenants: python manage.py run_for_all_tenants refresh_client_visit_stats)
+"""
+from django.core.management.base import BaseCommand
+from pos_management.models import Client
+
+
+class Command(BaseCommand):
+    help = 'Recompute cached_total_distributions and cached_next_visit_date for all clients'
+
+    def handle(self, *args, **options):
+        updated = Client.objects.all().refresh_visit_stats()
+        self.stdout.write(self.style.SUCCESS(f'✓ Refreshed visit stats for {updated} client(s)'))
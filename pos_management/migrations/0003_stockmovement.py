@@ -0,0 +1,92 @@
+# Generated by Django 4.2.13 on 2026-10-16 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+def open_journal(apps, schema_editor):
+    """
+    Seed the journal so quantities can be reconstructed as of past dates:
+    one distribution movement per existing distribution (at distributed_at),
+    then one opening movement per inventory row for whatever the
+    distributions don't explain (edits, reductions and cancellations made
+    before the journal existed, whose dates are unknown). The movements of a
+    row add up to its current_quantity.
+    """
+    db = schema_editor.connection.alias
+    ClientInventory = apps.get_model('pos_management', 'ClientInventory')
+    Distribution = apps.get_model('pos_management', 'Distribution')
+    StockMovement = apps.get_model('pos_management', 'StockMovement')
+    now = django.utils.timezone.now()
+
+    inventories = {
+        (inventory.client_id, inventory.product_id): inventory
+        for inventory in ClientInventory.objects.using(db).iterator()
+    }
+    distributed = {}
+
+    movements = []
+    # Every distribution but cancelled ones is taken to have put its quantity at the client
+    for distribution in Distribution.objects.using(db).exclude(status='cancelled').iterator():
+        inventory = inventories.get((distribution.client_id, distribution.product_id))
+        if inventory is None or not distribution.quantity:
+            continue
+        movements.append(StockMovement(
+            inventory_id=inventory.id,
+            movement_type='distribution',
+            quantity=distribution.quantity,
+            distribution_id=distribution.id,
+            created_by_id=distribution.created_by_id,
+            occurred_at=distribution.distributed_at or inventory.created_at or now
+        ))
+        distributed[inventory.id] = distributed.get(inventory.id, 0) + distribution.quantity
+        if len(movements) >= 500:
+            StockMovement.objects.using(db).bulk_create(movements)
+            movements = []
+
+    for inventory in inventories.values():
+        balance = inventory.current_quantity - distributed.get(inventory.id, 0)
+        if balance:
+            movements.append(StockMovement(
+                inventory_id=inventory.id,
+                movement_type='opening',
+                quantity=balance,
+                created_by_id=inventory.last_updated_by_id,
+                notes='رصيد التعديلات السابقة لسجل الحركات',
+                occurred_at=now
+            ))
+    StockMovement.objects.using(db).bulk_create(movements, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pos_management', '0002_alter_categoryunit_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('movement_type', models.CharField(choices=[('opening', 'رصيد افتتاحي'), ('distribution', 'توزيعة'), ('add', 'إضافة'), ('reduce', 'تقليل'), ('set', 'تعيين')], max_length=20, verbose_name='نوع الحركة')),
+                ('quantity', models.DecimalField(decimal_places=2, help_text='موجب للإضافة وسالب للخصم', max_digits=12, verbose_name='التغير في الكمية')),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='ملاحظات')),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الحركة')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL, verbose_name='بواسطة')),
+                ('distribution', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='pos_management.distribution', verbose_name='التوزيعة')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='pos_management.clientinventory', verbose_name='المخزون')),
+            ],
+            options={
+                'verbose_name': 'حركة مخزون',
+                'verbose_name_plural': 'حركات المخزون',
+                'ordering': ['-occurred_at'],
+                'indexes': [models.Index(fields=['inventory', 'occurred_at'], name='pos_managem_invento_096ba3_idx')],
+            },
+        ),
+        migrations.RunPython(open_journal, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.13 on 2026-10-16 19:05
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_visit_stats(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Client = apps.get_model('pos_management', 'Client')
+    Distribution = apps.get_model('pos_management', 'Distribution')
+
+    distributions = Distribution.objects.using(db).filter(client=OuterRef('pk')).order_by().values('client')
+    Client.objects.using(db).update(
+        cached_total_distributions=Coalesce(
+            Subquery(distributions.annotate(total=Count('id')).values('total')), 0,
+            output_field=IntegerField()
+        ),
+        cached_next_visit_date=Subquery(distributions.annotate(latest=Max('next_visit_date')).values('latest')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos_management', '0003_stockmovement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='cached_total_distributions',
+            field=models.PositiveIntegerField(default=0, verbose_name='عدد التوزيعات'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='cached_next_visit_date',
+            field=models.DateField(blank=True, db_index=True, null=True, verbose_name='موعد الزيارة القادمة'),
+        ),
+        migrations.RunPython(fill_visit_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.13 on 2026-10-16 19:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pos_management', '0004_client_cached_visit_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True, verbose_name='خط العرض'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True, verbose_name='خط الطول'),
+        ),
+        migrations.CreateModel(
+            name='VisitRoute',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('stops', models.JSONField(default=list, verbose_name='المحطات')),
+                ('unlocated', models.JSONField(default=list, verbose_name='عملاء بدون موقع')),
+                ('total_distance_km', models.FloatField(default=0, verbose_name='إجمالي المسافة (كم)')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ الحساب')),
+                ('rep', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='visit_routes', to=settings.AUTH_USER_MODEL, verbose_name='المندوب')),
+            ],
+            options={
+                'verbose_name': 'خط سير زيارات',
+                'verbose_name_plural': 'خطوط سير الزيارات',
+                'ordering': ['date'],
+                'unique_together': {('rep', 'date')},
+            },
+        ),
+    ]
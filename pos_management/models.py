@@ -61,6 +61,49 @@ class ClientType(models.Model):
         return self.clients.count()
 
 
+class ClientQuerySet(models.QuerySet):
+    def _distribution_stats(self):
+        """Per-client distribution count and latest next visit date, as correlated subqueries"""
+        from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+
+        distributions = Distribution.objects.filter(client=OuterRef('pk')).order_by().values('client')
+        return {
+            'distribution_count': Coalesce(
+                Subquery(distributions.annotate(total=Count('id')).values('total')), 0,
+                output_field=IntegerField()
+            ),
+            'next_visit': Subquery(distributions.annotate(latest=Max('next_visit_date')).values('latest')),
+        }
+
+    def with_visit_stats(self, denormalized=None):
+        """
+        Annotate distribution_count and next_visit (sortable); the
+        total_distributions / next_visit_date properties return them.
+
+        denormalized: read the cached_* columns kept by the distribution
+        signals instead of subqueries (default: POS_DENORMALIZED_CLIENT_STATS)
+        """
+        from django.db.models import F
+
+        if denormalized is None:
+            denormalized = getattr(settings, 'POS_DENORMALIZED_CLIENT_STATS', False)
+        if denormalized:
+            return self.annotate(
+                distribution_count=F('cached_total_distributions'),
+                next_visit=F('cached_next_visit_date'),
+            )
+        return self.annotate(**self._distribution_stats())
+
+    def refresh_visit_stats(self):
+        """Recompute the cached_* columns of these clients (one UPDATE)"""
+        stats = self._distribution_stats()
+        return self.order_by().update(
+            cached_total_distributions=stats['distribution_count'],
+            cached_next_visit_date=stats['next_visit'],
+        )
+
+
 class Client(models.Model):
     """
     Clients (Branches, Websites, Distributors, etc.)
@@ -136,6 +179,16 @@ class Client(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="تاريخ التحديث")
     
+    # Location for visit route planning (custom_data latitude / longitude are used when empty)
+    latitude = models.DecimalField(max_digits=10, decimal_places=8, blank=True, null=True, verbose_name="خط العرض")
+    longitude = models.DecimalField(max_digits=11, decimal_places=8, blank=True, null=True, verbose_name="خط الطول")
+    
+    # Denormalized distribution stats, kept by the distribution signals
+    cached_total_distributions = models.PositiveIntegerField(default=0, verbose_name="عدد التوزيعات")
+    cached_next_visit_date = models.DateField(blank=True, null=True, db_index=True, verbose_name="موعد الزيارة القادمة")
+    
+    objects = ClientQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "عميل"
         verbose_name_plural = "العملاء"
@@ -152,19 +205,36 @@ class Client(models.Model):
     @property
     def total_distributions(self):
         """Get total number of distributions for this client"""
+        if hasattr(self, 'distribution_count'):
+            # Annotated by Client.objects.with_visit_stats()
+            return self.distribution_count
         return self.distributions.count()
     
     @property
     def next_visit_date(self):
         """Get next scheduled visit date"""
-        latest_distribution = self.distributions.order_by('-next_visit_date').first()
-        return latest_distribution.next_visit_date if latest_distribution else None
+        if hasattr(self, 'next_visit'):
+            return self.next_visit
+        return self.distributions.aggregate(latest=models.Max('next_visit_date'))['latest']
+    
+    @property
+    def coordinates(self):
+        """(latitude, longitude) as floats, or None when the client has no location"""
+        latitude, longitude = self.latitude, self.longitude
+        if latitude is None or longitude is None:
+            latitude = (self.custom_data or {}).get('latitude')
+            longitude = (self.custom_data or {}).get('longitude')
+        try:
+            return float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            return None
     
     @property
     def upcoming_visit_days(self):
         """Get number of days until next visit"""
-        if self.next_visit_date:
-            delta = self.next_visit_date - timezone.now().date()
+        next_visit_date = self.next_visit_date
+        if next_visit_date:
+            delta = next_visit_date - timezone.now().date()
             return delta.days
         return None
 
@@ -315,6 +385,11 @@ class Distribution(models.Model):
         return f"{self.client.name} - {self.product.name} ({self.quantity})"
     
     def save(self, *args, **kwargs):
+        self.calculate_fields()
+        super().save(*args, **kwargs)
+    
+    def calculate_fields(self):
+        """Total amount and visit dates (also used before bulk_create, which skips save())"""
         # Auto-calculate total amount
         self.total_amount = self.quantity * self.price
         
@@ -330,8 +405,6 @@ class Distribution(models.Model):
         if not self.last_visit_date and not self.next_visit_date:
             self.last_visit_date = timezone.now().date()
             self.next_visit_date = self.last_visit_date + timedelta(days=self.visit_interval_days)
-        
-        super().save(*args, **kwargs)
     
     @property
     def days_until_visit(self):
@@ -356,6 +429,83 @@ class Distribution(models.Model):
         return False
 
 
+EXPIRING_SOON_DAYS = 7
+
+
+class ClientInventoryQuerySet(models.QuerySet):
+    """
+    SQL forms of the ClientInventory status properties, so status filters,
+    counters and ordering run in the database
+    """
+
+    def low_stock(self):
+        return self.filter(current_quantity__lte=models.F('minimum_quantity'))
+
+    def out_of_stock(self):
+        return self.filter(current_quantity__lte=0)
+
+    def expiring_soon(self, today=None):
+        today = today or timezone.now().date()
+        return self.filter(expiry_date__range=(today, today + timedelta(days=EXPIRING_SOON_DAYS)))
+
+    def expired(self, today=None):
+        today = today or timezone.now().date()
+        return self.filter(expiry_date__lt=today)
+
+    def with_status(self, today=None):
+        """
+        Annotate stock_status, low_stock, out_of_stock and expiry_delta;
+        the matching properties return them when present
+        """
+        from django.db.models import BooleanField, Case, CharField, DurationField, ExpressionWrapper, F, Q, Value, When
+
+        today = today or timezone.now().date()
+        return self.annotate(
+            stock_status=Case(
+                When(current_quantity__lte=0, then=Value('low')),
+                When(current_quantity__lte=F('minimum_quantity'), then=Value('warning')),
+                When(current_quantity__gte=F('maximum_quantity') * Decimal('0.8'), then=Value('excellent')),
+                default=Value('good'),
+                output_field=CharField(),
+            ),
+            low_stock=ExpressionWrapper(Q(current_quantity__lte=F('minimum_quantity')), output_field=BooleanField()),
+            out_of_stock=ExpressionWrapper(Q(current_quantity__lte=0), output_field=BooleanField()),
+            expiry_delta=ExpressionWrapper(F('expiry_date') - Value(today, output_field=models.DateField()), output_field=DurationField()),
+        )
+
+    def health(self, today=None):
+        """Aggregate stock and expiry counters over the queryset (one query)"""
+        from django.db.models import Count, F, Q, Sum
+
+        today = today or timezone.now().date()
+        soon = today + timedelta(days=EXPIRING_SOON_DAYS)
+        low_stock = Q(current_quantity__lte=F('minimum_quantity'))
+        out_of_stock = Q(current_quantity__lte=0)
+        excellent = Q(current_quantity__gte=F('maximum_quantity') * Decimal('0.8'))
+
+        totals = self.aggregate(
+            total_items=Count('id'),
+            total_quantity=Sum('current_quantity'),
+            clients=Count('client', distinct=True),
+            products=Count('product', distinct=True),
+            low_stock_count=Count('id', filter=low_stock),
+            out_of_stock_count=Count('id', filter=out_of_stock),
+            expiring_soon_count=Count('id', filter=Q(expiry_date__range=(today, soon))),
+            expired_count=Count('id', filter=Q(expiry_date__lt=today)),
+            clients_with_low_stock=Count('client', distinct=True, filter=low_stock),
+            status_warning=Count('id', filter=low_stock & ~out_of_stock),
+            status_excellent=Count('id', filter=~low_stock & ~out_of_stock & excellent),
+        )
+        totals['total_quantity'] = totals['total_quantity'] or Decimal('0')
+        totals['by_status'] = {
+            'low': totals['out_of_stock_count'],
+            'warning': totals.pop('status_warning'),
+            'excellent': totals.pop('status_excellent'),
+        }
+        totals['by_status']['good'] = totals['total_items'] - sum(totals['by_status'].values())
+        return totals
+
+
 class ClientInventory(models.Model):
     """
     Track product inventory at each client location
@@ -447,6 +597,8 @@ class ClientInventory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
     
+    objects = ClientInventoryQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "مخزون عميل"
         verbose_name_plural = "مخزون العملاء"
@@ -464,6 +616,9 @@ class ClientInventory(models.Model):
     @property
     def inventory_status(self):
         """Calculate inventory status based on current quantity"""
+        if hasattr(self, 'stock_status'):
+            # Annotated by ClientInventory.objects.with_status()
+            return self.stock_status
         if self.current_quantity <= 0:
             return 'low'
         elif self.current_quantity <= self.minimum_quantity:
@@ -490,16 +645,22 @@ class ClientInventory(models.Model):
     @property
     def is_low_stock(self):
         """Check if stock is low"""
+        if hasattr(self, 'low_stock'):
+            return self.low_stock
         return self.current_quantity <= self.minimum_quantity
     
     @property
     def is_out_of_stock(self):
         """Check if out of stock"""
+        if hasattr(self, 'out_of_stock'):
+            return self.out_of_stock
         return self.current_quantity <= 0
     
     @property
     def days_until_expiry(self):
         """Calculate days until expiry"""
+        if hasattr(self, 'expiry_delta'):
+            return self.expiry_delta.days if self.expiry_delta is not None else None
         if self.expiry_date:
             delta = self.expiry_date - timezone.now().date()
             return delta.days
@@ -516,27 +677,115 @@ class ClientInventory(models.Model):
     def is_expiring_soon(self):
         """Check if product is expiring soon (within 7 days)"""
         if self.days_until_expiry is not None:
-            return 0 <= self.days_until_expiry <= 7
+            return 0 <= self.days_until_expiry <= EXPIRING_SOON_DAYS
         return False
     
-    def add_stock(self, quantity, distribution=None, user=None):
-        """Add quantity to inventory"""
-        self.current_quantity += quantity
-        self.last_distribution = distribution
-        self.last_updated_by = user
-        self.save()
+    def add_stock(self, quantity, distribution=None, user=None, notes=None):
+        """Add quantity to inventory (journaled, see stock_ledger)"""
+        from .stock_ledger import add_stock
+        return add_stock(self, quantity, distribution=distribution, user=user, notes=notes)
     
-    def reduce_stock(self, quantity, user=None):
-        """Reduce quantity from inventory"""
-        self.current_quantity = max(0, self.current_quantity - quantity)
-        self.last_updated_by = user
-        self.save()
+    def reduce_stock(self, quantity, user=None, notes=None):
+        """Reduce quantity from inventory, never below zero"""
+        from .stock_ledger import reduce_stock
+        return reduce_stock(self, quantity, user=user, notes=notes)
     
-    def set_stock(self, quantity, user=None):
+    def set_stock(self, quantity, user=None, notes=None):
         """Set inventory to specific quantity"""
-        self.current_quantity = quantity
-        self.last_updated_by = user
-        self.save()
+        from .stock_ledger import set_stock
+        return set_stock(self, quantity, user=user, notes=notes)
+
+
+class VisitRoute(models.Model):
+    """
+    Planned visit route of a rep (Client.assigned_to) for one day
+    Dropped by signals when distributions or clients change and rebuilt on next read
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    rep = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='visit_routes',
+        verbose_name="المندوب"
+    )
+    date = models.DateField(verbose_name="التاريخ")
+    stops = models.JSONField(default=list, verbose_name="المحطات")
+    unlocated = models.JSONField(default=list, verbose_name="عملاء بدون موقع")
+    total_distance_km = models.FloatField(default=0, verbose_name="إجمالي المسافة (كم)")
+    computed_at = models.DateTimeField(auto_now=True, verbose_name="تاريخ الحساب")
+    
+    class Meta:
+        verbose_name = "خط سير زيارات"
+        verbose_name_plural = "خطوط سير الزيارات"
+        unique_together = ['rep', 'date']
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.rep or '-'} - {self.date} ({len(self.stops)})"
+
+
+class StockMovement(models.Model):
+    """
+    Append-only journal of client inventory quantity changes.
+    The quantities of an inventory's movements add up to its current_quantity.
+    """
+    MOVEMENT_TYPE_CHOICES = [
+        ('opening', 'رصيد افتتاحي'),
+        ('distribution', 'توزيعة'),
+        ('add', 'إضافة'),
+        ('reduce', 'تقليل'),
+        ('set', 'تعيين'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    inventory = models.ForeignKey(
+        ClientInventory,
+        on_delete=models.CASCADE,
+        related_name='movements',
+        verbose_name="المخزون"
+    )
+    movement_type = models.CharField(
+        max_length=20,
+        choices=MOVEMENT_TYPE_CHOICES,
+        verbose_name="نوع الحركة"
+    )
+    quantity = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        verbose_name="التغير في الكمية",
+        help_text="موجب للإضافة وسالب للخصم"
+    )
+    distribution = models.ForeignKey(
+        Distribution,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements',
+        verbose_name="التوزيعة"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements',
+        verbose_name="بواسطة"
+    )
+    notes = models.TextField(blank=True, null=True, verbose_name="ملاحظات")
+    occurred_at = models.DateTimeField(default=timezone.now, verbose_name="تاريخ الحركة")
+    
+    class Meta:
+        verbose_name = "حركة مخزون"
+        verbose_name_plural = "حركات المخزون"
+        ordering = ['-occurred_at']
+        indexes = [
+            models.Index(fields=['inventory', 'occurred_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity} ({self.occurred_at:%Y-%m-%d})"
 """
 Advanced Dynamic Product Management System
 Models for Categories, Units, and Products with Custom Fields
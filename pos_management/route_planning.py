@@ -0,0 +1,263 @@
+"""
+Visit Route Planning
+Ordered daily visit routes per rep (Client.assigned_to)
+
+A client is due on a day when one of its open distributions (new /
+waiting_visit) has next_visit_date on that day, or a later recurrence of it
+(next_visit_date + k * visit_interval_days). Overdue visits are put on
+today's route. Each client is one stop.
+
+Stops are ordered by a nearest-neighbour tour over a precomputed distance
+matrix (haversine, km), improved with 2-opt. The route starts at the rep's
+branch when the rep is an employee with a located branch, otherwise at the
+most overdue stop. Routes are open: the rep does not return to the start.
+
+Routes are stored as VisitRoute rows (one per rep and day), built on first
+read and dropped by the distribution / client signals (invalidate_routes).
+Stored routes of today or later are only reused on the day they were
+computed, since overdue visits land on whichever day is today.
+"""
+from collections import defaultdict
+from math import radians, sin, cos, sqrt, atan2
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Client, Distribution, VisitRoute
+
+OPEN_DISTRIBUTION_STATUSES = ['new', 'waiting_visit']
+
+# Upper bound on 2-opt improvement passes per route
+MAX_TWO_OPT_PASSES = 50
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(a, b):
+    """Great-circle distance between two (latitude, longitude) points"""
+    lat1, lon1 = radians(a[0]), radians(a[1])
+    lat2, lon2 = radians(b[0]), radians(b[1])
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * atan2(sqrt(h), sqrt(1 - h))
+
+
+def distance_matrix(points):
+    """Symmetric matrix of haversine distances (km) between points"""
+    size = len(points)
+    matrix = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        for j in range(i + 1, size):
+            matrix[i][j] = matrix[j][i] = haversine_km(points[i], points[j])
+    return matrix
+
+
+def nearest_neighbour(matrix, start=0):
+    """Greedy tour: from start, always go to the closest unvisited point"""
+    order = [start]
+    remaining = set(range(len(matrix))) - {start}
+    while remaining:
+        last = order[-1]
+        nearest = min(remaining, key=lambda j: matrix[last][j])
+        order.append(nearest)
+        remaining.remove(nearest)
+    return order
+
+
+def two_opt(order, matrix, max_passes=MAX_TWO_OPT_PASSES):
+    """Improve an open path by reversing segments while that shortens it; order[0] stays first"""
+    order = list(order)
+    size = len(order)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, size - 1):
+            for j in range(i + 1, size):
+                a, b, c = order[i - 1], order[i], order[j]
+                delta = matrix[a][c] - matrix[a][b]
+                if j + 1 < size:
+                    d = order[j + 1]
+                    delta += matrix[b][d] - matrix[c][d]
+                if delta < -1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def is_due(distribution, day, today):
+    """Whether a distribution's visit falls on `day`"""
+    next_visit = distribution.next_visit_date
+    if next_visit is None:
+        return False
+    if next_visit < today:
+        # Overdue: visit today
+        return day == today
+    if next_visit == day:
+        return True
+    interval = distribution.visit_interval_days
+    return bool(interval) and next_visit < day and (day - next_visit).days % interval == 0
+
+
+def due_visits(day, rep_ids=None, using=None):
+    """
+    {rep_id: {client: [distribution, ...]}} of the clients to visit on `day`,
+    from one query
+    """
+    today = timezone.localdate()
+    distributions = Distribution.objects.using(using).filter(
+        status__in=OPEN_DISTRIBUTION_STATUSES,
+        next_visit_date__lte=day
+    ).select_related('client').order_by('next_visit_date')
+    if rep_ids is not None:
+        distributions = distributions.filter(client__assigned_to_id__in=rep_ids)
+
+    visits = defaultdict(lambda: defaultdict(list))
+    for distribution in distributions:
+        if is_due(distribution, day, today):
+            client = distribution.client
+            visits[client.assigned_to_id][client].append(distribution)
+    return visits
+
+
+def rep_start_point(rep_id, using=None):
+    """Location of the rep's branch (legacy branch first, then an active branch assignment)"""
+    from hr_management.models import Employee, EmployeeBranch
+
+    if rep_id is None:
+        return None
+    employee = Employee.objects.using(using).filter(user_id=rep_id).select_related('branch').first()
+    if employee is None:
+        return None
+    branch = employee.branch
+    if branch is None:
+        assignment = EmployeeBranch.objects.using(using).filter(
+            employee=employee, is_active=True
+        ).select_related('branch').first()
+        branch = assignment.branch if assignment else None
+    if branch is None or branch.latitude is None or branch.longitude is None:
+        return None
+    return float(branch.latitude), float(branch.longitude)
+
+
+def build_route(clients, start_point=None):
+    """
+    Route payload for {client: [distribution, ...]}:
+    (stops, unlocated, total_distance_km)
+    """
+    located, unlocated = [], []
+    for client, distributions in clients.items():
+        stop = {
+            'client_id': str(client.id),
+            'client_name': client.name,
+            'distribution_ids': [str(d.id) for d in distributions],
+            'next_visit_date': min(d.next_visit_date for d in distributions).isoformat(),
+        }
+        coordinates = client.coordinates
+        if coordinates is None:
+            unlocated.append(stop)
+        else:
+            stop['latitude'], stop['longitude'] = coordinates
+            located.append(stop)
+
+    # Most overdue first: the start when there is no branch location
+    located.sort(key=lambda stop: stop['next_visit_date'])
+    unlocated.sort(key=lambda stop: stop['next_visit_date'])
+    if not located:
+        return [], unlocated, 0.0
+
+    points = [(stop['latitude'], stop['longitude']) for stop in located]
+    offset = 0
+    if start_point is not None:
+        points.insert(0, start_point)
+        offset = 1
+    matrix = distance_matrix(points)
+    order = two_opt(nearest_neighbour(matrix, 0), matrix)
+
+    stops, total, previous = [], 0.0, order[0] if offset else None
+    for index in order:
+        if index < offset:
+            continue
+        leg = matrix[previous][index] if previous is not None else 0.0
+        total += leg
+        stop = dict(located[index - offset], leg_km=round(leg, 3), cumulative_km=round(total, 3))
+        stop['sequence'] = len(stops) + 1
+        stops.append(stop)
+        previous = index
+    return stops, unlocated, round(total, 3)
+
+
+def _route_payload(route):
+    return {
+        'rep': str(route.rep_id) if route.rep_id else None,
+        'date': route.date.isoformat(),
+        'stops': route.stops,
+        'unlocated': route.unlocated,
+        'total_distance_km': route.total_distance_km,
+        'computed_at': route.computed_at.isoformat() if route.computed_at else None,
+    }
+
+
+def get_routes(day, rep_ids=None, refresh=False, using=None):
+    """
+    Routes of `day` for the given rep ids (default: every rep with due
+    visits, rep None being unassigned clients). Stored routes are reused
+    unless refresh; missing ones are built and stored.
+    """
+    db = using or VisitRoute.objects.db
+    today = timezone.localdate()
+    routes, stale = {}, []
+    if not refresh:
+        stored = VisitRoute.objects.using(db).filter(date=day)
+        if rep_ids is not None:
+            stored = stored.filter(rep_id__in=rep_ids)
+        # Overdue visits move onto today's route as the days pass: a route of
+        # today or later computed on an earlier day is rebuilt
+        for route in stored:
+            if day < today or timezone.localdate(route.computed_at) >= today:
+                routes[route.rep_id] = route
+            else:
+                stale.append(route.rep_id)
+
+    if rep_ids is None:
+        visits = due_visits(day, using=db)
+        # Stale routes are replaced even when nothing is due any more
+        for rep_id in stale:
+            visits.setdefault(rep_id, {})
+    else:
+        missing = [rep_id for rep_id in rep_ids if rep_id not in routes]
+        visits = due_visits(day, missing, using=db) if missing else {}
+        # Reps without due visits still get an (empty) route
+        for rep_id in missing:
+            visits.setdefault(rep_id, {})
+
+    new_routes = [
+        VisitRoute(rep_id=rep_id, date=day, stops=stops, unlocated=unlocated, total_distance_km=total)
+        for rep_id, clients in visits.items() if rep_id not in routes
+        for stops, unlocated, total in [build_route(clients, rep_start_point(rep_id, using=db))]
+    ]
+    if new_routes:
+        rep_filter = Q(rep_id__in=[route.rep_id for route in new_routes if route.rep_id is not None])
+        if any(route.rep_id is None for route in new_routes):
+            rep_filter |= Q(rep__isnull=True)
+        with transaction.atomic(using=db):
+            VisitRoute.objects.using(db).filter(rep_filter, date=day).delete()
+            VisitRoute.objects.using(db).bulk_create(new_routes)
+        routes.update({route.rep_id: route for route in new_routes})
+
+    return [_route_payload(route) for route in sorted(routes.values(), key=lambda r: str(r.rep_id or ''))]
+
+
+def invalidate_routes(client_ids=None, using=None):
+    """
+    Drop stored routes from today on that may include these clients
+    (all routes when client_ids is None)
+    """
+    routes = VisitRoute.objects.using(using).filter(date__gte=timezone.localdate())
+    if client_ids is not None:
+        rep_ids = set(Client.objects.using(using).filter(pk__in=client_ids).values_list('assigned_to_id', flat=True))
+        if not rep_ids:
+            return
+        rep_filter = Q(rep_id__in=rep_ids - {None})
+        if None in rep_ids:
+            rep_filter |= Q(rep__isnull=True)
+        routes = routes.filter(rep_filter)
+    routes.delete()
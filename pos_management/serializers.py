@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import ClientType, Client, SimpleProduct, Distribution, ClientInventory
+from .models import ClientType, Client, SimpleProduct, Distribution, ClientInventory, StockMovement
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -61,7 +61,7 @@ class ClientSerializer(serializers.ModelSerializer):
         model = Client
         fields = [
             'id', 'name', 'client_type', 'client_type_name', 'client_type_color',
-            'contact_person', 'email', 'phone', 'phone2',
+            'contact_person', 'email', 'phone', 'phone2', 'latitude', 'longitude',
             'category', 'category_display', 'status', 'status_display',
             'custom_data', 'notes', 'description',
             'created_by', 'created_by_name', 'assigned_to', 'assigned_to_name',
@@ -222,6 +222,36 @@ class DistributionCreateSerializer(serializers.ModelSerializer):
         return distribution
 
 
+class DistributionBulkItemSerializer(serializers.Serializer):
+    """
+    One distribution of a bulk upload. client / product are plain ids,
+    resolved for the whole batch at once by the view.
+    id is optional: a client-generated UUID makes re-sending a batch safe.
+    """
+    id = serializers.UUIDField(required=False)
+    client = serializers.UUIDField()
+    product = serializers.UUIDField()
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+    visit_interval_days = serializers.IntegerField(required=False, default=14, min_value=1)
+    reminder_days_before = serializers.IntegerField(required=False, default=1, min_value=0)
+    last_visit_date = serializers.DateField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Distribution.DISTRIBUTION_STATUS_CHOICES, required=False, default='new')
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    distributed_at = serializers.DateTimeField(required=False)
+
+
+class DistributionBulkCreateSerializer(serializers.Serializer):
+    """Bulk upload body: {"distributions": [...]}"""
+    MAX_ITEMS = 1000
+    
+    distributions = serializers.ListField(
+        child=DistributionBulkItemSerializer(),
+        allow_empty=False,
+        max_length=MAX_ITEMS
+    )
+
+
 # Statistics Serializers
 class POSDashboardStatsSerializer(serializers.Serializer):
     """Serializer for POS dashboard statistics"""
@@ -332,6 +362,20 @@ class ClientInventoryUpdateSerializer(serializers.Serializer):
         return value
 
 
+class StockMovementSerializer(serializers.ModelSerializer):
+    """Serializer for StockMovement journal rows (read only)"""
+    movement_type_display = serializers.CharField(source='get_movement_type_display', read_only=True)
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+    
+    class Meta:
+        model = StockMovement
+        fields = [
+            'id', 'inventory', 'movement_type', 'movement_type_display', 'quantity',
+            'distribution', 'created_by', 'created_by_name', 'notes', 'occurred_at'
+        ]
+        read_only_fields = fields
+
+
 class ClientInventoryListSerializer(serializers.ModelSerializer):
     """Simplified serializer for listing inventory"""
     product_name = serializers.CharField(source='product.name', read_only=True)
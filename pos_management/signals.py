@@ -2,33 +2,64 @@
 Signals for POS Management
 Auto-update inventory when distributions are created
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Distribution, ClientInventory
+from .models import Client, Distribution
+from .stock_ledger import apply_distributions
+from .route_planning import invalidate_routes
 
 
 @receiver(post_save, sender=Distribution)
-def update_client_inventory_on_distribution(sender, instance, created, **kwargs):
+def update_client_inventory_on_distribution(sender, instance, created, raw=False, using=None, **kwargs):
     """
     Automatically update client inventory when a distribution is created
+    (journaled stock movement with an atomic quantity update, see stock_ledger).
+    bulk_create skips this signal: call apply_distributions() for those.
     """
-    if created and instance.status in ['new', 'waiting_visit']:
-        # Get or create inventory record for this client-product combination
-        inventory, inv_created = ClientInventory.objects.get_or_create(
-            client=instance.client,
-            product=instance.product,
-            defaults={
-                'current_quantity': 0,
-                'minimum_quantity': 0,
-                'maximum_quantity': 100,
-                'last_updated_by': instance.created_by,
-                'last_distribution': instance
-            }
-        )
-        
-        # Add the distributed quantity to inventory
-        inventory.add_stock(
-            quantity=instance.quantity,
-            distribution=instance,
-            user=instance.created_by
-        )
+    if created and not raw:
+        apply_distributions([instance], using=using)
+
+
+@receiver(pre_save, sender=Distribution)
+def remember_distribution_client(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    """Keep the previous client of an edited distribution, its stats change too"""
+    if raw or instance._state.adding or (update_fields and 'client' not in update_fields):
+        return
+    instance._previous_client_id = Distribution.objects.using(using).filter(
+        pk=instance.pk
+    ).values_list('client_id', flat=True).first()
+
+
+@receiver(post_save, sender=Distribution)
+@receiver(post_delete, sender=Distribution)
+def update_client_visit_stats(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    """Refresh the denormalized distribution stats on Client"""
+    if raw:
+        return
+    # Status-only saves (complete / cancel) don't change the stats
+    if update_fields and not {'client', 'next_visit_date'} & set(update_fields):
+        return
+    client_ids = {instance.client_id, getattr(instance, '_previous_client_id', None)} - {None}
+    Client.objects.using(using).filter(pk__in=client_ids).refresh_visit_stats()
+
+
+@receiver(post_save, sender=Distribution)
+@receiver(post_delete, sender=Distribution)
+def invalidate_visit_routes_on_distribution(sender, instance, raw=False, using=None, **kwargs):
+    """Drop stored visit routes of the reps of the affected clients"""
+    if raw:
+        return
+    client_ids = {instance.client_id, getattr(instance, '_previous_client_id', None)} - {None}
+    invalidate_routes(client_ids, using=using)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_visit_routes_on_client(sender, instance, raw=False, using=None, update_fields=None, created=False, **kwargs):
+    """A client moved to another rep or location: its old rep's route is unknown, drop all"""
+    # New clients have no distributions yet, so they are on no route
+    if raw or created:
+        return
+    if update_fields and not {'assigned_to', 'latitude', 'longitude', 'custom_data', 'name'} & set(update_fields):
+        return
+    invalidate_routes(using=using)
@@ -0,0 +1,219 @@
+"""
+Stock Ledger
+Single write path for client inventory quantities
+
+Every quantity change appends a StockMovement row and moves
+ClientInventory.current_quantity with UPDATE ... SET current_quantity =
+current_quantity + delta, so concurrent field reps never overwrite each
+other. Reductions and "set" read the locked row first (the delta depends on
+the current quantity); additions need no read at all.
+
+Multi-line distributions are applied in one pass: missing inventory rows
+are created together, movements are bulk-inserted and the quantities move
+with one UPDATE ... CASE per chunk.
+
+The quantity at any moment is current_quantity minus the movements after
+it (indexed on inventory, occurred_at), see quantity_at(). Rows that existed
+before the journal were seeded from their distributions (migration 0003);
+edits made before then are one opening movement dated at the migration.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, When, F, Sum, Value, DecimalField, UUIDField
+from django.utils import timezone
+from .models import ClientInventory, StockMovement
+
+# Inventory rows per UPDATE ... CASE statement in batch application
+BATCH_SIZE = 200
+
+# Distributions in these states put stock at the client
+STOCKED_DISTRIBUTION_STATUSES = ['new', 'waiting_visit']
+
+
+def _db(inventory=None, using=None):
+    return using or (inventory._state.db if inventory is not None else None) or ClientInventory.objects.db
+
+
+def _move(inventory, delta, movement_type, user=None, notes=None, db=None, **changes):
+    """Journal one movement and apply it; changes: extra ClientInventory fields to set"""
+    if delta:
+        StockMovement.objects.using(db).create(
+            inventory=inventory,
+            movement_type=movement_type,
+            quantity=delta,
+            distribution=changes.get('last_distribution'),
+            created_by=user,
+            notes=notes
+        )
+    ClientInventory.objects.using(db).filter(pk=inventory.pk).update(
+        current_quantity=F('current_quantity') + delta,
+        last_updated_by=user,
+        updated_at=timezone.now(),
+        **changes
+    )
+
+
+def _refresh(inventory, db):
+    inventory.refresh_from_db(
+        using=db, fields=['current_quantity', 'last_updated_by', 'last_distribution', 'updated_at']
+    )
+    return inventory
+
+
+def _locked_quantity(inventory, db):
+    return ClientInventory.objects.using(db).select_for_update().values_list(
+        'current_quantity', flat=True
+    ).get(pk=inventory.pk)
+
+
+def add_stock(inventory, quantity, distribution=None, user=None, notes=None, using=None):
+    """Add quantity; records distribution as the inventory's last distribution"""
+    db = _db(inventory, using)
+    with transaction.atomic(using=db):
+        _move(inventory, Decimal(quantity), 'distribution' if distribution else 'add',
+              user=user, notes=notes, db=db, last_distribution=distribution)
+    return _refresh(inventory, db)
+
+
+def reduce_stock(inventory, quantity, user=None, notes=None, using=None):
+    """Reduce quantity, never below zero"""
+    db = _db(inventory, using)
+    with transaction.atomic(using=db):
+        current = _locked_quantity(inventory, db)
+        _move(inventory, -min(Decimal(quantity), max(current, Decimal('0'))), 'reduce',
+              user=user, notes=notes, db=db)
+    return _refresh(inventory, db)
+
+
+def set_stock(inventory, quantity, user=None, notes=None, using=None):
+    """Set quantity; journaled as the difference to the current quantity"""
+    db = _db(inventory, using)
+    with transaction.atomic(using=db):
+        current = _locked_quantity(inventory, db)
+        _move(inventory, Decimal(quantity) - current, 'set', user=user, notes=notes, db=db)
+    return _refresh(inventory, db)
+
+
+def record_opening(inventory, user=None, using=None):
+    """Journal the quantity an inventory row was created with (no quantity change)"""
+    if inventory.current_quantity:
+        StockMovement.objects.using(_db(inventory, using)).create(
+            inventory=inventory,
+            movement_type='opening',
+            quantity=inventory.current_quantity,
+            created_by=user
+        )
+
+
+def _inventories_for(lines, db):
+    """{(client_id, product_id): ClientInventory}, creating missing rows together"""
+    keys = {(line.client_id, line.product_id) for line in lines}
+    existing = ClientInventory.objects.using(db).filter(
+        client_id__in={client_id for client_id, _ in keys},
+        product_id__in={product_id for _, product_id in keys}
+    )
+    inventories = {
+        (inventory.client_id, inventory.product_id): inventory
+        for inventory in existing if (inventory.client_id, inventory.product_id) in keys
+    }
+
+    missing = keys - set(inventories)
+    if missing:
+        ClientInventory.objects.using(db).bulk_create([
+            ClientInventory(
+                client_id=client_id,
+                product_id=product_id,
+                current_quantity=0,
+                minimum_quantity=0,
+                maximum_quantity=100
+            )
+            for client_id, product_id in missing
+        ], ignore_conflicts=True)
+        # Re-read: rows created concurrently were skipped by ignore_conflicts and keep their own ids
+        for inventory in ClientInventory.objects.using(db).filter(
+            client_id__in={client_id for client_id, _ in missing},
+            product_id__in={product_id for _, product_id in missing}
+        ):
+            key = (inventory.client_id, inventory.product_id)
+            if key in missing:
+                inventories[key] = inventory
+    return inventories
+
+
+def apply_distributions(distributions, using=None):
+    """
+    Put the quantities of saved distributions into client inventory:
+    one movement per distribution line, net quantity deltas per inventory row.
+    Distributions not in a stocked status are ignored. Returns the movements.
+    """
+    lines = [d for d in distributions if d.status in STOCKED_DISTRIBUTION_STATUSES]
+    if not lines:
+        return []
+    db = using or lines[0]._state.db or ClientInventory.objects.db
+
+    with transaction.atomic(using=db):
+        inventories = _inventories_for(lines, db)
+
+        movements = []
+        deltas = OrderedDict()
+        latest = {}
+        for line in lines:
+            inventory = inventories[(line.client_id, line.product_id)]
+            movements.append(StockMovement(
+                inventory=inventory,
+                movement_type='distribution',
+                quantity=line.quantity,
+                distribution=line,
+                created_by_id=line.created_by_id,
+                occurred_at=line.distributed_at or timezone.now()
+            ))
+            deltas[inventory.pk] = deltas.get(inventory.pk, Decimal('0')) + Decimal(line.quantity)
+            latest[inventory.pk] = line
+
+        StockMovement.objects.using(db).bulk_create(movements, batch_size=500)
+
+        user_field = ClientInventory._meta.get_field('last_updated_by').target_field
+        now = timezone.now()
+        ids = list(deltas)
+        for i in range(0, len(ids), BATCH_SIZE):
+            chunk = ids[i:i + BATCH_SIZE]
+            ClientInventory.objects.using(db).filter(pk__in=chunk).update(
+                current_quantity=F('current_quantity') + Case(
+                    *[When(pk=pk, then=Value(deltas[pk])) for pk in chunk],
+                    default=Value(Decimal('0')),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                ),
+                last_distribution=Case(
+                    *[When(pk=pk, then=Value(latest[pk].pk)) for pk in chunk],
+                    output_field=UUIDField(),
+                ),
+                last_updated_by=Case(
+                    *[When(pk=pk, then=Value(latest[pk].created_by_id)) for pk in chunk],
+                    output_field=user_field,
+                ),
+                updated_at=now,
+            )
+    return movements
+
+
+def quantity_at(inventory, at, using=None):
+    """Quantity of one inventory row at a moment (datetime)"""
+    db = _db(inventory, using)
+    current = ClientInventory.objects.using(db).values_list('current_quantity', flat=True).get(pk=inventory.pk)
+    later = StockMovement.objects.using(db).filter(
+        inventory_id=inventory.pk, occurred_at__gt=at
+    ).aggregate(total=Sum('quantity'))['total']
+    return current - (later or Decimal('0'))
+
+
+def quantities_at(at, queryset=None, using=None):
+    """{inventory_id: quantity} at a moment for many inventory rows (two queries)"""
+    queryset = queryset if queryset is not None else ClientInventory.objects.using(using).all()
+    current = dict(queryset.values_list('pk', 'current_quantity'))
+    later = dict(
+        StockMovement.objects.using(queryset.db).filter(
+            inventory__in=queryset.values('pk'), occurred_at__gt=at
+        ).values('inventory_id').annotate(total=Sum('quantity')).values_list('inventory_id', 'total')
+    )
+    return {pk: quantity - (later.get(pk) or Decimal('0')) for pk, quantity in current.items()}
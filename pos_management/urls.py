@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     ClientTypeViewSet, ClientViewSet, ProductViewSet as OldProductViewSet,
     DistributionViewSet, ClientInventoryViewSet,
-    POSDashboardStatsView
+    POSDashboardStatsView, VisitRouteView
 )
 from .product_views import (
     ProductCategoryViewSet,
@@ -31,6 +31,9 @@ urlpatterns = [
     # Dashboard statistics
     path('dashboard/stats/', POSDashboardStatsView.as_view(), name='pos-dashboard-stats'),
     
+    # Daily visit routes per rep
+    path('routes/', VisitRouteView.as_view(), name='pos-visit-routes'),
+    
     # Router URLs
     path('', include(router.urls)),
 ]
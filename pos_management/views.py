@@ -1,10 +1,10 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.views import APIView
 from django.db.models import Q, Sum, Count
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from datetime import timedelta
 from django_filters.rest_framework import DjangoFilterBackend
@@ -12,10 +12,12 @@ from django_filters.rest_framework import DjangoFilterBackend
 from .models import ClientType, Client, SimpleProduct, Distribution, ClientInventory
 from .serializers import (
     ClientTypeSerializer, ClientSerializer, ProductSerializer,
-    DistributionSerializer, DistributionCreateSerializer,
+    DistributionSerializer, DistributionCreateSerializer, DistributionBulkCreateSerializer,
     POSDashboardStatsSerializer, ClientInventorySerializer,
-    ClientInventoryUpdateSerializer, ClientInventoryListSerializer
+    ClientInventoryUpdateSerializer, ClientInventoryListSerializer, StockMovementSerializer
 )
+from .stock_ledger import record_opening, set_stock, quantity_at, apply_distributions
+from .route_planning import get_routes, invalidate_routes
 
 
 class ClientTypeViewSet(viewsets.ModelViewSet):
@@ -66,19 +68,20 @@ class ClientViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['client_type', 'status', 'category', 'assigned_to']
     search_fields = ['name', 'contact_person', 'email', 'phone', 'notes']
-    ordering_fields = ['name', 'created_at', 'status']
+    ordering_fields = ['name', 'created_at', 'status', 'next_visit', 'distribution_count']
     ordering = ['-created_at']
     
     def get_queryset(self):
         queryset = super().get_queryset()
         
-        # Filter by upcoming visits
-        has_upcoming_visit = self.request.query_params.get('has_upcoming_visit')
-        if has_upcoming_visit == 'true':
-            queryset = queryset.filter(
-                distributions__next_visit_date__isnull=False,
-                distributions__next_visit_date__gte=timezone.now().date()
-            ).distinct()
+        # Distribution count and next visit as annotations, not per-client queries
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.with_visit_stats()
+            
+            # Filter by upcoming visits
+            has_upcoming_visit = self.request.query_params.get('has_upcoming_visit')
+            if has_upcoming_visit == 'true':
+                queryset = queryset.filter(next_visit__gte=timezone.now().date())
         
         return queryset
     
@@ -245,6 +248,90 @@ class DistributionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Create many distributions at once (field reps syncing offline work)
+        POST /api/pos/distributions/bulk/
+        Body: {"distributions": [{"client": id, "product": id, "quantity": 5, ...}, ...]}
+        
+        All or nothing: one invalid line rejects the whole batch. Lines whose
+        id already exists are skipped, so a batch can safely be sent again.
+        """
+        serializer = DistributionBulkCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['distributions']
+        
+        clients = Client.objects.in_bulk({item['client'] for item in items})
+        products = SimpleProduct.objects.in_bulk({item['product'] for item in items})
+        
+        errors = {}
+        seen_ids = set()
+        for index, item in enumerate(items):
+            item_errors = {}
+            if item['client'] not in clients:
+                item_errors['client'] = ['العميل غير موجود']
+            if item['product'] not in products:
+                item_errors['product'] = ['المنتج غير موجود']
+            if item.get('id'):
+                if item['id'] in seen_ids:
+                    item_errors['id'] = ['Duplicate id in batch']
+                seen_ids.add(item['id'])
+            if item_errors:
+                errors[index] = item_errors
+        if errors:
+            return Response({'distributions': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        db = Distribution.objects.db
+        existing_ids = set(
+            Distribution.objects.using(db).filter(id__in=seen_ids).values_list('id', flat=True)
+        ) if seen_ids else set()
+        
+        distributions = []
+        for item in items:
+            if item.get('id') in existing_ids:
+                continue
+            product = products[item['product']]
+            distribution = Distribution(
+                client=clients[item['client']],
+                product=product,
+                quantity=item['quantity'],
+                price=item['price'] if item.get('price') is not None else product.base_price,
+                visit_interval_days=item['visit_interval_days'],
+                reminder_days_before=item['reminder_days_before'],
+                last_visit_date=item.get('last_visit_date'),
+                status=item['status'],
+                notes=item.get('notes') or None,
+                created_by=request.user,
+                distributed_at=item.get('distributed_at') or timezone.now()
+            )
+            if item.get('id'):
+                distribution.id = item['id']
+            distribution.calculate_fields()
+            # Same as DistributionCreateSerializer: next visit counts from the distribution
+            distribution.next_visit_date = distribution.distributed_at.date() + timedelta(days=distribution.visit_interval_days)
+            distributions.append(distribution)
+        
+        try:
+            with transaction.atomic(using=db):
+                Distribution.objects.using(db).bulk_create(distributions, batch_size=500)
+                # bulk_create skips the post_save inventory and client stats signals
+                apply_distributions(distributions, using=db)
+                client_ids = {d.client_id for d in distributions}
+                Client.objects.using(db).filter(pk__in=client_ids).refresh_visit_stats()
+                invalidate_routes(client_ids, using=db)
+        except IntegrityError:
+            return Response(
+                {'error': 'Some distributions were created concurrently, send the batch again'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return Response({
+            'created': len(distributions),
+            'skipped': [str(pk) for pk in existing_ids],
+            'distributions': DistributionSerializer(distributions, many=True).data
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'])
     def mark_visited(self, request, pk=None):
         """Mark distribution as visited and calculate next visit date"""
@@ -287,6 +374,44 @@ class DistributionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class VisitRouteView(APIView):
+    """
+    Ordered visit routes for a day, one per rep (Client.assigned_to)
+    GET /api/pos/routes/?date=2025-01-31&rep=<user id>&refresh=true
+    
+    Admins and managers get every rep's route (or ?rep=); other users only
+    their own. Routes are stored per day and rebuilt after distribution or
+    client changes; refresh=true forces a rebuild.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        import uuid
+        from django.utils.dateparse import parse_date
+        
+        day = timezone.localdate()
+        if request.query_params.get('date'):
+            day = parse_date(request.query_params['date'])
+            if day is None:
+                return Response({'error': 'Invalid date, use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rep = request.query_params.get('rep')
+        is_supervisor = getattr(request.user, 'role', None) in ['admin', 'manager']
+        if rep:
+            try:
+                rep_ids = [uuid.UUID(rep)]
+            except ValueError:
+                return Response({'error': 'Invalid rep'}, status=status.HTTP_400_BAD_REQUEST)
+            if not is_supervisor and rep_ids != [request.user.id]:
+                return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        else:
+            rep_ids = None if is_supervisor else [request.user.id]
+        
+        refresh = request.query_params.get('refresh', '').lower() == 'true'
+        routes = get_routes(day, rep_ids=rep_ids, refresh=refresh)
+        return Response({'date': day.isoformat(), 'routes': routes})
+
+
 class POSDashboardStatsView(APIView):
     """
     Get comprehensive POS dashboard statistics
@@ -368,12 +493,16 @@ class ClientInventoryViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['client', 'product']  # Only database fields, computed fields handled in get_queryset
     search_fields = ['client__name', 'product__name', 'location']
-    ordering_fields = ['current_quantity', 'updated_at', 'expiry_date']
+    ordering_fields = ['current_quantity', 'updated_at', 'expiry_date', 'stock_status']
     ordering = ['client', 'product']
     
     def get_queryset(self):
         queryset = super().get_queryset().select_related('client', 'product', 'last_updated_by')
         
+        # Annotated status for reads only: updated instances must recompute it
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.with_status()
+        
         # Filter by client
         client_id = self.request.query_params.get('client')
         if client_id:
@@ -384,23 +513,25 @@ class ClientInventoryViewSet(viewsets.ModelViewSet):
         if product_id:
             queryset = queryset.filter(product_id=product_id)
         
-        # Filter by low stock
+        # Status filters run in SQL, so pagination, search and ordering still apply
         low_stock = self.request.query_params.get('low_stock')
         if low_stock is not None:
             if low_stock.lower() == 'true':
-                queryset = [item for item in queryset if item.is_low_stock]
+                queryset = queryset.low_stock()
         
-        # Filter by out of stock
         out_of_stock = self.request.query_params.get('out_of_stock')
         if out_of_stock is not None:
             if out_of_stock.lower() == 'true':
-                queryset = [item for item in queryset if item.is_out_of_stock]
+                queryset = queryset.out_of_stock()
         
-        # Filter by expiring soon
         expiring_soon = self.request.query_params.get('expiring_soon')
         if expiring_soon is not None:
             if expiring_soon.lower() == 'true':
-                queryset = [item for item in queryset if item.is_expiring_soon]
+                queryset = queryset.expiring_soon()
+        
+        inventory_status = self.request.query_params.get('inventory_status')
+        if inventory_status and self.request.method in SAFE_METHODS:
+            queryset = queryset.filter(stock_status=inventory_status)
         
         return queryset
     
@@ -411,7 +542,8 @@ class ClientInventoryViewSet(viewsets.ModelViewSet):
         return ClientInventorySerializer
     
     def perform_create(self, serializer):
-        serializer.save(last_updated_by=self.request.user)
+        inventory = serializer.save(last_updated_by=self.request.user)
+        record_opening(inventory, user=self.request.user)
     
     def create(self, request, *args, **kwargs):
         """Override create to handle duplicate inventory gracefully"""
@@ -444,7 +576,17 @@ class ClientInventoryViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
     
     def perform_update(self, serializer):
-        serializer.save(last_updated_by=self.request.user)
+        # Quantity edits go through the stock journal; the other fields are
+        # saved alone so concurrent F() quantity updates are not overwritten
+        changes = dict(serializer.validated_data)
+        quantity = changes.pop('current_quantity', None)
+        inventory = serializer.instance
+        for field, value in changes.items():
+            setattr(inventory, field, value)
+        inventory.last_updated_by = self.request.user
+        inventory.save(update_fields=[*changes, 'last_updated_by', 'updated_at'])
+        if quantity is not None:
+            set_stock(inventory, quantity, user=self.request.user)
     
     @action(detail=True, methods=['post'])
     def update_quantity(self, request, pk=None):
@@ -466,11 +608,11 @@ class ClientInventoryViewSet(viewsets.ModelViewSet):
             notes = serializer.validated_data.get('notes', '')
             
             if action == 'add':
-                inventory.add_stock(quantity, user=request.user)
+                inventory.add_stock(quantity, user=request.user, notes=notes)
             elif action == 'reduce':
-                inventory.reduce_stock(quantity, user=request.user)
+                inventory.reduce_stock(quantity, user=request.user, notes=notes)
             elif action == 'set':
-                inventory.set_stock(quantity, user=request.user)
+                inventory.set_stock(quantity, user=request.user, notes=notes)
             
             # Update notes if provided
             if notes:
@@ -485,17 +627,46 @@ class ClientInventoryViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['get'])
+    def movements(self, request, pk=None):
+        """
+        Stock movement journal of an inventory item
+        GET /api/pos/inventory/{id}/movements/?as_of=2025-01-31
+        as_of (date or datetime): also return the quantity at that moment
+        """
+        inventory = self.get_object()
+        movements = inventory.movements.select_related('created_by')
+        data = {'movements': StockMovementSerializer(movements, many=True).data}
+        
+        as_of = request.query_params.get('as_of')
+        if as_of:
+            import datetime
+            from django.utils.dateparse import parse_date, parse_datetime
+            moment = parse_datetime(as_of)
+            if moment is None:
+                day = parse_date(as_of)
+                if day is None:
+                    return Response({'error': 'Invalid as_of, use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+                # End of the given day
+                moment = timezone.make_aware(datetime.datetime.combine(day + timedelta(days=1), datetime.time.min))
+            elif timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+            data['as_of'] = moment.isoformat()
+            data['quantity_as_of'] = quantity_at(inventory, moment)
+        
+        return Response(data)
+    
     @action(detail=False, methods=['get'])
     def low_stock_alerts(self, request):
         """Get all low stock items across all clients"""
-        low_stock_items = [item for item in self.get_queryset() if item.is_low_stock]
+        low_stock_items = self.get_queryset().low_stock()
         serializer = self.get_serializer(low_stock_items, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def expiring_soon(self, request):
         """Get all items expiring soon"""
-        expiring_items = [item for item in self.get_queryset() if item.is_expiring_soon]
+        expiring_items = self.get_queryset().expiring_soon()
         serializer = self.get_serializer(expiring_items, many=True)
         return Response(serializer.data)
     
@@ -513,17 +684,30 @@ class ClientInventoryViewSet(viewsets.ModelViewSet):
         serializer = ClientInventoryListSerializer(inventory_items, many=True)
         
         # Calculate statistics
-        total_items = len(inventory_items)
-        low_stock_count = sum(1 for item in inventory_items if item.is_low_stock)
-        out_of_stock_count = sum(1 for item in inventory_items if item.is_out_of_stock)
-        expiring_soon_count = sum(1 for item in inventory_items if item.is_expiring_soon)
+        stats = ClientInventory.objects.filter(client_id=client_id).health()
         
         return Response({
             'client_id': client_id,
-            'total_items': total_items,
-            'low_stock_count': low_stock_count,
-            'out_of_stock_count': out_of_stock_count,
-            'expiring_soon_count': expiring_soon_count,
+            'total_items': stats['total_items'],
+            'low_stock_count': stats['low_stock_count'],
+            'out_of_stock_count': stats['out_of_stock_count'],
+            'expiring_soon_count': stats['expiring_soon_count'],
             'inventory': serializer.data
         })
+    
+    @action(detail=False, methods=['get'])
+    def health(self, request):
+        """
+        Aggregate inventory health for the whole tenant (or ?client= / ?product=)
+        GET /api/pos/inventory/health/
+        """
+        queryset = ClientInventory.objects.all()
+        client_id = request.query_params.get('client')
+        if client_id:
+            queryset = queryset.filter(client_id=client_id)
+        product_id = request.query_params.get('product')
+        if product_id:
+            queryset = queryset.filter(product_id=product_id)
+        
+        return Response(queryset.health())
 